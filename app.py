@@ -3,15 +3,25 @@ import streamlit as st
 import os
 import gc
 import psutil
-import pandas as pd
-import plotly.express as px
-import plotly.graph_objects as go
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, as_completed, wait
 from datetime import datetime, timedelta
 import pymongo
 from bson.objectid import ObjectId
-from datetime import datetime
 import logging
-import json
+import uuid
+from types import SimpleNamespace
+from components.date_filter import render_date_filter
+from components.charts import MAX_TICKS, figure_bytes, selected_x_range, time_series_figure
+from components.metrics_view import build_metrics_view_model
+from data.data_loader import RollupStore, LOG_DIMENSION, label_times
+from data.dimension_index import DimensionIndex
+from data.filter_options import ALL_OPTIONS, FilterOptionCache
+from data.station_prefetch import StationPrefetcher
+from data.stations import station_collections
+from pages.fleet_comparison import get_latest_metrics, render_fleet_comparison
+from pages.overview_summary import render_activity_heatmap
+from utils.downsample import POINTS_PER_PIXEL, target_points
+from utils.helpers import calculate_percentage_change
 
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
@@ -100,6 +110,23 @@ DATABASE_NAME = "equipment"
 METRICS_COLLECTION = "equipment_metrics"
 cutoff_date = datetime(2024, 1, 1)
 
+# Per-trace point budgets for full-width and two-column charts; longer series are min-max downsampled
+FULL_WIDTH_POINTS = int(os.environ.get("MAX_POINTS_PER_TRACE", target_points()))
+HALF_WIDTH_POINTS = FULL_WIDTH_POINTS // 2
+# Hours a zoomed range may span to be shown hourly: one point per pixel of the narrowest chart
+ZOOM_HOURLY_POINTS = HALF_WIDTH_POINTS // POINTS_PER_PIXEL
+# Point budget and labelled x ticks per chart width
+CHART_WIDTHS = {"full": (FULL_WIDTH_POINTS, MAX_TICKS), "half": (HALF_WIDTH_POINTS, MAX_TICKS // 2)}
+# Dashboard rows: a single chart spans the full width, a pair shares it
+DASHBOARD_LAYOUT = [(LOG_DIMENSION,), ("group", "label"), ("repo", "method"), ("module",)]
+FIGURE_WORKERS = int(os.environ.get("FIGURE_WORKERS", 4))
+PREFETCH_RECENT = 5  # Recently viewed stations remembered per session as prefetch candidates
+# Serialized chart bytes allowed per dashboard page (0 disables the budget); each chart gets its
+# point budget's share of all DASHBOARD_LAYOUT charts, and charts over it drop series, then granularity
+PAGE_BYTE_BUDGET = int(os.environ.get("PAGE_BYTE_BUDGET", 2_000_000))
+PAGE_POINTS = sum(len(row) * CHART_WIDTHS["full" if len(row) == 1 else "half"][0] for row in DASHBOARD_LAYOUT)
+CHART_BYTE_BUDGETS = {width: PAGE_BYTE_BUDGET * points // PAGE_POINTS for width, (points, _) in CHART_WIDTHS.items()}
+
 # Initialize session state
 if "selected_station" not in st.session_state:
     st.session_state.selected_station = "ADBFI"
@@ -116,121 +143,142 @@ if "selected_repo" not in st.session_state:
 if "selected_module" not in st.session_state:
     st.session_state.selected_module = "All Modules"
 
-def create_gauge_chart(value, title, min_val=0, max_val=100, good_threshold=75, warning_threshold=50, is_missing=False):
+def log_rollup_event(event, **info):
+    """Instrumentation hook for the rollup store"""
+    logger.debug(f"rollup {event}: {info}")
+
+@st.cache_resource
+def get_rollup_store():
+    """Rollup store shared by all sessions"""
+    shared = None
+    if os.environ.get("ROLLUP_SHARED_MEMORY"):
+        # Several server processes on one host attach a single copy of each station's rollups
+        from data.shared_rollups import SharedRollupCache
+        shared = SharedRollupCache()
+    store = RollupStore(shared=shared)
+    store.add_hook(log_rollup_event)
+    return store
+
+store = get_rollup_store()
+
+# Chart title, legend title and y-axis label per dimension
+CHART_SPECS = {
+    LOG_DIMENSION: ("Number of Test over time by Station", "Tests", "Log counts"),
+    "group": ("Number of Groups over Time", "Groups", "Group Counts"),
+    "label": ("Number of Labels over Time", "Labels", "Label Counts"),
+    "repo": ("Number of Repos over Time", "Repositories", "Repo Counts"),
+    "method": ("Number of Methods over Time", "Methods", "Method Count"),
+    "module": ("Number of Modules over Time", "Modules", "Module Count"),
+}
+GRANULARITY_OPTIONS = {"Hourly": "hour", "Daily": "day", "Monthly": "month"}
+HOVER_FORMATS = {"hour": "%Y-%m-%d %H:00", "day": "%Y-%m-%d", "month": "%Y-%m"}
+
+def build_chart_figure(station, granularity, dim, window, top_k, max_points, max_ticks):
+    """Figure of one dimension straight from the rollup arrays"""
+    timestamps, counts, names = store.series(station, dim, granularity, window,
+                                             top_k=top_k, other=top_k is not None)
+    title, legend_title, yaxis_label = CHART_SPECS[dim]
+    if dim == LOG_DIMENSION:
+        names = [f"Log counts per {granularity}"]
+    return time_series_figure(label_times(timestamps), counts, names, title,
+                              f"{yaxis_label} per {granularity}", legend_title,
+                              tick_labels=timestamps, max_points=max_points, max_ticks=max_ticks,
+                              null_name=f"null {dim}", hover_format=HOVER_FORMATS[granularity])
+
+@st.cache_resource(max_entries=512, show_spinner=False)
+def cached_figure(station, granularity, dim, window, version, top_k=None,
+                  max_points=FULL_WIDTH_POINTS, max_ticks=MAX_TICKS):
     """
-    Create a gauge chart for metrics visualization
-    
-    Args:
-        value: Value to display on gauge
-        title: Title for the gauge
-        min_val: Minimum value on gauge scale
-        max_val: Maximum value on gauge scale
-        good_threshold: Threshold for good performance (green)
-        warning_threshold: Threshold for warning performance (yellow)
-        is_missing: Whether the data is missing
-        
+    Figure built once per (station, granularity, dimension, window, rollup version,
+    top-k, point budget) and shared by all sessions; a new rollup version changes the
+    key, so stale figures are never served. Returned figures must not be mutated.
+    """
+    return build_chart_figure(station, granularity, dim, window, top_k, max_points, max_ticks)
+
+def budget_fallbacks(dim, granularity, top_k):
+    """(granularity, top-k) pairs to try in order: fewer series first, then coarser periods"""
+    folds = [top_k]
+    if dim in TOP_K_DEFAULTS:
+        folds += sorted((k for k in TOP_K_CHOICES if k is not None and (top_k is None or k < top_k)), reverse=True)
+    granularities = list(GRANULARITY_OPTIONS.values())
+    return [(coarser, k) for coarser in granularities[granularities.index(granularity):] for k in folds]
+
+@st.cache_resource(max_entries=512, show_spinner=False)
+def fitted_figure(station, granularity, dim, window, version, top_k=None,
+                  max_points=FULL_WIDTH_POINTS, max_ticks=MAX_TICKS, byte_budget=0):
+    """
+    cached_figure reduced until its serialized size fits byte_budget (0: no budget).
+    Each candidate is measured as time_series_figure returns it: the smaller of its
+    full-resolution (x0/dx) and downsampled builds, so series are only dropped or
+    periods coarsened when neither fits.
+
     Returns:
-        plotly.graph_objects.Figure: Gauge chart figure
+        tuple: (figure, granularity, top_k, bytes) of the first fallback that fits, or of the last one tried
     """
-    # Handle None values
-    value = 0 if value is None else value
-    
-    if is_missing:
-        # Gray color for missing data
-        color = "#CCCCCC"
-        title = f"{title} (No Data)"
-    else:
-        # Determine color based on thresholds
-        if good_threshold > warning_threshold:
-            if value >= good_threshold:
-                color = "#4CAF50"  # Good - Green
-            elif value >= warning_threshold:
-                color = "#FFC107"  # Warning - Yellow/Amber
-            else:
-                color = "#F44336"  # Danger - Red
-        elif good_threshold <= warning_threshold:
-            if value < good_threshold:
-                color = "#4CAF50"  # Good - Green
-            elif value <= warning_threshold:
-                color = "#FFC107"  # Warning - Yellow/Amber
-            else:
-                color = "#F44336"  # Danger - Red
-    
-    # Create the gauge chart
-    if good_threshold > warning_threshold:
-        fig = go.Figure(go.Indicator(
-            mode="gauge+number",
-            value=value,
-            title={'text': title, 'font': {'size': 14, 'color': '#666'}},
-            number={'suffix': "%", 'font': {'size': 20, 'color': '#1E3A8A'}},
-            gauge={
-                'axis': {'range': [min_val, max_val], 'tickwidth': 1, 'tickcolor': "#666"},
-                'bar': {'color': color},
-                'bgcolor': "white",
-                'borderwidth': 2,
-                'bordercolor': "#DDDDDD",
-                'steps': [
-                    {'range': [min_val, warning_threshold], 'color': '#FFECB3'},
-                    {'range': [warning_threshold, good_threshold], 'color': '#E6EE9C'},
-                    {'range': [good_threshold, max_val], 'color': '#C8E6C9'}
-                ],
-                'threshold': {
-                    'line': {'color': "black", 'width': 2},
-                    'thickness': 0.75,
-                    'value': value
-                }
-            }
-        ))
-    else:
-        fig = go.Figure(go.Indicator(
-            mode="gauge+number",
-            value=value,
-            title={'text': title, 'font': {'size': 14, 'color': '#666'}},
-            number={'suffix': "%", 'font': {'size': 20, 'color': '#1E3A8A'}},
-            gauge={
-                'axis': {'range': [min_val, max_val], 'tickwidth': 1, 'tickcolor': "#666"},
-                'bar': {'color': color},
-                'bgcolor': "white",
-                'borderwidth': 2,
-                'bordercolor': "#DDDDDD",
-                'steps': [
-                    {'range': [min_val, good_threshold], 'color': '#C8E6C9'},
-                    {'range': [good_threshold, warning_threshold], 'color': '#E6EE9C'},
-                    {'range': [warning_threshold, max_val], 'color': '#FFECB3'}
-                ],
-                'threshold': {
-                    'line': {'color': "black", 'width': 2},
-                    'thickness': 0.75,
-                    'value': value
-                }
-            }
-        ))
-    
-    # Update layout
-    fig.update_layout(
-        height=250,  # Increased height
-        margin=dict(l=30, r=30, t=60, b=40),  # Increased top and bottom margins
-        paper_bgcolor="white",
-        font={'color': "#333", 'family': "Arial, sans-serif"},  # Better font
-        autosize=True,  # Allow auto-sizing
-    )
-    
-    return fig
+    for granularity, top_k in budget_fallbacks(dim, granularity, top_k):
+        figure = cached_figure(station, granularity, dim, window, version, top_k, max_points, max_ticks)
+        size = figure_bytes(figure)
+        if not byte_budget or size <= byte_budget:
+            break
+    return figure, granularity, top_k, size
+
+@st.cache_resource
+def get_figure_pool():
+    """Workers that build dashboard figures while the page skeleton is already on screen"""
+    return ThreadPoolExecutor(max_workers=FIGURE_WORKERS, thread_name_prefix="figures")
+
+@st.cache_resource
+def get_station_prefetcher():
+    """Prefetcher shared by all sessions, so popularity is counted fleet-wide"""
+    return StationPrefetcher()
+
+def warm_station(station, window, granularity, top_ks, is_current):
+    """Load a station's rollup and build its dashboard figures for the given view settings"""
+    store.rollup(station)
+    version = store.version(station)
+    for row in DASHBOARD_LAYOUT:
+        width = "full" if len(row) == 1 else "half"
+        for dim in row:
+            if not is_current():
+                return
+            max_points, max_ticks = CHART_WIDTHS[width]
+            fitted_figure(station, granularity, dim, window, version, top_ks.get(dim), max_points, max_ticks,
+                          CHART_BYTE_BUDGETS[width])
+
+@st.cache_resource
+def get_filter_options():
+    """Filter option hierarchies shared by all sessions"""
+    return FilterOptionCache(CONNECTION_STRING, DATABASE_NAME)
+
+# Sidebar filter levels: title and the session-state key of the applied value
+FILTER_WIDGETS = {
+    "_group": ("Group", "selected_group"),
+    "_label": ("Label", "selected_label"),
+    "repo": ("Repository", "selected_repo"),
+    "module": ("Module", "selected_module"),
+}
+FILTER_POLL_INTERVAL = 0.5  # Seconds between redraws of the filter panel while option lists load
+SEARCH_THRESHOLD = 200  # Filter levels with more values get a search box and list only the matches
+
+@st.cache_resource(max_entries=64)
+def metrics_view_model(station, filters, metrics_version, _metrics, _group_metrics):
+    """
+    Gauge figures, card values and sorted group lists of the metrics view.
+    Keyed by (station, filters, metrics version): a newer metrics document
+    builds a new model, while switching back to a station reuses its model.
+    """
+    return build_metrics_view_model(_metrics, _group_metrics)
 
-# Helper function to safely get values
-def safe_get_metric(metrics, key, default=None):
-    """Get a metric value safely, handling None values and missing data"""
-    if not metrics:
-        return {"value": default, "is_missing": True}
-    
-    value = metrics.get(key)
-    if value is None:
-        # Check if we have missing data flag
-        if metrics.get("missing_data", False):
-            return {"value": default, "is_missing": True}
-        return {"value": default, "is_missing": False}
-    
-    return {"value": value, "is_missing": False}
+# Series shown per chart before the rest is folded into one "Other" trace (None shows all)
+TOP_K_DEFAULTS = {"label": 10, "repo": 10, "method": 10, "module": 15}
+TOP_K_CHOICES = [5, 10, 15, 25, 50, None]
+
+def top_k_control(dim):
+    """Per-chart selector for how many series to draw"""
+    default = TOP_K_DEFAULTS.get(dim)
+    return st.selectbox(f"Series shown ({dim})", TOP_K_CHOICES, index=TOP_K_CHOICES.index(default),
+                        format_func=lambda k: "All" if k is None else f"Top {k} + Other",
+                        key=f"top_k_{dim}", label_visibility="collapsed")
 
 # Force garbage collection at start
 gc.collect()
@@ -242,141 +290,107 @@ st.title("Test Equipment Analysis Dashboard")
 with st.sidebar:
     st.title("Control Panel")
     
-    # Station selection
-    st.subheader("Station")
-    
-    # Get available stations from metrics collection
+    def filter_select(label, options, key, applied):
+        """Pending value of one filter; starts at the applied value and resets when it leaves the options"""
+        # Reassigned every run: a new option list (e.g. search matches) makes a new widget that would reset
+        pending = st.session_state.get(key)
+        st.session_state[key] = pending if pending in options else applied if applied in options else options[0]
+        return st.selectbox(label, options, key=key)
+
     @st.cache_data(ttl=300)  # Cache for 5 minutes
     def get_available_stations():
         try:
             client = pymongo.MongoClient(CONNECTION_STRING)
             db = client[DATABASE_NAME]
-            collections = db.list_collection_names()
-            collections_to_remove = ["equipment_metrics", "metrics_metadata"]
-            collections_result = [collection for collection in collections if collection not in collections_to_remove]
-            sorted(collections_result)
-            return collections_result
+            return station_collections(db.list_collection_names())
         except Exception as e:
             st.error(f"Error getting stations: {e}")
             return []
-    
-    station_options = get_available_stations()
-    if not station_options:
-        station_options = ["StationA", "StationB", "StationC", "StationD", "ADBFI", "KAAPP2Q", "StationL", "StationS", "StationW"]
-    
-    selected_station = st.selectbox(
-        "Select Station",
-        station_options,
-        index=station_options.index(st.session_state.selected_station) if st.session_state.selected_station in station_options else 0
-    )
-    
-    # Update station selection
-    if selected_station != st.session_state.selected_station:
-        st.session_state.selected_station = selected_station
-        st.rerun()
-    
-    @st.cache_data(ttl=300)  # Cache for 5 minutes
-    def get_available_groups(station):
-        try:
-            client = pymongo.MongoClient(CONNECTION_STRING)
-            db = client[DATABASE_NAME]
-            metrics_col = db[METRICS_COLLECTION]
-            groups = ["All Groups"]
-            groups.extend(metrics_col.distinct("group", {"station": station}))
-            client.close()
-            return groups
-        except Exception as e:
-            st.error(f"Error getting groups: {e}")
-            return []
-
-    st.subheader("Group")
-    group_options = get_available_groups(selected_station)
-    selected_group = st.selectbox(
-        "Select Group", 
-        group_options, 
-        index=station_options.index(st.session_state.selected_group) if st.session_state.selected_group in station_options else 0
-    )
-
-    if selected_station != st.session_state.selected_station:
-        st.session_state.selected_station = selected_station
-        st.rerun()
-
-    @st.cache_data(ttl=300)  # Cache for 5 minutes
-    def get_available_labels(station, group):
-        try:
-            client = pymongo.MongoClient(CONNECTION_STRING)
-            db = client[DATABASE_NAME]
-            metrics_col = db[station]
-            labels = ["All Labels"]
-            labels.extend(metrics_col.distinct("_label", {"_group": group}))
-            client.close()
-            return labels
-        except Exception as e:
-            st.error(f"Error getting groups: {e}")
-            return []
-
-    st.subheader("Label")
-    label_options = get_available_labels(selected_station, selected_group)
-    if len(label_options) > 100:
-        st.info(f"Showing first 100 labels only")
-    selected_label = st.selectbox(
-        "Select Label", 
-        label_options,
-        index=station_options.index(st.session_state.selected_label) if st.session_state.selected_label in station_options else 0
-    )
-    if selected_label != st.session_state.selected_label:
-        st.session_state.selected_label = selected_label
-        st.rerun()
-
-    @st.cache_data(ttl=300)  # Cache for 5 minutes
-    def get_available_repositories(station, group, label):
-        try:
-            client = pymongo.MongoClient(CONNECTION_STRING)
-            db = client[DATABASE_NAME]
-            metrics_col = db[station]
-            repos = ["All Repos"]
-            repos.extend(metrics_col.distinct("repo", {"_group": group, "_label": label}))
-            client.close()
-            return repos
-        except Exception as e:
-            st.error(f"Error getting groups: {e}")
-            return []
-
-    st.subheader("Repository")
-    repo_options = get_available_repositories(selected_station, selected_group, selected_label)
-    selected_repo = st.selectbox(
-        "Select Repository", 
-        repo_options,
-        index=station_options.index(st.session_state.selected_repo) if st.session_state.selected_repo in station_options else 0
-    )
-    if selected_repo != st.session_state.selected_repo:
-        st.session_state.selected_repo = selected_repo
-        st.rerun()
-
-    @st.cache_data(ttl=300)  # Cache for 5 minutes
-    def get_available_modules(station, group, label, repo):
-        try:
-            client = pymongo.MongoClient(CONNECTION_STRING)
-            db = client[DATABASE_NAME]
-            metrics_col = db[station]
-            modules = ["All Modules"]
-            modules.extend(metrics_col.distinct("module", {"_group": group, "_label": label, "repo": repo}))
-            client.close()
-            return modules
-        except Exception as e:
-            st.error(f"Error getting groups: {e}")
-            return []
 
-    st.subheader("Module")
-    module_options = get_available_modules(selected_station, selected_group, selected_label, selected_repo)
-    selected_module = st.selectbox(
-        "Select Module", 
-        module_options,
-        index=station_options.index(st.session_state.selected_module) if st.session_state.selected_module in station_options else 0
-    )
-    if selected_module != st.session_state.selected_module:
-        st.session_state.selected_module = selected_module
-        st.rerun()
+    def pending_filters():
+        """Station and filter values the sidebar shows: the pending widget values, else the applied ones"""
+        station = st.session_state.get("filter_station", st.session_state.selected_station)
+        selection = {field: st.session_state.get(f"filter_{field.lstrip('_')}", st.session_state[state_key])
+                     for field, (_, state_key) in FILTER_WIDGETS.items()}
+        return station, selection
+
+    def render_station_filters():
+        """Station and dimension filters; edits rerun only this panel, Apply commits them in one rerun"""
+        station_options = get_available_stations()
+        if not station_options:
+            station_options = ["StationA", "StationB", "StationC", "StationD", "ADBFI", "KAAPP2Q", "StationL", "StationS", "StationW"]
+        st.session_state.station_options = station_options  # Order the prefetcher takes neighbours from
+        # Option lists of the chosen station load in the background, one distinct query per level, and are cached
+        filter_options = get_filter_options()
+
+        # Selections are pending until Apply; only applying reruns the pages that read them
+        st.subheader("Station")
+        station = filter_select("Select Station", station_options, "filter_station", st.session_state.selected_station)
+        # Every level of the station loads at once, under the pending values of the levels above it
+        filter_options.prefetch(station, pending_filters()[1])
+
+        selection, loading, load_error = {}, [], None
+        for field, (title, state_key) in FILTER_WIDGETS.items():
+            st.subheader(title)
+            name = field.lstrip("_")  # Widget keys: filter_group, search_group, filter_repo, ...
+            try:
+                index = filter_options.peek(station, field, selection)
+            except Exception as e:
+                load_error = load_error or e
+                index = DimensionIndex([])
+            if index is None:
+                # Still loading: a disabled placeholder, and the pending value stands for the levels below
+                loading.append(field)
+                st.selectbox(f"Select {title}", ["Loading..."], disabled=True, key=f"loading_{name}")
+                selection[field] = st.session_state.get(f"filter_{name}", st.session_state[state_key])
+                if f"filter_{name}" in st.session_state:
+                    # Not drawn this run: reassigned so the pending value is not dropped with the widget
+                    st.session_state[f"filter_{name}"] = selection[field]
+                continue
+            values = index.names
+            if len(index) > SEARCH_THRESHOLD:
+                query = st.text_input(f"Search {title}", key=f"search_{name}", placeholder="Type to search")
+                values = index.search(query)
+                # The pending and applied values stay selectable while they are not among the matches
+                values = [value for value in dict.fromkeys((st.session_state.get(f"filter_{name}"),
+                                                            st.session_state[state_key]))
+                          if value in index and value not in values] + values
+                st.caption(f"{len(values)} of {len(index):,} values shown")
+            options = [ALL_OPTIONS[field]] + values
+            selection[field] = filter_select(f"Select {title}", options, f"filter_{name}", st.session_state[state_key])
+
+        if load_error is not None:
+            st.error(f"Error getting filter options: {load_error}")
+
+        pending = {"selected_station": station}
+        pending.update({state_key: selection[field] for field, (_, state_key) in FILTER_WIDGETS.items()})
+        changed = [key for key, value in pending.items() if st.session_state[key] != value]
+        if st.button("Apply filters", type="primary", disabled=not changed or bool(loading), key="apply_filters"):
+            for key in changed:
+                st.session_state[key] = pending[key]
+            # The station drives every page; the other filters are only read by the metrics view
+            if "selected_station" in changed or st.session_state.get("active_view") == "Metrics Calculation API":
+                st.rerun()
+            st.rerun(scope="fragment")
+
+        # Redraw the panel as the lists arrive. Full runs register it with a poll timer while
+        # anything loads; a full run is also the only way to drop that timer once all arrived.
+        if loading and not st.session_state.filters_polling:
+            if st.session_state.filters_full_run:
+                # A level the full run did not foresee (a pending value that left its options)
+                st.rerun()
+            wait(filter_options.prefetch(station, selection).values(), timeout=FILTER_POLL_INTERVAL,
+                 return_when=FIRST_COMPLETED)
+            st.rerun(scope="fragment")
+        if not loading and st.session_state.filters_polling and not st.session_state.filters_full_run:
+            st.rerun()
+
+    # The timer is set when the fragment is registered, so whether to poll is decided before it runs
+    st.session_state.filters_polling = not all(
+        future.done() for future in get_filter_options().prefetch(*pending_filters()).values())
+    st.session_state.filters_full_run = True
+    st.fragment(render_station_filters, run_every=FILTER_POLL_INTERVAL if st.session_state.filters_polling else None)()
+    st.session_state.filters_full_run = False
 
     # Add memory usage indicator
     mem_usage = get_memory_usage()
@@ -405,7 +419,7 @@ with st.sidebar:
             return None
     
     # Display metrics last updated
-    metrics_timestamp = get_metrics_timestamp(selected_station)
+    metrics_timestamp = get_metrics_timestamp(st.session_state.selected_station)
     if metrics_timestamp:
         st.success(f"Metrics last updated: {metrics_timestamp.strftime('%Y-%m-%d %H:%M:%S')}")
     else:
@@ -414,1490 +428,493 @@ with st.sidebar:
     # Memory cleanup button
     if st.button("Clear Cache", key="clear_cache"):
         st.cache_data.clear()
+        cached_figure.clear()
+        fitted_figure.clear()
+        metrics_view_model.clear()
+        store.invalidate()
         gc.collect()
         st.success("Cache cleared!")
         st.rerun()
 
-Dashboard, Metrics_Calculation_API = st.tabs(["Dashboard", "Metrics Calculation API"])
-    
-with Dashboard:
-    st.success(f"Metrics last updated: {metrics_timestamp.strftime('%Y-%m-%d %H:%M:%S')}")
-    Hour, Day, Month = st.tabs(["Hourly", "Daily", "Monthly"])
-    @st.cache_data(ttl=60)
-    def sum_by_hour(collection_name):
-        try:
-            with open(f'forgraph/{collection_name}_graph.json') as file:
-                data = json.load(file)
-            return data
-        except Exception as e:
-            logger.error(f"Error in background data loading: {e}")
-            return False
-    
-    @st.cache_data(ttl=60)
-    def sum_by_day(collection_name):
-        try:
-            with open(f'forgraph/{collection_name}_graph.json') as file:
-                hourly_data = json.load(file)
-            # print("0asdfasdfasdfasdfasdfasdfasfefefefe")
-            module = {**hourly_data["module_counts_per_hour"]}
-            del module["module_index"]
-            label = {**hourly_data["label_counts_per_hour"]}
-            del label["_label_index"]
-            method = {**hourly_data["method_counts_per_hour"]}
-            del method["method_index"]
-            repo = {**hourly_data["repo_counts_per_hour"]}
-            del repo["repo_index"]
-            log = {"log_counts_per_hour": hourly_data["log_counts_per_hour"]}
-            group = {**hourly_data["group_counts_per_hour"]}
-            del group["_group_index"]
-            # print("1asdfasdfasdfasdfasdfasdfasfefefefe")
-            daily_data = pd.DataFrame({
-                "date": [d[:10] for d in hourly_data["dates"]],  # Extract YYYY-MM
-                **module,
-                **label,
-                **method,
-                **repo,
-                **log,
-                **group,
-            })
-            daily_aggregated = daily_data.groupby("date").sum().reset_index()
-            daily_result = {
-                "dates": daily_aggregated["date"].tolist()
-            }
-            # print("2asdfasdfasdfasdfasdfasdfasfefefefe")
-            module_count_per_day = {}
-            module_count_per_day["module_index"] = hourly_data["module_counts_per_hour"]["module_index"]
-            for index in hourly_data["module_counts_per_hour"]["module_index"]:
-                if index == None:
-                    index_t = "null"
-                else:
-                    index_t = str(index)
-                module_count_per_day[index_t] = daily_aggregated[index_t].tolist()
-            
-            label_count_per_day = {}
-            label_count_per_day["_label_index"] = hourly_data["label_counts_per_hour"]["_label_index"]
-            for index in hourly_data["label_counts_per_hour"]["_label_index"]:
-                if index == None:
-                    index_t = "null"
-                else:
-                    index_t = str(index)
-                label_count_per_day[index_t] = daily_aggregated[index_t].tolist()
-
-            method_count_per_day = {}
-            method_count_per_day["method_index"] = hourly_data["method_counts_per_hour"]["method_index"]
-            for index in hourly_data["method_counts_per_hour"]["method_index"]:
-                if index == None:
-                    index_t = "null"
-                else:
-                    index_t = str(index)
-                method_count_per_day[index_t] = daily_aggregated[index_t].tolist()
-
-            repo_count_per_day = {}
-            repo_count_per_day["repo_index"] = hourly_data["repo_counts_per_hour"]["repo_index"]
-            for index in hourly_data["repo_counts_per_hour"]["repo_index"]:
-                if index == None:
-                    index_t = "null"
-                else:
-                    index_t = str(index)
-                repo_count_per_day[index_t] = daily_aggregated[index_t].tolist()
-
-            group_count_per_day = {}
-            group_count_per_day["_group_index"] = hourly_data["group_counts_per_hour"]["_group_index"]
-            for index in hourly_data["group_counts_per_hour"]["_group_index"]:
-                if index == None:
-                    index_t = "null"
-                else:
-                    index_t = str(index)
-                group_count_per_day[index_t] = daily_aggregated[index_t].tolist()
-
-            daily_result["module_counts_per_day"] = module_count_per_day
-            daily_result["label_counts_per_day"] = label_count_per_day
-            daily_result["method_counts_per_day"] = method_count_per_day
-            daily_result["repo_counts_per_day"] = repo_count_per_day
-            daily_result["group_counts_per_day"] = group_count_per_day
-            daily_result["log_counts_per_day"] = daily_aggregated["log_counts_per_hour"].tolist()
+# Only the selected view is computed and sent to the browser; st.tabs would run (and ship) every tab body
+view = st.segmented_control("View", ["Dashboard", "Fleet Comparison", "Metrics Calculation API"], default="Dashboard",
+                            key="active_view", label_visibility="collapsed") or "Dashboard"
 
-            return daily_result
-        except Exception as e:
-            logger.error(f"Error in summing data by day: {e}")
-            return False
-        
-    @st.cache_data(ttl=60)
-    def sum_by_month(collection_name):
-        try:
-            with open(f'forgraph/{collection_name}_graph.json') as file:
-                hourly_data = json.load(file)
-            # print("0asdfasdfasdfasdfasdfasdfasfefefefe")
-            module = {**hourly_data["module_counts_per_hour"]}
-            del module["module_index"]
-            label = {**hourly_data["label_counts_per_hour"]}
-            del label["_label_index"]
-            method = {**hourly_data["method_counts_per_hour"]}
-            del method["method_index"]
-            repo = {**hourly_data["repo_counts_per_hour"]}
-            del repo["repo_index"]
-            log = {"log_counts_per_hour": hourly_data["log_counts_per_hour"]}
-            group = {**hourly_data["group_counts_per_hour"]}
-            del group["_group_index"]
-            # print("1asdfasdfasdfasdfasdfasdfasfefefefe")
-            monthly_data = pd.DataFrame({
-                "date": [d[:7] for d in hourly_data["dates"]],  # Extract YYYY-MM
-                **module,
-                **label,
-                **method,
-                **repo,
-                **log,
-                **group,
-            })
-            monthly_aggregated = monthly_data.groupby("date").sum().reset_index()
-            monthly_result = {
-                "dates": monthly_aggregated["date"].tolist()
-            }
-            # print("2asdfasdfasdfasdfasdfasdfasfefefefe")
-            module_count_per_month = {}
-            module_count_per_month["module_index"] = hourly_data["module_counts_per_hour"]["module_index"]
-            for index in hourly_data["module_counts_per_hour"]["module_index"]:
-                if index == None:
-                    index_t = "null"
-                else:
-                    index_t = str(index)
-                module_count_per_month[index_t] = monthly_aggregated[index_t].tolist()
-            
-            label_count_per_month = {}
-            label_count_per_month["_label_index"] = hourly_data["label_counts_per_hour"]["_label_index"]
-            for index in hourly_data["label_counts_per_hour"]["_label_index"]:
-                if index == None:
-                    index_t = "null"
-                else:
-                    index_t = str(index)
-                label_count_per_month[index_t] = monthly_aggregated[index_t].tolist()
-
-            method_count_per_month = {}
-            method_count_per_month["method_index"] = hourly_data["method_counts_per_hour"]["method_index"]
-            for index in hourly_data["method_counts_per_hour"]["method_index"]:
-                if index == None:
-                    index_t = "null"
-                else:
-                    index_t = str(index)
-                method_count_per_month[index_t] = monthly_aggregated[index_t].tolist()
-
-            repo_count_per_month = {}
-            repo_count_per_month["repo_index"] = hourly_data["repo_counts_per_hour"]["repo_index"]
-            for index in hourly_data["repo_counts_per_hour"]["repo_index"]:
-                if index == None:
-                    index_t = "null"
-                else:
-                    index_t = str(index)
-                repo_count_per_month[index_t] = monthly_aggregated[index_t].tolist()
-
-            group_count_per_month = {}
-            group_count_per_month["_group_index"] = hourly_data["group_counts_per_hour"]["_group_index"]
-            for index in hourly_data["group_counts_per_hour"]["_group_index"]:
-                if index == None:
-                    index_t = "null"
-                else:
-                    index_t = str(index)
-                group_count_per_month[index_t] = monthly_aggregated[index_t].tolist()
+# Queued prefetches of this session would compete with this render, whichever view it shows;
+# the Dashboard schedules a new batch once it is drawn
+prefetcher = get_station_prefetcher()
+prefetch_session = st.session_state.setdefault("prefetch_session", uuid.uuid4().hex)
+prefetcher.cancel(prefetch_session)
 
-            monthly_result["module_counts_per_month"] = module_count_per_month
-            monthly_result["label_counts_per_month"] = label_count_per_month
-            monthly_result["method_counts_per_month"] = method_count_per_month
-            monthly_result["repo_counts_per_month"] = repo_count_per_month
-            monthly_result["group_counts_per_month"] = group_count_per_month
-            monthly_result["log_counts_per_month"] = monthly_aggregated["log_counts_per_hour"].tolist()
+if view == "Dashboard":
+    if metrics_timestamp:
+        st.success(f"Metrics last updated: {metrics_timestamp.strftime('%Y-%m-%d %H:%M:%S')}")
+    start_date, end_date = render_date_filter()
+
+    station = st.session_state.selected_station
+    window = (start_date, end_date)
+    recent = st.session_state.setdefault("recent_stations", [])
+    if not recent or recent[0] != station:
+        prefetcher.record_view(station)
+        recent[:] = [station] + [name for name in recent if name != station][:PREFETCH_RECENT - 1]
+    rollup = store.rollup(station)
+    if not len(rollup):
+        st.warning(f"No graph data found for {station}")
+
+    # Window totals straight from the prefix sums, compared with the preceding period of equal length
+    if start_date is not None and end_date is not None:
+        tests_now, tests_before = rollup.compare(LOG_DIMENSION, start_date, end_date)
+        labels_now, labels_before = rollup.compare("label", start_date, end_date)
+        groups_now, groups_before = rollup.compare("group", start_date, end_date)
+        total_col, label_col, group_col = st.columns(3)
+        with total_col:
+            st.metric("Tests in Range", f"{int(tests_now[0]):,}",
+                      f"{calculate_percentage_change(int(tests_now[0]), int(tests_before[0])):.1f}% vs previous period")
+        with label_col:
+            st.metric("Active Labels", int((labels_now > 0).sum()),
+                      int((labels_now > 0).sum()) - int((labels_before > 0).sum()))
+        with group_col:
+            st.metric("Active Groups", int((groups_now > 0).sum()),
+                      int((groups_now > 0).sum()) - int((groups_before > 0).sum()))
+
+    def apply_zoom(chart_key):
+        """Box selection on an hourly/daily chart: zoom every chart to the selected range"""
+        zoom = selected_x_range(st.session_state.get(chart_key))
+        if zoom is None:
+            return
+        st.session_state.zoom_window = zoom
+        st.session_state.zoom_changed = True
+        # Once every chart can show the range hour by hour without downsampling, switch to hourly
+        if (zoom[1] - zoom[0]) / timedelta(hours=1) <= ZOOM_HOURLY_POINTS:
+            st.session_state.active_granularity = "Hourly"
+
+    def clear_zoom():
+        st.session_state.pop("zoom_window", None)
+
+    def zoomed_window(window):
+        """Date-filter window narrowed to the zoomed range (the zoom is dropped if they don't overlap)"""
+        zoom = st.session_state.get("zoom_window")
+        if zoom is None:
+            return window
+        start = zoom[0] if window[0] is None else max(window[0], zoom[0])
+        end = zoom[1] if window[1] is None else min(window[1], zoom[1])
+        if start > end:
+            clear_zoom()
+            return window
+        return start, end
+
+    def draw_chart(placeholder, fitted, granularity, top_k, dim):
+        """Draw a fitted_figure result, noting when the payload budget reduced it"""
+        figure, fitted_granularity, fitted_top_k, size = fitted
+        with placeholder.container():
+            if (fitted_granularity, fitted_top_k) != (granularity, top_k):
+                series = "" if fitted_top_k == top_k else f"top {fitted_top_k} series, "
+                st.caption(f"Reduced to {series}{fitted_granularity} periods to fit the page payload budget "
+                           f"({size / 1024:.0f} KB)")
+            if fitted_granularity == "month":
+                st.plotly_chart(figure)
+            else:
+                key = f"zoom_{fitted_granularity}_{dim}"
+                st.plotly_chart(figure, key=key, on_select=lambda: apply_zoom(key), selection_mode="box")
 
-            return monthly_result
+    def draw_built_chart(placeholder, build, granularity, top_k, dim):
+        """Draw the figure returned by build(), or the error building it raised, in the chart's placeholder"""
+        try:
+            fitted = build()
         except Exception as e:
-            logger.error(f"Error in summing data by day: {e}")
-            return False
-    
-    with Hour:
-        st.header("Number of Test over time by Station")
-        data = sum_by_hour(st.session_state.selected_station)
-        time_logs = pd.DataFrame({
-            "timestamp": data["dates"],
-            "log_counts_per_hour": data["log_counts_per_hour"]
-        })
-        fig = go.Figure()
-        fig.add_trace(go.Scatter(x = time_logs['timestamp'], y = time_logs['log_counts_per_hour'], mode = 'lines', name = 'Log counts per hour', showlegend=True, hovertemplate='%{x} - %{y}<extra></extra>'))
-        fig.update_layout(
-            title="Number of Test over time by Station",
-            xaxis_title="Timestamp",
-            yaxis_title="Log counts per hour",
-            hovermode="x unified",
-            xaxis_rangeslider_visible=False,
-            legend=dict(
-                title="Tests",  # Title for the legend
-                x=0.5,           # Center the legend horizontally
-                y=1.1,         # Position the legend below the plot
-                xanchor="center",  # Anchor the x position at the center
-                yanchor="bottom",     # Anchor the y position at the top
-                traceorder="normal",  # Order the traces in the legend normally
-                font=dict(size=12),   # Font size for legend items
-            ),
-            xaxis=dict(
-                tickmode='array',  # Use a specific set of tick values
-                tickvals=time_logs['timestamp'][::96],  # Show every 24th timestamp (change this number as needed)
-                ticktext=time_logs['timestamp'][::96],  # Custom labels for tick marks (you can customize this)
-                tickangle=45  # Rotate the tick labels to make them more readable
-            ), 
-        )
-        st.plotly_chart(fig)
-        # st.line_chart(time_logs, x="timestamp", y="log_counts_per_hour")
-
-        hour_group, hour_label = st.columns(2)
-
-        with hour_group:
-            st.header("Number of Groups over Time")
-            group_time_json = data["group_counts_per_hour"].copy()
-            del group_time_json["_group_index"]
-            time_groups = pd.DataFrame({
-                "timestamp": data["dates"],
-                **group_time_json
-            })
-            fig = go.Figure()
-            for group in group_time_json:
-                if group != "_group_index":  # Avoid plotting the '_group_index'
-                    fig.add_trace(go.Scatter(x=time_groups['timestamp'], y=time_groups[group], mode='lines', name=group, showlegend=True, hovertemplate='%{x} - %{y}<extra></extra>'))
-            fig.update_layout(
-                title="Number of Groups over Time",
-                xaxis_title="Timestamp",
-                yaxis_title="Group Counts",
-                hovermode="x unified",
-                xaxis_rangeslider_visible=False,
-                legend=dict(
-                    title="Groups",  # Title for the legend
-                    x=0.5,           # Center the legend horizontally
-                    y=1.1,         # Position the legend below the plot
-                    xanchor="center",  # Anchor the x position at the center
-                    yanchor="bottom",     # Anchor the y position at the top
-                    traceorder="normal",  # Order the traces in the legend normally
-                    font=dict(size=12),   # Font size for legend items
-                ),
-                xaxis=dict(
-                    tickmode='array',  # Use a specific set of tick values
-                    tickvals=time_groups['timestamp'][::192],  # Show every 24th timestamp (change this number as needed)
-                    ticktext=time_groups['timestamp'][::192],  # Custom labels for tick marks (you can customize this)
-                    tickangle=45  # Rotate the tick labels to make them more readable
-                )
-            )
-            st.plotly_chart(fig)
-
-        with hour_label:
-            st.header("Number of Labels over Time")
-            label_time_json = data["label_counts_per_hour"].copy()
-            del label_time_json["_label_index"]
-            time_labels = pd.DataFrame({
-                "timestamp": data["dates"],
-                **label_time_json
-            })
-            fig = go.Figure()
-            for label in label_time_json:
-                if label != "_label_index":  # Avoid plotting the '_group_index'
-                    fig.add_trace(go.Scatter(x=time_labels['timestamp'], y=time_labels[label], mode='lines', name=label, showlegend=True, hovertemplate='%{x} - %{y}<extra></extra>'))
-            fig.update_layout(
-                title="Number of Labels over Time",
-                xaxis_title="Timestamp",
-                yaxis_title="Label Counts",
-                hovermode="x unified",
-                xaxis_rangeslider_visible=False,
-                legend=dict(
-                    title="Labels",  # Title for the legend
-                    x=0.5,           # Center the legend horizontally
-                    y=1.1,         # Position the legend below the plot
-                    xanchor="center",  # Anchor the x position at the center
-                    yanchor="bottom",     # Anchor the y position at the top
-                    traceorder="normal",  # Order the traces in the legend normally
-                    font=dict(size=12),   # Font size for legend items
-                ),
-                xaxis=dict(
-                    tickmode='array',  # Use a specific set of tick values
-                    tickvals=time_labels['timestamp'][::192],  # Show every 24th timestamp (change this number as needed)
-                    ticktext=time_labels['timestamp'][::192],  # Custom labels for tick marks (you can customize this)
-                    tickangle=45  # Rotate the tick labels to make them more readable
-                )
-            )
-            st.plotly_chart(fig)
-
-        hour_repo, hour_method = st.columns(2)
-
-        with hour_repo:
-            st.header("Number of Repos over Time")
-            # print(data["group_counts_per_hour"])
-            # print("1q1q1q1q1", data["group_counts_per_hour"])
-            repo_time_json = data["repo_counts_per_hour"].copy()
-            del repo_time_json["repo_index"]
-            time_repos = pd.DataFrame({
-                "timestamp": data["dates"],
-                **repo_time_json
-            })
-            repository_index = data["repo_counts_per_hour"]["repo_index"]
-            fig = go.Figure()
-
-            # Add a trace for each repository
-            for repo in repository_index:
-                if repo is None:
-                    fig.add_trace(go.Scatter(
-                        x=time_repos['timestamp'],
-                        y=[0] * len(time_repos),  # Replace None with zero or a default value
-                        mode='lines',
-                        name="null repo",  # Label the trace as "null repo" in the legend
-                        showlegend=True,
-                        hovertemplate='%{x} - %{y}<extra></extra>'
-                    ))
-                else:
-                    fig.add_trace(go.Scatter(
-                        x=time_repos['timestamp'],
-                        y=time_repos[repo],  # Use the repository's count values
-                        mode='lines',
-                        name=repo,  # Use the repository name in the legend
-                        showlegend=True,
-                        hovertemplate='%{x} - %{y}<extra></extra>'
-                    ))
-
-            # Customize the layout
-            fig.update_layout(
-                title="Number of Repos over Time",
-                xaxis_title="Timestamp",
-                yaxis_title="Repo Counts",
-                hovermode="x unified",
-                xaxis_rangeslider_visible=False,  # Adds a range slider for zoom functionality
-                legend=dict(
-                    title="Repositories",  # Title for the legend
-                    x=0.5,                # Center the legend horizontally
-                    y=1.1,                # Position the legend above the plot
-                    xanchor='center',     # Ensure the legend is centered horizontally
-                    yanchor='bottom',     # Position the legend at the top
-                    traceorder="normal",  # Order the traces in the legend normally
-                    font=dict(size=12),   # Font size for legend items
-                ),
-                xaxis=dict(
-                    tickmode='array',  # Use a specific set of tick values
-                    tickvals=time_repos['timestamp'][::192],  # Show every 24th timestamp (change this number as needed)
-                    ticktext=time_repos['timestamp'][::192],  # Custom labels for tick marks (you can customize this)
-                    tickangle=45  # Rotate the tick labels to make them more readable
-                )
-            )
+            logger.error(f"Error building {dim} chart: {e}")
+            placeholder.error(f"Error building chart: {e}")
+            return
+        draw_chart(placeholder, fitted, granularity, top_k, dim)
+
+    @st.fragment
+    def render_chart(station, dim, granularity, window, version, width, pending=None):
+        """
+        One dashboard chart; its series selector reruns only this chart.
+
+        While pending is open (render_charts laying out the page) the figure is
+        built in the figure pool and queued on pending.charts for render_charts to
+        draw; otherwise, including when this chart reruns on its own, it is drawn inline.
+        """
+        if st.session_state.pop("zoom_changed", False):
+            # Only still set when this chart reran by itself: after a series change it is
+            # drawn inside its own fragment, which Streamlit cannot widen to render_charts,
+            # so the zoom is applied to every chart by a rerun of the app
+            st.rerun()
+        st.header(CHART_SPECS[dim][0])
+        top_k = top_k_control(dim) if dim in TOP_K_DEFAULTS else None
+        max_points, max_ticks = CHART_WIDTHS[width]
+        args = (station, granularity, dim, window, version, top_k, max_points, max_ticks, CHART_BYTE_BUDGETS[width])
+        placeholder = st.empty()
+        if pending is None or not pending.open:
+            draw_built_chart(placeholder, lambda: fitted_figure(*args), granularity, top_k, dim)
+            return
+        with placeholder.container():
+            st.caption("Loading chart...")
+        pending.charts.append((get_figure_pool().submit(fitted_figure, *args), placeholder, granularity, top_k, dim))
+
+    @st.fragment
+    def render_charts(station, window):
+        """Granularity switch and charts; switching granularity reruns only this fragment"""
+        # Charts laid out here belong to this fragment, so a zoom on one of them reruns
+        # it and is applied below without rerunning the app
+        st.session_state.pop("zoom_changed", None)
+        version = store.version(station)
+        window = zoomed_window(window)
+        if "zoom_window" in st.session_state:
+            zoom_col, reset_col = st.columns([4, 1])
+            zoom_col.caption(f"Zoomed to {window[0]:%Y-%m-%d %H:%M} - {window[1]:%Y-%m-%d %H:%M}")
+            reset_col.button("Reset zoom", on_click=clear_zoom, key="reset_zoom")
+        else:
+            st.caption("Drag across an hourly or daily chart to zoom into that range")
+        choice = st.segmented_control("Granularity", list(GRANULARITY_OPTIONS), default="Hourly",
+                                      key="active_granularity", label_visibility="collapsed") or "Hourly"
+        granularity = GRANULARITY_OPTIONS[choice]
+
+        # Lay out every chart with a placeholder first, then fill them as their figures finish
+        pending = SimpleNamespace(open=True, charts=[])
+        try:
+            for row in DASHBOARD_LAYOUT:
+                if len(row) == 1:
+                    render_chart(station, row[0], granularity, window, version, "full", pending)
+                    continue
+                for column, dim in zip(st.columns(len(row)), row):
+                    with column:
+                        render_chart(station, dim, granularity, window, version, "half", pending)
+        finally:
+            pending.open = False
+
+        # Headline chart first, the rest in completion order
+        charts = {future: chart for future, *chart in pending.charts}
+        if pending.charts:
+            headline = pending.charts[0][0]
+            placeholder, *chart = charts.pop(headline)
+            draw_built_chart(placeholder, headline.result, *chart)
+        for future in as_completed(charts):
+            placeholder, *chart = charts[future]
+            draw_built_chart(placeholder, future.result, *chart)
+
+        # When in the week the station is busy, over the same (zoomed) window
+        render_activity_heatmap(store, station, window)
+
+    render_charts(station, window)
+
+    # With this station on screen, warm the ones likely opened next under the same view settings
+    granularity = GRANULARITY_OPTIONS[st.session_state.get("active_granularity") or "Hourly"]
+    top_ks = {dim: st.session_state.get(f"top_k_{dim}", default) for dim, default in TOP_K_DEFAULTS.items()}
+    warm_window = zoomed_window(window)  # Resolved here: prefetch threads must not touch session state
+    prefetcher.schedule(
+        prefetch_session,
+        prefetcher.candidates(station, st.session_state.station_options, recent[1:]),
+        lambda name, is_current: warm_station(name, warm_window, granularity, top_ks, is_current),
+    )
 
-            # Display the plot in Streamlit using Plotly
-            st.plotly_chart(fig)
-
-        with hour_method:
-            st.header("Number of Methods over Time")
-            methods_time_json = data["method_counts_per_hour"].copy()
-            del methods_time_json["method_index"]
-            time_methods = pd.DataFrame({
-                "timestamp": data["dates"],
-                **methods_time_json
-            })
-            method_index = data["method_counts_per_hour"]["method_index"]
-            # Create the Plotly figure
-            fig = go.Figure()
-            # Add a trace for each method
-            for method in method_index:
-                fig.add_trace(go.Scatter(
-                    x=time_methods['timestamp'],
-                    y=time_methods[method],  # Use the method count values for each method
-                    mode='lines',
-                    name=method,  # Use the method name in the legend
-                    showlegend=True,
-                    hovertemplate='%{x} - %{y}<extra></extra>'
-                ))
-            # Customize the layout for better readability and style
-            fig.update_layout(
-                title="Number of Methods over Time",
-                xaxis_title="Timestamp",
-                yaxis_title="Method Count",
-                showlegend=True,  # Display the legend
-                legend=dict(
-                    title="Methods",  # Title for the legend
-                    x=0.5,                # Center the legend horizontally
-                    y=1.1,                # Position the legend above the plot
-                    xanchor='center',     # Ensure the legend is centered horizontally
-                    yanchor='bottom',     # Position the legend at the top
-                    traceorder="normal",  # Order the traces in the legend normally
-                    font=dict(size=12),   # Font size for legend items
-                ),
-                xaxis=dict(
-                    tickmode='array',  # Use a specific set of tick values
-                    tickvals=time_methods['timestamp'][::192],  # Show every 24th timestamp (change this number as needed)
-                    ticktext=time_methods['timestamp'][::192],  # Custom labels for tick marks (you can customize this)
-                    tickangle=45  # Rotate the tick labels to make them more readable
-                )
-            )
-            # Display the plotly chart in Streamlit
-            st.plotly_chart(fig)
-
-        st.header("Number of Modules over Time")
-        module_time_json = data["module_counts_per_hour"].copy()
-        del module_time_json["module_index"]
-        time_modules = pd.DataFrame({
-            "timestamp": data["dates"],
-            **module_time_json
-        })
-        module_index = data["module_counts_per_hour"]["module_index"]
-
-        # Create the Plotly figure
-        fig = go.Figure()
-
-        # Add a trace for each module
-        for module in module_index:
-            fig.add_trace(go.Scatter(
-                x=time_modules['timestamp'],
-                y=time_modules[module],  # Use the module count values for each module
-                mode='lines',
-                name=module,  # Use the module name in the legend
-                showlegend=True,
-                hovertemplate='%{x} - %{y}<extra></extra>'
-            ))
-
-        # Customize the layout for better readability and style
-        fig.update_layout(
-            title="Number of Modules over Time",
-            xaxis_title="Timestamp",
-            yaxis_title="Module Count",
-            showlegend=True,  # Display the legend
-            legend=dict(
-                    title="Modules",  # Title for the legend
-                    x=0.5,                # Center the legend horizontally
-                    y=1.1,                # Position the legend above the plot
-                    xanchor='center',     # Ensure the legend is centered horizontally
-                    yanchor='bottom',     # Position the legend at the top
-                    traceorder="normal",  # Order the traces in the legend normally
-                    font=dict(size=12),   # Font size for legend items
-                ),
-                xaxis=dict(
-                    tickmode='array',  # Use a specific set of tick values
-                    tickvals=time_methods['timestamp'][::96],  # Show every 24th timestamp (change this number as needed)
-                    ticktext=time_methods['timestamp'][::96],  # Custom labels for tick marks (you can customize this)
-                    tickangle=45  # Rotate the tick labels to make them more readable
-                )
-        )
-
-        # Display the plotly chart in Streamlit
-        st.plotly_chart(fig)
-
-    with Day:
-        st.header("Number of Test over time by Station")
-        data = sum_by_day(st.session_state.selected_station)
-        time_logs = pd.DataFrame({
-            "timestamp": data["dates"],
-            "log_counts_per_day": data["log_counts_per_day"]
-        })
-        fig = go.Figure()
-        fig.add_trace(go.Scatter(x = time_logs['timestamp'], y = time_logs['log_counts_per_day'], mode = 'lines', name = 'Log counts per day', showlegend=True, hovertemplate='%{x} - %{y}<extra></extra>'))
-        fig.update_layout(
-            title="Number of Test over time by Station",
-            xaxis_title="Timestamp",
-            yaxis_title="Log counts per day",
-            hovermode="x unified",
-            xaxis_rangeslider_visible=False,
-            legend=dict(
-                title="Tests",  # Title for the legend
-                x=0.5,           # Center the legend horizontally
-                y=1.1,         # Position the legend below the plot
-                xanchor="center",  # Anchor the x position at the center
-                yanchor="bottom",     # Anchor the y position at the top
-                traceorder="normal",  # Order the traces in the legend normally
-                font=dict(size=12),   # Font size for legend items
-            )
-        )
-        st.plotly_chart(fig)
-        # st.line_chart(time_logs, x="timestamp", y="log_counts_per_hour")
-
-        day_group, day_label = st.columns(2)
-
-        with day_group:
-            st.header("Number of Groups over Time")
-            group_time_json = data["group_counts_per_day"].copy()
-            del group_time_json["_group_index"]
-            time_groups = pd.DataFrame({
-                "timestamp": data["dates"],
-                **group_time_json
-            })
-            fig = go.Figure()
-            for group in group_time_json:
-                if group != "_group_index":  # Avoid plotting the '_group_index'
-                    fig.add_trace(go.Scatter(x=time_groups['timestamp'], y=time_groups[group], mode='lines', name=group, showlegend=True, hovertemplate='%{x} - %{y}<extra></extra>'))
-            fig.update_layout(
-                title="Number of Groups over Time",
-                xaxis_title="Timestamp",
-                yaxis_title="Group Counts Per Day",
-                hovermode="x unified",
-                xaxis_rangeslider_visible=False,
-                legend=dict(
-                    title="Groups",  # Title for the legend
-                    x=0.5,           # Center the legend horizontally
-                    y=1.1,         # Position the legend below the plot
-                    xanchor="center",  # Anchor the x position at the center
-                    yanchor="bottom",     # Anchor the y position at the top
-                    traceorder="normal",  # Order the traces in the legend normally
-                    font=dict(size=12),   # Font size for legend items
-                )
-            )
-            st.plotly_chart(fig)
-
-        with day_label:
-            st.header("Number of Labels over Time")
-            label_time_json = data["label_counts_per_day"].copy()
-            del label_time_json["_label_index"]
-            time_labels = pd.DataFrame({
-                "timestamp": data["dates"],
-                **label_time_json
-            })
-            fig = go.Figure()
-            for label in label_time_json:
-                if label != "_label_index":  # Avoid plotting the '_group_index'
-                    fig.add_trace(go.Scatter(x=time_labels['timestamp'], y=time_labels[label], mode='lines', name=label, showlegend=True, hovertemplate='%{x} - %{y}<extra></extra>'))
-            fig.update_layout(
-                title="Number of Labels over Time",
-                xaxis_title="Timestamp",
-                yaxis_title="Label Counts Per Day",
-                hovermode="x unified",
-                xaxis_rangeslider_visible=False,
-                legend=dict(
-                    title="Labels",  # Title for the legend
-                    x=0.5,           # Center the legend horizontally
-                    y=1.1,         # Position the legend below the plot
-                    xanchor="center",  # Anchor the x position at the center
-                    yanchor="bottom",     # Anchor the y position at the top
-                    traceorder="normal",  # Order the traces in the legend normally
-                    font=dict(size=12),   # Font size for legend items
-                )
-            )
-            st.plotly_chart(fig)
-
-        day_repo, day_method = st.columns(2)
-
-        with day_repo:
-            st.header("Number of Repos over Time")
-            # print(data["group_counts_per_hour"])
-            # print("1q1q1q1q1", data["group_counts_per_hour"])
-            repo_time_json = data["repo_counts_per_day"].copy()
-            del repo_time_json["repo_index"]
-            time_repos = pd.DataFrame({
-                "timestamp": data["dates"],
-                **repo_time_json
-            })
-            repository_index = data["repo_counts_per_day"]["repo_index"]
-            fig = go.Figure()
-
-            # Add a trace for each repository
-            for repo in repository_index:
-                if repo is None:
-                    fig.add_trace(go.Scatter(
-                        x=time_repos['timestamp'],
-                        y=[0] * len(time_repos),  # Replace None with zero or a default value
-                        mode='lines',
-                        name="null repo",  # Label the trace as "null repo" in the legend
-                        showlegend=True,
-                        hovertemplate='%{x} - %{y}<extra></extra>'
-                    ))
+elif view == "Fleet Comparison":
+    start_date, end_date = render_date_filter()
+    try:
+        latest_metrics = get_latest_metrics(CONNECTION_STRING, DATABASE_NAME, METRICS_COLLECTION)
+    except Exception as e:
+        st.error(f"Error getting latest metrics: {e}")
+        latest_metrics = {}
+    render_fleet_comparison(store, (start_date, end_date), latest_metrics)
+
+else:
+    @st.fragment
+    def render_metrics_view():
+        """Metrics view; its own widgets (e.g. Refresh Data) rerun only this fragment"""
+        # Metrics Tab
+        # Function to get metrics for the selected station
+        @st.cache_data(ttl=60)  # Cache for 1 minute
+        def get_station_metrics(station, group=None, label=None, repo=None, module=None):
+            """Get metrics for the selected station with optional filters"""
+            try:
+                client = pymongo.MongoClient(CONNECTION_STRING)
+                db = client[DATABASE_NAME]
+                metrics_col = db[METRICS_COLLECTION]
+            
+                # Build query based on filters
+                query = None
+            
+                # Check for dimension-specific data first (group, label, repo, module)
+                if group:
+                    query = {"station": station, "group": group, "has_dimension_data": True}
+                elif label:
+                    query = {"station": station, "label": label, "has_dimension_data": True}
+                elif repo:
+                    query = {"station": station, "repo": repo, "has_dimension_data": True}
+                elif module:
+                    query = {"station": station, "module": module, "has_dimension_data": True}
                 else:
-                    fig.add_trace(go.Scatter(
-                        x=time_repos['timestamp'],
-                        y=time_repos[repo],  # Use the repository's count values
-                        mode='lines',
-                        name=repo,  # Use the repository name in the legend
-                        showlegend=True,
-                        hovertemplate='%{x} - %{y}<extra></extra>'
-                    ))
-
-            # Customize the layout
-            fig.update_layout(
-                title="Number of Repos over Time",
-                xaxis_title="Timestamp",
-                yaxis_title="Repo Counts Per Day",
-                hovermode="x unified",
-                xaxis_rangeslider_visible=False,  # Adds a range slider for zoom functionality
-                legend=dict(
-                    title="Repositories",  # Title for the legend
-                    x=0.5,                # Center the legend horizontally
-                    y=1.1,                # Position the legend above the plot
-                    xanchor='center',     # Ensure the legend is centered horizontally
-                    yanchor='bottom',     # Position the legend at the top
-                    traceorder="normal",  # Order the traces in the legend normally
-                    font=dict(size=12),   # Font size for legend items
-                )
-            )
-
-            # Display the plot in Streamlit using Plotly
-            st.plotly_chart(fig)
-
-        with day_method:
-            st.header("Number of Methods over Time")
-            methods_time_json = data["method_counts_per_day"].copy()
-            del methods_time_json["method_index"]
-            time_methods = pd.DataFrame({
-                "timestamp": data["dates"],
-                **methods_time_json
-            })
-            method_index = data["method_counts_per_day"]["method_index"]
-            # Create the Plotly figure
-            fig = go.Figure()
-            # Add a trace for each method
-            for method in method_index:
-                fig.add_trace(go.Scatter(
-                    x=time_methods['timestamp'],
-                    y=time_methods[method],  # Use the method count values for each method
-                    mode='lines',
-                    name=method,  # Use the method name in the legend
-                    showlegend=True,
-                    hovertemplate='%{x} - %{y}<extra></extra>'
-                ))
-            # Customize the layout for better readability and style
-            fig.update_layout(
-                title="Number of Methods over Time",
-                xaxis_title="Timestamp",
-                yaxis_title="Method Count Per Day",
-                showlegend=True,  # Display the legend
-                legend=dict(
-                    title="Methods",  # Title for the legend
-                    x=0.5,                # Center the legend horizontally
-                    y=1.1,                # Position the legend above the plot
-                    xanchor='center',     # Ensure the legend is centered horizontally
-                    yanchor='bottom',     # Position the legend at the top
-                    traceorder="normal",  # Order the traces in the legend normally
-                    font=dict(size=12),   # Font size for legend items
-                )
-            )
-            # Display the plotly chart in Streamlit
-            st.plotly_chart(fig)
-
-        st.header("Number of Modules over Time")
-        module_time_json = data["module_counts_per_day"].copy()
-        del module_time_json["module_index"]
-        time_modules = pd.DataFrame({
-            "timestamp": data["dates"],
-            **module_time_json
-        })
-        module_index = data["module_counts_per_day"]["module_index"]
-
-        # Create the Plotly figure
-        fig = go.Figure()
-
-        # Add a trace for each module
-        for module in module_index:
-            fig.add_trace(go.Scatter(
-                x=time_modules['timestamp'],
-                y=time_modules[module],  # Use the module count values for each module
-                mode='lines',
-                name=module,  # Use the module name in the legend
-                showlegend=True,
-                hovertemplate='%{x} - %{y}<extra></extra>'
-            ))
-
-        # Customize the layout for better readability and style
-        fig.update_layout(
-            title="Number of Modules over Time",
-            xaxis_title="Timestamp",
-            yaxis_title="Module Count Per Day",
-            showlegend=True,  # Display the legend
-            legend=dict(
-                    title="Modules",  # Title for the legend
-                    x=0.5,                # Center the legend horizontally
-                    y=1.1,                # Position the legend above the plot
-                    xanchor='center',     # Ensure the legend is centered horizontally
-                    yanchor='bottom',     # Position the legend at the top
-                    traceorder="normal",  # Order the traces in the legend normally
-                    font=dict(size=12),   # Font size for legend items
-                )
-        )
-
-        # Display the plotly chart in Streamlit
-        st.plotly_chart(fig)
-
-    with Month:
-        st.header("Number of Test over time by Station")
-        data = sum_by_month(st.session_state.selected_station)
-        time_logs = pd.DataFrame({
-            "timestamp": data["dates"],
-            "log_counts_per_month": data["log_counts_per_month"]
-        })
-        fig = go.Figure()
-        fig.add_trace(go.Scatter(x = time_logs['timestamp'], y = time_logs['log_counts_per_month'], mode = 'lines', name = 'Log counts per month', showlegend=True, hovertemplate='%{x} - %{y}<extra></extra>'))
-        fig.update_layout(
-            title="Number of Test over time by Station",
-            xaxis_title="Timestamp",
-            yaxis_title="Log counts per month",
-            hovermode="x unified",
-            xaxis_rangeslider_visible=False,
-            legend=dict(
-                title="Tests",  # Title for the legend
-                x=0.5,           # Center the legend horizontally
-                y=1.1,         # Position the legend below the plot
-                xanchor="center",  # Anchor the x position at the center
-                yanchor="bottom",     # Anchor the y position at the top
-                traceorder="normal",  # Order the traces in the legend normally
-                font=dict(size=12),   # Font size for legend items
-            )
-        )
-        st.plotly_chart(fig)
-        # st.line_chart(time_logs, x="timestamp", y="log_counts_per_hour")
-
-        month_group, month_label = st.columns(2)
-
-        with month_group:
-            st.header("Number of Groups over Time")
-            group_time_json = data["group_counts_per_month"].copy()
-            del group_time_json["_group_index"]
-            time_groups = pd.DataFrame({
-                "timestamp": data["dates"],
-                **group_time_json
-            })
-            fig = go.Figure()
-            for group in group_time_json:
-                if group != "_group_index":  # Avoid plotting the '_group_index'
-                    fig.add_trace(go.Scatter(x=time_groups['timestamp'], y=time_groups[group], mode='lines', name=group, showlegend=True, hovertemplate='%{x} - %{y}<extra></extra>'))
-            fig.update_layout(
-                title="Number of Groups over Time",
-                xaxis_title="Timestamp",
-                yaxis_title="Group Counts Per Month",
-                hovermode="x unified",
-                xaxis_rangeslider_visible=False,
-                legend=dict(
-                    title="Groups",  # Title for the legend
-                    x=0.5,           # Center the legend horizontally
-                    y=1.1,         # Position the legend below the plot
-                    xanchor="center",  # Anchor the x position at the center
-                    yanchor="bottom",     # Anchor the y position at the top
-                    traceorder="normal",  # Order the traces in the legend normally
-                    font=dict(size=12),   # Font size for legend items
-                )
-            )
-            st.plotly_chart(fig)
-
-        with month_label:
-            st.header("Number of Labels over Time")
-            label_time_json = data["label_counts_per_month"].copy()
-            del label_time_json["_label_index"]
-            time_labels = pd.DataFrame({
-                "timestamp": data["dates"],
-                **label_time_json
-            })
-            fig = go.Figure()
-            for label in label_time_json:
-                if label != "_label_index":  # Avoid plotting the '_group_index'
-                    fig.add_trace(go.Scatter(x=time_labels['timestamp'], y=time_labels[label], mode='lines', name=label, showlegend=True, hovertemplate='%{x} - %{y}<extra></extra>'))
-            fig.update_layout(
-                title="Number of Labels over Time",
-                xaxis_title="Timestamp",
-                yaxis_title="Label Counts Per Month",
-                hovermode="x unified",
-                xaxis_rangeslider_visible=False,
-                legend=dict(
-                    title="Labels",  # Title for the legend
-                    x=0.5,           # Center the legend horizontally
-                    y=1.1,         # Position the legend below the plot
-                    xanchor="center",  # Anchor the x position at the center
-                    yanchor="bottom",     # Anchor the y position at the top
-                    traceorder="normal",  # Order the traces in the legend normally
-                    font=dict(size=12),   # Font size for legend items
-                )
-            )
-            st.plotly_chart(fig)
-
-        month_repo, month_method = st.columns(2)
-
-        with month_repo:
-            st.header("Number of Repos over Time")
-            # print(data["group_counts_per_hour"])
-            # print("1q1q1q1q1", data["group_counts_per_hour"])
-            repo_time_json = data["repo_counts_per_month"].copy()
-            del repo_time_json["repo_index"]
-            time_repos = pd.DataFrame({
-                "timestamp": data["dates"],
-                **repo_time_json
-            })
-            repository_index = data["repo_counts_per_month"]["repo_index"]
-            fig = go.Figure()
-
-            # Add a trace for each repository
-            for repo in repository_index:
-                if repo is None:
-                    fig.add_trace(go.Scatter(
-                        x=time_repos['timestamp'],
-                        y=[0] * len(time_repos),  # Replace None with zero or a default value
-                        mode='lines',
-                        name="null repo",  # Label the trace as "null repo" in the legend
-                        showlegend=True,
-                        hovertemplate='%{x} - %{y}<extra></extra>'
-                    ))
-                else:
-                    fig.add_trace(go.Scatter(
-                        x=time_repos['timestamp'],
-                        y=time_repos[repo],  # Use the repository's count values
-                        mode='lines',
-                        name=repo,  # Use the repository name in the legend
-                        showlegend=True,
-                        hovertemplate='%{x} - %{y}<extra></extra>'
-                    ))
-
-            # Customize the layout
-            fig.update_layout(
-                title="Number of Repos over Time",
-                xaxis_title="Timestamp",
-                yaxis_title="Repo Counts Per Month",
-                hovermode="x unified",
-                xaxis_rangeslider_visible=False,  # Adds a range slider for zoom functionality
-                legend=dict(
-                    title="Repositories",  # Title for the legend
-                    x=0.5,                # Center the legend horizontally
-                    y=1.1,                # Position the legend above the plot
-                    xanchor='center',     # Ensure the legend is centered horizontally
-                    yanchor='bottom',     # Position the legend at the top
-                    traceorder="normal",  # Order the traces in the legend normally
-                    font=dict(size=12),   # Font size for legend items
-                )
-            )
-
-            # Display the plot in Streamlit using Plotly
-            st.plotly_chart(fig)
-
-        with month_method:
-            st.header("Number of Methods over Time")
-            methods_time_json = data["method_counts_per_month"].copy()
-            del methods_time_json["method_index"]
-            time_methods = pd.DataFrame({
-                "timestamp": data["dates"],
-                **methods_time_json
-            })
-            method_index = data["method_counts_per_month"]["method_index"]
-            # Create the Plotly figure
-            fig = go.Figure()
-            # Add a trace for each method
-            for method in method_index:
-                fig.add_trace(go.Scatter(
-                    x=time_methods['timestamp'],
-                    y=time_methods[method],  # Use the method count values for each method
-                    mode='lines',
-                    name=method,  # Use the method name in the legend
-                    showlegend=True,
-                    hovertemplate='%{x} - %{y}<extra></extra>'
-                ))
-            # Customize the layout for better readability and style
-            fig.update_layout(
-                title="Number of Methods over Time",
-                xaxis_title="Timestamp",
-                yaxis_title="Method Count Per Month",
-                showlegend=True,  # Display the legend
-                legend=dict(
-                    title="Methods",  # Title for the legend
-                    x=0.5,                # Center the legend horizontally
-                    y=1.1,                # Position the legend above the plot
-                    xanchor='center',     # Ensure the legend is centered horizontally
-                    yanchor='bottom',     # Position the legend at the top
-                    traceorder="normal",  # Order the traces in the legend normally
-                    font=dict(size=12),   # Font size for legend items
-                )
-            )
-            # Display the plotly chart in Streamlit
-            st.plotly_chart(fig)
-
-        st.header("Number of Modules over Time")
-        module_time_json = data["module_counts_per_month"].copy()
-        del module_time_json["module_index"]
-        time_modules = pd.DataFrame({
-            "timestamp": data["dates"],
-            **module_time_json
-        })
-        module_index = data["module_counts_per_month"]["module_index"]
-
-        # Create the Plotly figure
-        fig = go.Figure()
-
-        # Add a trace for each module
-        for module in module_index:
-            fig.add_trace(go.Scatter(
-                x=time_modules['timestamp'],
-                y=time_modules[module],  # Use the module count values for each module
-                mode='lines',
-                name=module,  # Use the module name in the legend
-                showlegend=True,
-                hovertemplate='%{x} - %{y}<extra></extra>'
-            ))
-
-        # Customize the layout for better readability and style
-        fig.update_layout(
-            title="Number of Modules over Time",
-            xaxis_title="Timestamp",
-            yaxis_title="Module Count Per Month",
-            showlegend=True,  # Display the legend
-            legend=dict(
-                    title="Modules",  # Title for the legend
-                    x=0.5,                # Center the legend horizontally
-                    y=1.1,                # Position the legend above the plot
-                    xanchor='center',     # Ensure the legend is centered horizontally
-                    yanchor='bottom',     # Position the legend at the top
-                    traceorder="normal",  # Order the traces in the legend normally
-                    font=dict(size=12),   # Font size for legend items
-                )
-        )
-
-        # Display the plotly chart in Streamlit
-        st.plotly_chart(fig)
-
-with Metrics_Calculation_API:
-    # Metrics Tab
-    # Function to get metrics for the selected station
-    @st.cache_data(ttl=60)  # Cache for 1 minute
-    def get_station_metrics(station, group=None, label=None, repo=None, module=None):
-        """Get metrics for the selected station with optional filters"""
-        try:
-            client = pymongo.MongoClient(CONNECTION_STRING)
-            db = client[DATABASE_NAME]
-            metrics_col = db[METRICS_COLLECTION]
-            
-            # Build query based on filters
-            query = None
-            
-            # Check for dimension-specific data first (group, label, repo, module)
-            if group:
-                query = {"station": station, "group": group, "has_dimension_data": True}
-            elif label:
-                query = {"station": station, "label": label, "has_dimension_data": True}
-            elif repo:
-                query = {"station": station, "repo": repo, "has_dimension_data": True}
-            elif module:
-                query = {"station": station, "module": module, "has_dimension_data": True}
-            else:
-                # No dimension filters, get station-level metrics
-                query = {"station": station}
+                    # No dimension filters, get station-level metrics
+                    query = {"station": station}
             
-            # Get the metrics document
-            metrics_doc = metrics_col.find_one(
-                query,
-                sort=[("timestamp", -1)]
-            )
-            
-            # If no dimension-specific metrics found but dimension filter was applied, fall back to station-level metrics
-            if not metrics_doc and any([group, label, repo, module]):
-                fallback_query = {"station": station, "has_dimension_data": {"$exists": False}}
+                # Get the metrics document
                 metrics_doc = metrics_col.find_one(
-                    fallback_query,
+                    query,
                     sort=[("timestamp", -1)]
                 )
             
-            # If still no metrics found and this might be an individual station from a group, 
-            # try looking for metrics with is_split_station flag
-            if not metrics_doc:
-                split_query = {"station": station, "is_split_station": True}
-                metrics_doc = metrics_col.find_one(
-                    split_query,
-                    sort=[("timestamp", -1)]
-                )
+                # If no dimension-specific metrics found but dimension filter was applied, fall back to station-level metrics
+                if not metrics_doc and any([group, label, repo, module]):
+                    fallback_query = {"station": station, "has_dimension_data": {"$exists": False}}
+                    metrics_doc = metrics_col.find_one(
+                        fallback_query,
+                        sort=[("timestamp", -1)]
+                    )
+            
+                # If still no metrics found and this might be an individual station from a group, 
+                # try looking for metrics with is_split_station flag
+                if not metrics_doc:
+                    split_query = {"station": station, "is_split_station": True}
+                    metrics_doc = metrics_col.find_one(
+                        split_query,
+                        sort=[("timestamp", -1)]
+                    )
                 
-                # If found, add an indicator that this is from a split station
-                if metrics_doc:
-                    metrics_doc["from_split"] = True
-            
-            client.close()
-            
-            if not metrics_doc:
-                return {}
-            
-            # Convert from BSON to regular Python dict
-            metrics = dict(metrics_doc)
-            
-            # Handle ObjectId and other non-serializable types
-            for key, value in list(metrics.items()):
-                if isinstance(value, ObjectId):
-                    metrics[key] = str(value)
-                elif isinstance(value, datetime):
-                    metrics[key] = str(value)
-            
-            # Handle missing data
-            if metrics.get("missing_data", False):
-                # Set reasonable defaults for missing values to prevent UI errors
-                # But maintain the "missing_data" flag so UI can indicate this properly
-                if metrics.get("utilization_rate") is None:
-                    metrics["utilization_rate"] = 0
+                    # If found, add an indicator that this is from a split station
+                    if metrics_doc:
+                        metrics_doc["from_split"] = True
+            
+                client.close()
+            
+                if not metrics_doc:
+                    return {}
+            
+                # Convert from BSON to regular Python dict
+                metrics = dict(metrics_doc)
+            
+                # Handle ObjectId and other non-serializable types
+                for key, value in list(metrics.items()):
+                    if isinstance(value, ObjectId):
+                        metrics[key] = str(value)
+                    elif isinstance(value, datetime):
+                        metrics[key] = str(value)
+            
+                # Handle missing data
+                if metrics.get("missing_data", False):
+                    # Set reasonable defaults for missing values to prevent UI errors
+                    # But maintain the "missing_data" flag so UI can indicate this properly
+                    if metrics.get("utilization_rate") is None:
+                        metrics["utilization_rate"] = 0
                 
-                if metrics.get("downtime_percentage") is None:
-                    metrics["downtime_percentage"] = 0
+                    if metrics.get("downtime_percentage") is None:
+                        metrics["downtime_percentage"] = 0
                 
-                if metrics.get("mtbf_hours") is None:
-                    metrics["mtbf_hours"] = 0
+                    if metrics.get("mtbf_hours") is None:
+                        metrics["mtbf_hours"] = 0
                 
-                if metrics.get("mttr_hours") is None:
-                    metrics["mttr_hours"] = 0
+                    if metrics.get("mttr_hours") is None:
+                        metrics["mttr_hours"] = 0
                 
-                if metrics.get("avg_test_duration_minutes") is None:
-                    metrics["avg_test_duration_minutes"] = 0
+                    if metrics.get("avg_test_duration_minutes") is None:
+                        metrics["avg_test_duration_minutes"] = 0
             
-            return metrics
-        except Exception as e:
-            st.error(f"Error getting metrics: {e}")
-            return {}
-
-    @st.cache_data(ttl=60)
-    def get_group_metrics(station):
-        """Get metrics broken down by groups for the selected station"""
-        try:
-            metrics = get_station_metrics(station)
-            return metrics.get("group_metrics", {})
-        except Exception as e:
-            st.error(f"Error getting group metrics: {e}")
-            return {}
-
-    # Get metrics for the selected station
-    metrics = get_station_metrics(
-        st.session_state.selected_station,
-        group=st.session_state.selected_group,
-        label=st.session_state.selected_label,
-        repo=st.session_state.selected_repo,
-        module=st.session_state.selected_module
-    )
+                return metrics
+            except Exception as e:
+                st.error(f"Error getting metrics: {e}")
+                return {}
 
-    group_metrics = None
-    if st.session_state.selected_station and not any([
-        st.session_state.selected_group, 
-        st.session_state.selected_label,
-        st.session_state.selected_repo,
-        st.session_state.selected_module
-    ]):
-        group_metrics = get_group_metrics(st.session_state.selected_station)
-
-    # Display refresh button
-    if st.button("🔄 Refresh Data"):
-        get_station_metrics.clear()
-        st.rerun()
+        @st.cache_data(ttl=60)
+        def get_group_metrics(station):
+            """Get metrics broken down by groups for the selected station"""
+            try:
+                metrics = get_station_metrics(station)
+                return metrics.get("group_metrics", {})
+            except Exception as e:
+                st.error(f"Error getting group metrics: {e}")
+                return {}
 
-    # Show metrics dashboard if metrics exist
-    if metrics:
-        success_msg = f"Showing metrics for {st.session_state.selected_station}"
+        # "All ..." means no filter on that level
+        filters = {
+            field: value for field, value in (
+                ("group", st.session_state.selected_group), ("label", st.session_state.selected_label),
+                ("repo", st.session_state.selected_repo), ("module", st.session_state.selected_module))
+            if value not in ALL_OPTIONS.values()
+        }
+
+        # Get metrics for the selected station
+        metrics = get_station_metrics(st.session_state.selected_station, **filters)
+
+        group_metrics = None
+        if st.session_state.selected_station and not filters:
+            group_metrics = get_group_metrics(st.session_state.selected_station)
+
+        # Display refresh button
+        if st.button("🔄 Refresh Data"):
+            get_station_metrics.clear()
+            st.rerun(scope="fragment")
+
+        # Show metrics dashboard if metrics exist
+        if metrics:
+            # Gauges and group lists are built once per metrics document; revisiting a station reuses them
+            # The document's timestamp, or its _id for documents written without one
+            metrics_version = metrics.get("timestamp") or metrics.get("_id")
+            model = metrics_view_model(st.session_state.selected_station, tuple(sorted(filters.items())),
+                                       metrics_version, metrics, group_metrics)
+            gauges, values, group_lists = model["gauges"], model["values"], model["group_lists"]
+
+            success_msg = f"Showing metrics for {st.session_state.selected_station}"
+            for field, title in (("group", "Group"), ("label", "Label"), ("repo", "Repository"), ("module", "Module")):
+                if field in filters:
+                    success_msg += f" → {title}: {filters[field]}"
         
-        if st.session_state.selected_group:
-            success_msg += f" → Group: {st.session_state.selected_group}"
+            # Check if we're showing dimension-specific metrics
+            if metrics.get("has_dimension_data", False):
+                success_msg += " (Using dimension-specific metrics)"
         
-        if st.session_state.selected_label:
-            success_msg += f" → Label: {st.session_state.selected_label}"
-        
-        if st.session_state.selected_repo:
-            success_msg += f" → Repository: {st.session_state.selected_repo}"
-            
-        if st.session_state.selected_module:
-            success_msg += f" → Module: {st.session_state.selected_module}"
-        
-        # Check if we're showing dimension-specific metrics
-        if metrics.get("has_dimension_data", False):
-            success_msg += " (Using dimension-specific metrics)"
-        
-        st.success(success_msg)
+            st.success(success_msg)
 
-        # Create metrics dashboard
-        col1, col2 = st.columns(2)
+            # Create metrics dashboard
+            col1, col2 = st.columns(2)
         
-        with col1:
-            st.markdown('<div class="section-header">1. Equipment Utilization Metrics</div>', unsafe_allow_html=True)
-            
-            # Utilization Rate card with gauge chart
-            st.markdown('<div class="metric-card">', unsafe_allow_html=True)
-            st.markdown('<div class="metric-title">Utilization Rate (%)</div>', unsafe_allow_html=True)
-            st.markdown('<div class="metric-formula">(Actual Usage Time / Total Available Time) × 100</div>', unsafe_allow_html=True)
-            
-            # Get utilization rate safely
-            utilization_data = safe_get_metric(metrics, 'utilization_rate', 0)
-            utilization = utilization_data["value"]
-            is_missing = utilization_data["is_missing"]
-            
-            # Create gauge chart for utilization rate
-            util_fig = create_gauge_chart(
-                value=utilization,
-                title="Equipment Utilization",
-                good_threshold=75,
-                warning_threshold=50,
-                is_missing=is_missing
-            )
-            st.plotly_chart(util_fig, use_container_width=True)
-            
-            # Display utilization by groups if available
-            if group_metrics and len(group_metrics) > 0:
-                st.markdown("<b>Utilization by Group:</b>", unsafe_allow_html=True)
-                
-                # Check if we have any groups with utilization values
-                has_util_data = any(group_data.get("utilization") is not None for group_data in group_metrics.values())
-                
-                if has_util_data:
-                    # Define safe sort key
-                    def util_sort_key(item):
-                        util = item[1].get("utilization")
-                        return util if util is not None else -1  # Put None values at the end
-                    
-                    # Sort groups by utilization
-                    sorted_groups = sorted(group_metrics.items(), key=util_sort_key, reverse=True)
-                    
-                    # Display top 5 groups
-                    for group, group_data in sorted_groups[:5]:
-                        util_value = group_data.get("utilization")
-                        if util_value is not None:
-                            # Add color indicators based on value
-                            if util_value >= 75:
-                                indicator = '<span class="good-indicator">■</span>'
-                            elif util_value >= 50:
-                                indicator = '<span class="warning-indicator">■</span>'
-                            else:
-                                indicator = '<span class="danger-indicator">■</span>'
-                            
-                            st.markdown(f"- {indicator} {group}: {util_value:.1f}%", unsafe_allow_html=True)
-                    
-                    # Show count message if there are more
-                    if len(sorted_groups) > 5:
-                        st.markdown(f"<i>and {len(sorted_groups) - 5} more groups...</i>", unsafe_allow_html=True)
+            with col1:
+                st.markdown('<div class="section-header">1. Equipment Utilization Metrics</div>', unsafe_allow_html=True)
+            
+                # Utilization Rate card with gauge chart
+                st.markdown('<div class="metric-card">', unsafe_allow_html=True)
+                st.markdown('<div class="metric-title">Utilization Rate (%)</div>', unsafe_allow_html=True)
+                st.markdown('<div class="metric-formula">(Actual Usage Time / Total Available Time) × 100</div>', unsafe_allow_html=True)
+                st.plotly_chart(gauges["utilization"], use_container_width=True)
+                if "utilization" in group_lists:
+                    st.markdown(group_lists["utilization"], unsafe_allow_html=True)
+                st.markdown('</div>', unsafe_allow_html=True)
+            
+                # Downtime card
+                st.markdown('<div class="metric-card">', unsafe_allow_html=True)
+                st.markdown('<div class="metric-title">Downtime (%)</div>', unsafe_allow_html=True)
+                st.markdown('<div class="metric-formula">(Downtime Hours / Total Available Hours) × 100</div>', unsafe_allow_html=True)
+                st.plotly_chart(gauges["downtime"], use_container_width=True)
+                if values["downtime"] is not None:
+                    st.markdown(f"<b>Current Downtime:</b> {values['downtime']:.1f}%", unsafe_allow_html=True)
+                st.markdown('</div>', unsafe_allow_html=True)
+            
+                 # Test Execution Metrics
+                st.markdown('<div class="section-header">2. Test Execution Metrics</div>', unsafe_allow_html=True)
+            
+                # Tests Per Day
+                st.markdown('<div class="metric-card">', unsafe_allow_html=True)
+                st.markdown('<div class="metric-title">Tests Per Equipment Per Day</div>', unsafe_allow_html=True)
+                st.markdown('<div class="metric-formula">Total Tests / (Equipment Units × Days)</div>', unsafe_allow_html=True)
+                if values["tests_per_day"] is None:
+                    st.markdown('<div class="metric-value missing-data">No Data</div>', unsafe_allow_html=True)
                 else:
-                    st.markdown("<i>No utilization data available for groups</i>", unsafe_allow_html=True)
-            
-            st.markdown('</div>', unsafe_allow_html=True)
-            
-            # Downtime card
-            st.markdown('<div class="metric-card">', unsafe_allow_html=True)
-            st.markdown('<div class="metric-title">Downtime (%)</div>', unsafe_allow_html=True)
-            st.markdown('<div class="metric-formula">(Downtime Hours / Total Available Hours) × 100</div>', unsafe_allow_html=True)
-            
-            # Get downtime percentage safely
-            downtime_data = safe_get_metric(metrics, 'downtime_percentage', 0)
-            downtime = downtime_data["value"]
-            is_missing = downtime_data["is_missing"]
-            
-            # Create gauge chart for downtime
-            downtime_fig = create_gauge_chart(
-                value=downtime,
-                title="Equipment Downtime",
-                good_threshold=10,  # Lower is better for downtime
-                warning_threshold=35,
-                is_missing=is_missing
-            )
-            st.plotly_chart(downtime_fig, use_container_width=True)
-            
-            # Show downtime by station if available
-            if not is_missing:
-                st.markdown(f"<b>Current Downtime:</b> {downtime:.1f}%", unsafe_allow_html=True)
-            
-            st.markdown('</div>', unsafe_allow_html=True)
-            
-             # Test Execution Metrics
-            st.markdown('<div class="section-header">2. Test Execution Metrics</div>', unsafe_allow_html=True)
-            
-            # Tests Per Day
-            st.markdown('<div class="metric-card">', unsafe_allow_html=True)
-            st.markdown('<div class="metric-title">Tests Per Equipment Per Day</div>', unsafe_allow_html=True)
-            st.markdown('<div class="metric-formula">Total Tests / (Equipment Units × Days)</div>', unsafe_allow_html=True)
-            
-            # Get tests per day safely
-            tests_per_day_data = safe_get_metric(metrics, 'tests_per_day', 0)
-            tests_per_day = tests_per_day_data["value"]
-            is_missing = tests_per_day_data["is_missing"]
-            
-            if is_missing:
-                st.markdown('<div class="metric-value missing-data">No Data</div>', unsafe_allow_html=True)
-            else:
-                st.markdown(f'<div class="metric-value">{tests_per_day:.1f}</div>', unsafe_allow_html=True)
-            
-            # Show tests by group if available
-            if group_metrics and len(group_metrics) > 0:
-                st.markdown("<b>Test Counts by Group:</b>", unsafe_allow_html=True)
-                
-                # Define safe sort key for count
-                def count_sort_key(item):
-                    count = item[1].get("count")
-                    return count if count is not None else -1
-                
-                # Sort groups by count
-                sorted_by_count = sorted(group_metrics.items(), key=count_sort_key, reverse=True)
-                
-                # Display top 5 groups
-                for group, group_data in sorted_by_count[:5]:
-                    if group_data.get("count") is not None:
-                        st.markdown(f"- {group}: {group_data['count']} tests", unsafe_allow_html=True)
-                
-                # Show count message if there are more
-                if len(sorted_by_count) > 5:
-                    st.markdown(f"<i>and {len(sorted_by_count) - 5} more groups...</i>", unsafe_allow_html=True)
-            
-            st.markdown('</div>', unsafe_allow_html=True)
-            
-            # Average Test Duration
-            st.markdown('<div class="metric-card">', unsafe_allow_html=True)
-            st.markdown('<div class="metric-title">Average Test Duration</div>', unsafe_allow_html=True)
-            st.markdown('<div class="metric-formula">Total Test Time / Total Tests Conducted</div>', unsafe_allow_html=True)
-            
-            # Get average test duration safely
-            avg_duration_data = safe_get_metric(metrics, 'avg_test_duration_minutes', 0)
-            avg_duration = avg_duration_data["value"]
-            is_missing = avg_duration_data["is_missing"]
-            
-            if is_missing:
-                st.markdown('<div class="metric-value missing-data">No Data</div>', unsafe_allow_html=True)
-            else:
-                st.markdown(f'<div class="metric-value">{avg_duration:.2f} min</div>', unsafe_allow_html=True)
-            
-            # Show duration by group if available
-            if group_metrics and len(group_metrics) > 0:
-                st.markdown("<b>Test Duration by Group:</b>", unsafe_allow_html=True)
-                
-                # Check if we have any groups with avg_duration values
-                has_duration_data = any(group_data.get("avg_duration") is not None for group_data in group_metrics.values())
-                
-                if has_duration_data:
-                    # Define safe sort key for duration
-                    def duration_sort_key(item):
-                        duration = item[1].get("avg_duration")
-                        return duration if duration is not None else -1
-                    
-                    # Sort groups by duration
-                    sorted_by_duration = sorted(group_metrics.items(), key=duration_sort_key, reverse=True)
-                    
-                    # Display top 5 groups
-                    for group, group_data in sorted_by_duration[:5]:
-                        duration = group_data.get("avg_duration")
-                        if duration is not None:
-                            st.markdown(f"- {group}: {duration:.2f} min", unsafe_allow_html=True)
-                    
-                    # Show count message if there are more
-                    if len(sorted_by_duration) > 5:
-                        st.markdown(f"<i>and {len(sorted_by_duration) - 5} more groups...</i>", unsafe_allow_html=True)
+                    st.markdown(f'<div class="metric-value">{values["tests_per_day"]:.1f}</div>', unsafe_allow_html=True)
+                if "count" in group_lists:
+                    st.markdown(group_lists["count"], unsafe_allow_html=True)
+                st.markdown('</div>', unsafe_allow_html=True)
+            
+                # Average Test Duration
+                st.markdown('<div class="metric-card">', unsafe_allow_html=True)
+                st.markdown('<div class="metric-title">Average Test Duration</div>', unsafe_allow_html=True)
+                st.markdown('<div class="metric-formula">Total Test Time / Total Tests Conducted</div>', unsafe_allow_html=True)
+                if values["avg_duration"] is None:
+                    st.markdown('<div class="metric-value missing-data">No Data</div>', unsafe_allow_html=True)
                 else:
-                    st.markdown("<i>No duration data available for groups</i>", unsafe_allow_html=True)
-            
-            st.markdown('</div>', unsafe_allow_html=True)
+                    st.markdown(f'<div class="metric-value">{values["avg_duration"]:.2f} min</div>', unsafe_allow_html=True)
+                if "duration" in group_lists:
+                    st.markdown(group_lists["duration"], unsafe_allow_html=True)
+                st.markdown('</div>', unsafe_allow_html=True)
         
-        with col2:
-            st.markdown('<div class="section-header">3. Maintenance & Calibration Metrics</div>', unsafe_allow_html=True)
-            
-            # MTBF
-            st.markdown('<div class="metric-card">', unsafe_allow_html=True)
-            st.markdown('<div class="metric-title">Mean Time Between Failures (MTBF)</div>', unsafe_allow_html=True)
-            st.markdown('<div class="metric-formula">Total Operating Time / Number of Failures</div>', unsafe_allow_html=True)
-            
-            # Get MTBF safely
-            mtbf_data = safe_get_metric(metrics, 'mtbf_hours', 0)
-            mtbf = mtbf_data["value"]
-            is_missing = mtbf_data["is_missing"]
-            
-            if is_missing:
-                # Create gauge with missing data indicator
-                mtbf_fig = create_gauge_chart(
-                    value=0,
-                    title="MTBF (hours)",
-                    good_threshold=75,
-                    warning_threshold=40,
-                    is_missing=True
-                )
-                st.plotly_chart(mtbf_fig, use_container_width=True)
-            else:
-                # Create mtbf display that shows the actual value and the gauge scaled to 0-100%
-                scaled_mtbf = min(100, mtbf/10)  # Scale to percentage (max 1000 hours = 100%)
-                
-                # Create gauge for MTBF (higher is better)
-                mtbf_fig = create_gauge_chart(
-                    value=scaled_mtbf,
-                    title=f"MTBF: {mtbf:.1f} hours",
-                    good_threshold=75,
-                    warning_threshold=40
-                )
-                st.plotly_chart(mtbf_fig, use_container_width=True)
-            
-            st.markdown('<div class="info-text">Higher values indicate better equipment reliability.</div>', unsafe_allow_html=True)
-            st.markdown('</div>', unsafe_allow_html=True)
-            
-            # MTTR
-            st.markdown('<div class="metric-card">', unsafe_allow_html=True)
-            st.markdown('<div class="metric-title">Mean Time To Repair (MTTR)</div>', unsafe_allow_html=True)
-            st.markdown('<div class="metric-formula">Total Repair Time / Number of Repairs</div>', unsafe_allow_html=True)
-            
-            # Get MTTR safely
-            mttr_data = safe_get_metric(metrics, 'mttr_hours', 0)
-            mttr = mttr_data["value"]
-            is_missing = mttr_data["is_missing"]
-            
-            if is_missing:
-                # Create gauge with missing data indicator
-                mttr_fig = create_gauge_chart(
-                    value=0,
-                    title="MTTR (hours)",
-                    good_threshold=75,
-                    warning_threshold=40,
-                    is_missing=True
-                )
-                st.plotly_chart(mttr_fig, use_container_width=True)
-            else:
-                # Scale for gauge - lower is better, so we invert the scale
-                # MTTR of 0 = 100%, MTTR of 10+ = 0%
-                scaled_mttr = max(0, 100 - (mttr * 10))
-                
-                # Create gauge for MTTR (lower is better)
-                mttr_fig = create_gauge_chart(
-                    value=scaled_mttr,
-                    title=f"MTTR: {mttr:.1f} hours",
-                    good_threshold=75,  # Higher on gauge = lower actual MTTR
-                    warning_threshold=40
-                )
-                st.plotly_chart(mttr_fig, use_container_width=True)
-            
-            st.markdown('<div class="info-text">Lower values indicate faster repair times.</div>', unsafe_allow_html=True)
-            st.markdown('</div>', unsafe_allow_html=True)
-            
-            # Calibration Compliance
-            st.markdown('<div class="metric-card">', unsafe_allow_html=True)
-            st.markdown('<div class="metric-title">Calibration Compliance Rate (%)</div>', unsafe_allow_html=True)
-            st.markdown('<div class="metric-formula">(Calibrated Equipment on Time / Total Due for Calibration) × 100</div>', unsafe_allow_html=True)
-            
-            # Get calibration compliance safely
-            cal_data = safe_get_metric(metrics, 'calibration_compliance', 0)
-            calibration = cal_data["value"]
-            is_missing = cal_data["is_missing"]
-            
-            # Create gauge for Calibration Compliance
-            cal_fig = create_gauge_chart(
-                value=calibration,
-                title="Calibration Compliance",
-                good_threshold=90,
-                warning_threshold=80,
-                is_missing=is_missing
-            )
-            st.plotly_chart(cal_fig, use_container_width=True)
-            
-            st.markdown('<div class="info-text">Higher values indicate better compliance with calibration schedules.</div>', unsafe_allow_html=True)
-            st.markdown('</div>', unsafe_allow_html=True)
+            with col2:
+                st.markdown('<div class="section-header">3. Maintenance & Calibration Metrics</div>', unsafe_allow_html=True)
+            
+                # MTBF
+                st.markdown('<div class="metric-card">', unsafe_allow_html=True)
+                st.markdown('<div class="metric-title">Mean Time Between Failures (MTBF)</div>', unsafe_allow_html=True)
+                st.markdown('<div class="metric-formula">Total Operating Time / Number of Failures</div>', unsafe_allow_html=True)
+                st.plotly_chart(gauges["mtbf"], use_container_width=True)
+                st.markdown('<div class="info-text">Higher values indicate better equipment reliability.</div>', unsafe_allow_html=True)
+                st.markdown('</div>', unsafe_allow_html=True)
+            
+                # MTTR
+                st.markdown('<div class="metric-card">', unsafe_allow_html=True)
+                st.markdown('<div class="metric-title">Mean Time To Repair (MTTR)</div>', unsafe_allow_html=True)
+                st.markdown('<div class="metric-formula">Total Repair Time / Number of Repairs</div>', unsafe_allow_html=True)
+                st.plotly_chart(gauges["mttr"], use_container_width=True)
+                st.markdown('<div class="info-text">Lower values indicate faster repair times.</div>', unsafe_allow_html=True)
+                st.markdown('</div>', unsafe_allow_html=True)
+            
+                # Calibration Compliance
+                st.markdown('<div class="metric-card">', unsafe_allow_html=True)
+                st.markdown('<div class="metric-title">Calibration Compliance Rate (%)</div>', unsafe_allow_html=True)
+                st.markdown('<div class="metric-formula">(Calibrated Equipment on Time / Total Due for Calibration) × 100</div>', unsafe_allow_html=True)
+                st.plotly_chart(gauges["calibration"], use_container_width=True)
+                st.markdown('<div class="info-text">Higher values indicate better compliance with calibration schedules.</div>', unsafe_allow_html=True)
+                st.markdown('</div>', unsafe_allow_html=True)
         
-        # Second row
-        col1, col2 = st.columns(2)
+            # Second row
+            col1, col2 = st.columns(2)
         
-        with col1:
-            st.markdown('<div class="section-header">4. Cost & Efficiency Metrics</div>', unsafe_allow_html=True)
-            # Cost Per Test
-            cost = float(metrics.get('estimated_cost_per_test') or metrics.get('cost_per_test') or 12.75)
-            
-            st.markdown(f"""
-            <div style="background-color:white; padding:20px; border-radius:5px; margin-bottom:10px;">
-                <h4>Cost Per Test</h4>
-                <div style="font-size:28px; font-weight:bold;">${cost:.2f}</div>
-                <div style="font-size:12px; color:#666;">
-                    Total Operational Costs / Total Tests Conducted
+            with col1:
+                st.markdown('<div class="section-header">4. Cost & Efficiency Metrics</div>', unsafe_allow_html=True)
+                # Cost Per Test
+                st.markdown(f"""
+                <div style="background-color:white; padding:20px; border-radius:5px; margin-bottom:10px;">
+                    <h4>Cost Per Test</h4>
+                    <div style="font-size:28px; font-weight:bold;">${values['cost']:.2f}</div>
+                    <div style="font-size:12px; color:#666;">
+                        Total Operational Costs / Total Tests Conducted
+                    </div>
                 </div>
-            </div>
-            """, unsafe_allow_html=True)
-            
-            # Energy Consumption
-            energy = float(metrics.get('estimated_energy_per_test_kwh') or metrics.get('energy_consumption') or 2.4)
-            
-            st.markdown(f"""
-            <div style="background-color:white; padding:20px; border-radius:5px; margin-bottom:10px;">
-                <h4>Energy Consumption Per Test</h4>
-                <div style="font-size:28px; font-weight:bold;">{energy:.1f} kWh</div>
-                <div style="font-size:12px; color:#666;">
-                    Total Energy Used / Number of Tests Conducted
+                """, unsafe_allow_html=True)
+            
+                # Energy Consumption
+                st.markdown(f"""
+                <div style="background-color:white; padding:20px; border-radius:5px; margin-bottom:10px;">
+                    <h4>Energy Consumption Per Test</h4>
+                    <div style="font-size:28px; font-weight:bold;">{values['energy']:.1f} kWh</div>
+                    <div style="font-size:12px; color:#666;">
+                        Total Energy Used / Number of Tests Conducted
+                    </div>
                 </div>
-            </div>
-            """, unsafe_allow_html=True)
-            
-            # Depreciation Rate
-            # depreciation = float(metrics.get('equipment_depreciation_rate', metrics.get('depreciation_rate', 15.3)))
-
-            st.markdown('<div class="metric-card">', unsafe_allow_html=True)
-            st.markdown('<div class="metric-title">Equipment Depreciation Rate (%)</div>', unsafe_allow_html=True)
-            st.markdown('<div class="metric-formula">(Initial Value - Current Value / Initial Value) × 100</div>', unsafe_allow_html=True)
-
-            depreciation_data = safe_get_metric(metrics, 'equipment_depreciation_rate', 0)
-            depreciation = depreciation_data["value"]
-            is_missing = depreciation_data["is_missing"]
-            
-            # Create gauge for Calibration Compliance
-            cal_fig = create_gauge_chart(
-                value=depreciation,
-                title="Equipment Depreciation Rate",
-                good_threshold=10,
-                warning_threshold=20,
-                is_missing=is_missing
-            )
-            st.plotly_chart(cal_fig, use_container_width=True)
-        
-        with col2:
-            st.markdown('<div class="section-header">5. Availability & Scheduling Metrics</div>', unsafe_allow_html=True)
-            # Utilization Rate card with gauge chart
-            st.markdown('<div class="metric-card">', unsafe_allow_html=True)
-            st.markdown('<div class="metric-title">Equipment Availability (%)</div>', unsafe_allow_html=True)
-            st.markdown('<div class="metric-formula">(Total Available Hours - Downtime Hours / Total Available Hours) × 100</div>', unsafe_allow_html=True)
-            availability = 100 - downtime
-            # Get utilization rate safely
-            utilization_data = safe_get_metric(metrics, 'utilization_rate', 0)
-            utilization = utilization_data["value"]
-            is_missing = utilization_data["is_missing"]
+                """, unsafe_allow_html=True)
             
-            # Create gauge chart for utilization rate
-            util_fig = create_gauge_chart(
-                value=utilization,
-                title="Equipment Availability",
-                good_threshold=75,
-                warning_threshold=50,
-                is_missing=is_missing
-            )
-            st.plotly_chart(util_fig, use_container_width=True)
-            
-            # Booking vs Usage Discrepancy
-            st.markdown('<div class="metric-card">', unsafe_allow_html=True)
-            st.markdown('<div class="metric-title">Booking vs Usage Discrepancy (%)</div>', unsafe_allow_html=True)
-            st.markdown('<div class="metric-formula">(Scheduled Time - Actual Used Time) / Scheduled Time × 100</div>', unsafe_allow_html=True)
-
-            booking_discrepancy_data = safe_get_metric(metrics, 'booking_discrepancy', 15.3)
-            booking_discrepancy = booking_discrepancy_data["value"]
-            is_missing = booking_discrepancy_data["is_missing"]
-            util_fig = create_gauge_chart(
-                value=booking_discrepancy,
-                title="Booking Discrepancy",
-                good_threshold=10,
-                warning_threshold=30,
-                is_missing=is_missing
-            )
-            st.plotly_chart(util_fig, use_container_width=True)
-        
-        # Additional metrics section
-        st.subheader("Additional Station Metrics")
+                # Depreciation Rate
+                st.markdown('<div class="metric-card">', unsafe_allow_html=True)
+                st.markdown('<div class="metric-title">Equipment Depreciation Rate (%)</div>', unsafe_allow_html=True)
+                st.markdown('<div class="metric-formula">(Initial Value - Current Value / Initial Value) × 100</div>', unsafe_allow_html=True)
+                st.plotly_chart(gauges["depreciation"], use_container_width=True)
         
-        # Display some of the raw metrics in a more detailed format
-        col1, col2, col3 = st.columns(3)
+            with col2:
+                st.markdown('<div class="section-header">5. Availability & Scheduling Metrics</div>', unsafe_allow_html=True)
+                # Availability card with gauge chart
+                st.markdown('<div class="metric-card">', unsafe_allow_html=True)
+                st.markdown('<div class="metric-title">Equipment Availability (%)</div>', unsafe_allow_html=True)
+                st.markdown('<div class="metric-formula">(Total Available Hours - Downtime Hours / Total Available Hours) × 100</div>', unsafe_allow_html=True)
+                st.plotly_chart(gauges["availability"], use_container_width=True)
+            
+                # Booking vs Usage Discrepancy
+                st.markdown('<div class="metric-card">', unsafe_allow_html=True)
+                st.markdown('<div class="metric-title">Booking vs Usage Discrepancy (%)</div>', unsafe_allow_html=True)
+                st.markdown('<div class="metric-formula">(Scheduled Time - Actual Used Time) / Scheduled Time × 100</div>', unsafe_allow_html=True)
+                st.plotly_chart(gauges["booking"], use_container_width=True)
         
-        with col1:
-            record_count = int(metrics.get('record_count', 0))
-            st.metric("Total Records", f"{record_count:,}")
+            # Additional metrics section
+            st.subheader("Additional Station Metrics")
         
-        with col2:
-            group_count = int(metrics.get('_group_count', 0))
-            st.metric("Unique Groups", group_count)
+            # Display some of the raw metrics in a more detailed format
+            col1, col2, col3 = st.columns(3)
+            col1.metric("Total Records", f"{values['record_count']:,}")
+            col2.metric("Unique Groups", values["group_count"])
+            col3.metric("Unique Labels", f"{values['label_count']:,}")
         
-        with col3:
-            label_count = int(metrics.get('_label_count', 0))
-            st.metric("Unique Labels", f"{label_count:,}")
-        
-        # Show additional metrics if they exist
-        more_metrics = {}
-        for key in metrics:
-            if key not in ['_id', 'station', 'timestamp', 'record_count', 'raw_stats'] and not key.startswith('_'):
-                # Skip already displayed metrics
-                if key not in [
-                    'utilization_rate', 'downtime_percentage', 'tests_per_day', 'avg_test_duration', 'mtbf', 'mttr',
-                    'calibration_compliance', 'cost_per_test', 'energy_consumption', 'equipment_depreciation_rate',
-                    'booking_discrepancy', 'estimated_test_duration_minutes', 'mtbf_hours', 'mttr_hours',
-                    'estimated_cost_per_test', 'estimated_energy_per_test_kwh'
-                ]:
-                    more_metrics[key] = metrics[key]
-        
-        if more_metrics:
-            with st.expander("View All Available Metrics"):
-                for key, value in sorted(more_metrics.items()):
-                    if not isinstance(value, dict) and not isinstance(value, list):
-                        st.text(f"{key}: {value}")
-    else:
-        st.warning(f"No metrics found for {st.session_state.selected_station}. Please run the metrics calculator first.")
+            # Show additional metrics if they exist
+            if model["more_metrics"]:
+                with st.expander("View All Available Metrics"):
+                    st.text("\n".join(f"{key}: {value}" for key, value in model["more_metrics"]))
+        else:
+            st.warning(f"No metrics found for {st.session_state.selected_station}. Please run the metrics calculator first.")
         
-        # Suggest running metrics_calculator_script
-        st.info("""
-        Please run the metrics calculator script:
-        ```
-        python enhanced_metrics_calculator.py
-        ```
-        This will calculate and store metrics for your test equipment in the database.
-        """)
+            # Suggest running metrics_calculator_script
+            st.info("""
+            Please run the metrics calculator script:
+            ```
+            python enhanced_metrics_calculator.py
+            ```
+            This will calculate and store metrics for your test equipment in the database.
+            """)
+
+    render_metrics_view()
 
 # Final garbage collection
 gc.collect()
\ No newline at end of file
@@ -1,3 +1,2 @@
 from .filters import render_filters
 from .metrics import render_metrics
-from .charts import render_time_charts
\ No newline at end of file
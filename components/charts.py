@@ -1,303 +1,141 @@
 # components/charts.py
-import streamlit as st
 import pandas as pd
-import plotly.express as px
 import plotly.graph_objects as go
-from datetime import datetime
+import plotly.io as pio
+import numpy as np
+from utils.downsample import downsample_series
 
-def render_time_charts(df):
+# Above this many points per figure SVG traces make the browser sluggish; switch to WebGL
+WEBGL_POINT_THRESHOLD = 20000
+
+HOVER_TEMPLATE = '%{x} - %{y}<extra></extra>'
+MAX_TICKS = 24
+
+# Legend centered above the plot, shared by the dashboard time-series charts
+LEGEND_LAYOUT = dict(
+    x=0.5,
+    y=1.1,
+    xanchor="center",
+    yanchor="bottom",
+    traceorder="normal",
+    font=dict(size=12),
+)
+
+
+def scatter_trace_type(total_points, threshold=WEBGL_POINT_THRESHOLD):
     """
-    Render time series charts based on filtered data.
-    
-    Args:
-        df: pandas DataFrame containing filtered data
+    Trace class for a line figure with the given total number of points.
+    Scattergl takes the same arguments (hovertemplate, name, legend) as Scatter.
     """
-    
-    if df.empty:
-        st.warning("No data available for the selected filters. Please adjust your selections.")
-        return
-    
-    # Check if date/time column exists
-    date_columns = [col for col in df.columns if 'date' in col.lower() or 'time' in col.lower()]
-    
-    if not date_columns:
-        st.info("No time-based data available for charts.")
-        return
-        
-    date_col = date_columns[0]  # Use first date column found
-    
-    # Ensure date column is datetime type
-    if df[date_col].dtype != 'datetime64[ns]':
-        try:
-            df[date_col] = pd.to_datetime(df[date_col])
-        except:
-            st.error(f"Could not convert {date_col} to datetime format.")
-            return
+    return go.Scattergl if total_points > threshold else go.Scatter
 
-    # Add station column if it doesn't exist
-    if 'station' not in df.columns:
-        df['station'] = 'station 0'
-    
-    # Create chart for Number of Test over time by Station
-    create_line_chart(df, date_col, 'Number of Test over time by Station')
-    
-    # Create second row of charts
-    col1, col2 = st.columns(2)
-    
-    with col1:
-        # Create chart for Number of label over Time
-        create_line_chart(df, date_col, 'Number of label over Time', container_width=True)
-    
-    with col2:
-        # Create chart for Number of Repo over Time
-        create_zero_line_chart(df, date_col, 'Number of Repo over Time', container_width=True)
-    
-    # Create third row of charts
-    col1, col2 = st.columns(2)
-    
-    with col1:
-        # Create chart for Number of module over Time
-        create_line_chart(df, date_col, 'Number of module over Time', container_width=True)
-    
-    with col2:
-        # Create chart for Number of method over Time
-        create_method_chart(df, date_col, 'Number of method over Time', container_width=True)
-    
-    # Create chart for Number of Groups over Time
-    create_line_chart(df, date_col, 'Number of Groups over Time')
 
-def create_line_chart(df, date_col, title, container_width=False):
+def tick_stride(n_points, max_ticks=MAX_TICKS):
+    """Step between labelled ticks so at most max_ticks labels are drawn"""
+    return max(1, -(-n_points // max_ticks))
+
+
+def epoch_ms(x):
     """
-    Creates a line chart similar to the one in the screenshot.
-    
-    Args:
-        df: DataFrame with the data
-        date_col: Name of the date column
-        title: Title for the chart
-        container_width: Whether to use container width (for columns)
+    Datetimes as float64 epoch milliseconds. Plotly sends float64 arrays as base64
+    typed arrays, while datetimes would be sent as one string per point.
     """
-    # Create container with white background
-    st.markdown(
-        f"""
-        <div style="background-color: white; border-radius: 5px; padding: 15px; box-shadow: 0 1px 3px rgba(0,0,0,0.1); margin-bottom: 20px;">
-            <h4 style="margin-top: 0; margin-bottom: 15px; font-weight: 500;">{title}</h4>
-        </div>
-        """, 
-        unsafe_allow_html=True
-    )
-    
-    # Create daily aggregation
-    df_agg = df.groupby([pd.Grouper(key=date_col, freq='D'), 'station']).size().reset_index(name='count')
-    
-    # Create line chart
-    fig = px.line(
-        df_agg,
-        x=date_col,
-        y='count',
-        color='station',
-        color_discrete_sequence=['#e36bae'],  # Pink color like in the screenshot
-        labels={'count': '', date_col: ''}
-    )
-    
-    # Format x-axis dates
-    fig.update_xaxes(
-        tickformat='%b %d, %Y',
-        tickangle=-45,
-        tickfont=dict(size=8),
-        tickmode='array',
-        tickvals=df_agg[date_col].dt.strftime('%b %d, %Y').unique()[::10],  # Show fewer ticks
-        gridcolor='lightgray'
-    )
-    
-    # Format y-axis
-    fig.update_yaxes(
-        gridcolor='lightgray'
-    )
-    
-    # Update layout
-    fig.update_layout(
-        height=250,
-        margin=dict(l=40, r=20, t=10, b=40),
-        plot_bgcolor='white',
-        paper_bgcolor='white',
-        showlegend=True,
-        legend=dict(
-            orientation="h",
-            yanchor="bottom",
-            y=1.02,
-            xanchor="left",
-            x=0,
-            font=dict(size=10)
-        ),
-        hovermode="x unified"
-    )
-    
-    # Show chart
-    st.plotly_chart(fig, use_container_width=True)
+    return np.asarray(x, dtype="datetime64[ms]").astype(np.int64).astype(np.float64)
+
+
+def x_spec(x):
+    """
+    Trace arguments for an x axis of epoch milliseconds: x0/dx when the points are
+    evenly spaced (no array is sent at all), otherwise the typed array itself
+    """
+    if len(x) > 2 and np.all(np.diff(x) == x[1] - x[0]):
+        return dict(x0=x[0], dx=x[1] - x[0])
+    return dict(x=x)
+
+
+def figure_bytes(fig):
+    """Size of a figure as sent to the browser (st.plotly_chart serializes it the same way)"""
+    return len(pio.to_json(fig, validate=False))
 
-def create_zero_line_chart(df, date_col, title, container_width=False):
+
+def time_series_figure(x, counts, names, title, yaxis_title, legend_title,
+                       tick_labels=None, max_points=None, max_ticks=MAX_TICKS, null_name="null",
+                       hover_format=None):
     """
-    Creates a line chart with zero values like the "Number of Repo over Time" chart.
-    
+    Line figure with one trace per row of a count matrix, built in a single pass
+    straight from the arrays.
+
     Args:
-        df: DataFrame with the data
-        date_col: Name of the date column
-        title: Title for the chart
-        container_width: Whether to use container width (for columns)
+        x: 1-D datetime64 array shared by all series
+        counts: 2-D array (series x points)
+        names: Series names, one per row (None is shown as null_name)
+        title, yaxis_title, legend_title: Chart texts
+        tick_labels: Text for the x ticks, one per point (defaults to the x values)
+        max_points: Point budget per trace; longer series are downsampled
+        max_ticks: Maximum number of labelled x ticks
+        null_name: Legend name of a series without a name
+        hover_format: d3 time format of the x value in the hover label
+
+    Returns:
+        plotly Figure (Scattergl traces when the total point count is large).
+        Counts and the epoch-millisecond x axis are sent as typed arrays. A
+        downsampled figure is only returned when it serializes smaller than the
+        full-resolution one, whose evenly spaced axis is sent as just x0/dx.
     """
-    # Create container with white background
-    st.markdown(
-        f"""
-        <div style="background-color: white; border-radius: 5px; padding: 15px; box-shadow: 0 1px 3px rgba(0,0,0,0.1); margin-bottom: 20px;">
-            <h4 style="margin-top: 0; margin-bottom: 15px; font-weight: 500;">{title}</h4>
-        </div>
-        """, 
-        unsafe_allow_html=True
-    )
-    
-    # Create date range
-    date_range = pd.date_range(start=df[date_col].min(), end=df[date_col].max(), freq='D')
-    
-    # Create DataFrame with zeros
-    zero_df = pd.DataFrame({
-        date_col: date_range,
-        'count': [0] * len(date_range),
-        'station': ['station 0'] * len(date_range)
-    })
-    
-    # Create line chart
-    fig = px.line(
-        zero_df,
-        x=date_col,
-        y='count',
-        color='station',
-        color_discrete_sequence=['#e36bae'],  # Pink color like in the screenshot
-        labels={'count': '', date_col: ''}
-    )
-    
-    # Set y-axis range to match screenshot
-    fig.update_yaxes(
-        range=[-1, 1],
-        tickvals=[-1, -0.5, 0, 0.5, 1],
-        gridcolor='lightgray'
-    )
-    
-    # Format x-axis dates
-    fig.update_xaxes(
-        tickformat='%b %d, %Y',
-        tickangle=-45,
-        tickfont=dict(size=8),
-        tickmode='array',
-        tickvals=zero_df[date_col].dt.strftime('%b %d, %Y').unique()[::10],  # Show fewer ticks
-        gridcolor='lightgray'
-    )
-    
-    # Update layout
-    fig.update_layout(
-        height=250,
-        margin=dict(l=40, r=20, t=10, b=40),
-        plot_bgcolor='white',
-        paper_bgcolor='white',
-        showlegend=True,
-        legend=dict(
-            orientation="h",
-            yanchor="bottom",
-            y=1.02,
-            xanchor="left",
-            x=0,
-            font=dict(size=10)
+    x = epoch_ms(x)
+    stride = tick_stride(len(x), max_ticks)
+    tick_labels = x if tick_labels is None else tick_labels
+    layout = dict(
+        title=title,
+        xaxis_title="Timestamp",
+        yaxis_title=yaxis_title,
+        hovermode="x unified",
+        xaxis_rangeslider_visible=False,
+        legend=dict(LEGEND_LAYOUT, title=legend_title),
+        xaxis=dict(
+            type='date',
+            tickmode='array',
+            tickvals=x[::stride],
+            ticktext=list(tick_labels[::stride]),
+            tickangle=45,
+            hoverformat=hover_format,
         ),
-        hovermode="x unified"
     )
-    
-    # Show chart
-    st.plotly_chart(fig, use_container_width=True)
 
-def create_method_chart(df, date_col, title, container_width=False):
+    def build(trace_x, trace_counts):
+        Trace = scatter_trace_type(trace_counts.size)
+        fig = go.Figure(data=[
+            Trace(**x_spec(trace_x), y=row, mode='lines', name=null_name if name is None else name,
+                  showlegend=True, hovertemplate=HOVER_TEMPLATE)
+            for row, name in zip(trace_counts, names)
+        ])
+        fig.update_layout(**layout)
+        return fig
+
+    fig = build(x, counts)
+    if max_points:
+        trace_x, trace_counts = downsample_series(x, counts, max_points)
+        if trace_x is not x:
+            reduced = build(trace_x, trace_counts)
+            if figure_bytes(reduced) < figure_bytes(fig):
+                fig = reduced
+    return fig
+
+
+def selected_x_range(selection):
     """
-    Creates a bar chart for method counts similar to the screenshot.
-    
+    (start, end) datetimes spanned by a box selection on a time axis, or None.
+
     Args:
-        df: DataFrame with the data
-        date_col: Name of the date column
-        title: Title for the chart
-        container_width: Whether to use container width (for columns)
+        selection: Value of st.plotly_chart(..., on_select=..., selection_mode="box")
     """
-    # Create container with white background
-    st.markdown(
-        f"""
-        <div style="background-color: white; border-radius: 5px; padding: 15px; box-shadow: 0 1px 3px rgba(0,0,0,0.1); margin-bottom: 20px;">
-            <h4 style="margin-top: 0; margin-bottom: 15px; font-weight: 500;">{title}</h4>
-        </div>
-        """, 
-        unsafe_allow_html=True
-    )
-    
-    # Create daily aggregation with random method counts between 0 and 2
-    import numpy as np
-    np.random.seed(42)  # For reproducibility
-    
-    # Create date range
-    date_range = pd.date_range(start=df[date_col].min(), end=df[date_col].max(), freq='D')
-    
-    # Create random method counts (mostly 0s and 1s with occasional 2s)
-    method_counts = np.zeros(len(date_range))
-    # Set specific values to 1 or 2 at regular intervals
-    method_counts[::7] = 1  # Every 7th day is 1
-    method_counts[::15] = 2  # Every 15th day is 2
-    
-    # Create DataFrame
-    method_df = pd.DataFrame({
-        date_col: date_range,
-        'count': method_counts,
-        'station': ['station 0'] * len(date_range)
-    })
-    
-    # Create bar chart
-    fig = px.bar(
-        method_df,
-        x=date_col,
-        y='count',
-        color='station',
-        color_discrete_sequence=['#e36bae'],  # Pink color like in the screenshot
-        labels={'count': '', date_col: ''}
-    )
-    
-    # Set y-axis range to match screenshot
-    fig.update_yaxes(
-        range=[0, 2],
-        tickvals=[0, 0.5, 1, 1.5, 2],
-        gridcolor='lightgray'
-    )
-    
-    # Format x-axis dates
-    fig.update_xaxes(
-        tickformat='%b %d, %Y',
-        tickangle=-45,
-        tickfont=dict(size=8),
-        tickmode='array',
-        tickvals=method_df[date_col].dt.strftime('%b %d, %Y').unique()[::10],  # Show fewer ticks
-        gridcolor='lightgray'
-    )
-    
-    # Update layout
-    fig.update_layout(
-        height=250,
-        margin=dict(l=40, r=20, t=10, b=40),
-        plot_bgcolor='white',
-        paper_bgcolor='white',
-        showlegend=True,
-        legend=dict(
-            orientation="h",
-            yanchor="bottom",
-            y=1.02,
-            xanchor="left",
-            x=0,
-            font=dict(size=10)
-        ),
-        hovermode="x unified",
-        bargap=0.95  # Thin bars
-    )
-    
-    # Show chart
-    st.plotly_chart(fig, use_container_width=True)
\ No newline at end of file
+    boxes = ((selection or {}).get("selection") or {}).get("box") or []
+    xs = [x for box in boxes for x in box.get("x", [])]
+    if len(xs) < 2:
+        return None
+    if all(isinstance(x, (int, float)) for x in xs):
+        values = pd.to_datetime(xs, unit="ms")  # Date axes may report epoch milliseconds
+    else:
+        values = pd.to_datetime(xs, format="mixed")
+    return values.min().to_pydatetime(), values.max().to_pydatetime()
+
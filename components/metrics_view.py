@@ -0,0 +1,244 @@
+# components/metrics_view.py - Precomputed content of the Metrics Calculation API view
+import plotly.graph_objects as go
+
+def create_gauge_chart(value, title, min_val=0, max_val=100, good_threshold=75, warning_threshold=50, is_missing=False):
+    """
+    Create a gauge chart for metrics visualization
+    
+    Args:
+        value: Value to display on gauge
+        title: Title for the gauge
+        min_val: Minimum value on gauge scale
+        max_val: Maximum value on gauge scale
+        good_threshold: Threshold for good performance (green)
+        warning_threshold: Threshold for warning performance (yellow)
+        is_missing: Whether the data is missing
+        
+    Returns:
+        plotly.graph_objects.Figure: Gauge chart figure
+    """
+    # Handle None values
+    value = 0 if value is None else value
+    
+    if is_missing:
+        # Gray color for missing data
+        color = "#CCCCCC"
+        title = f"{title} (No Data)"
+    else:
+        # Determine color based on thresholds
+        if good_threshold > warning_threshold:
+            if value >= good_threshold:
+                color = "#4CAF50"  # Good - Green
+            elif value >= warning_threshold:
+                color = "#FFC107"  # Warning - Yellow/Amber
+            else:
+                color = "#F44336"  # Danger - Red
+        elif good_threshold <= warning_threshold:
+            if value < good_threshold:
+                color = "#4CAF50"  # Good - Green
+            elif value <= warning_threshold:
+                color = "#FFC107"  # Warning - Yellow/Amber
+            else:
+                color = "#F44336"  # Danger - Red
+    
+    # Create the gauge chart
+    if good_threshold > warning_threshold:
+        fig = go.Figure(go.Indicator(
+            mode="gauge+number",
+            value=value,
+            title={'text': title, 'font': {'size': 14, 'color': '#666'}},
+            number={'suffix': "%", 'font': {'size': 20, 'color': '#1E3A8A'}},
+            gauge={
+                'axis': {'range': [min_val, max_val], 'tickwidth': 1, 'tickcolor': "#666"},
+                'bar': {'color': color},
+                'bgcolor': "white",
+                'borderwidth': 2,
+                'bordercolor': "#DDDDDD",
+                'steps': [
+                    {'range': [min_val, warning_threshold], 'color': '#FFECB3'},
+                    {'range': [warning_threshold, good_threshold], 'color': '#E6EE9C'},
+                    {'range': [good_threshold, max_val], 'color': '#C8E6C9'}
+                ],
+                'threshold': {
+                    'line': {'color': "black", 'width': 2},
+                    'thickness': 0.75,
+                    'value': value
+                }
+            }
+        ))
+    else:
+        fig = go.Figure(go.Indicator(
+            mode="gauge+number",
+            value=value,
+            title={'text': title, 'font': {'size': 14, 'color': '#666'}},
+            number={'suffix': "%", 'font': {'size': 20, 'color': '#1E3A8A'}},
+            gauge={
+                'axis': {'range': [min_val, max_val], 'tickwidth': 1, 'tickcolor': "#666"},
+                'bar': {'color': color},
+                'bgcolor': "white",
+                'borderwidth': 2,
+                'bordercolor': "#DDDDDD",
+                'steps': [
+                    {'range': [min_val, good_threshold], 'color': '#C8E6C9'},
+                    {'range': [good_threshold, warning_threshold], 'color': '#E6EE9C'},
+                    {'range': [warning_threshold, max_val], 'color': '#FFECB3'}
+                ],
+                'threshold': {
+                    'line': {'color': "black", 'width': 2},
+                    'thickness': 0.75,
+                    'value': value
+                }
+            }
+        ))
+    
+    # Update layout
+    fig.update_layout(
+        height=250,  # Increased height
+        margin=dict(l=30, r=30, t=60, b=40),  # Increased top and bottom margins
+        paper_bgcolor="white",
+        font={'color': "#333", 'family': "Arial, sans-serif"},  # Better font
+        autosize=True,  # Allow auto-sizing
+    )
+    
+    return fig
+
+# Helper function to safely get values
+def safe_get_metric(metrics, key, default=None):
+    """Get a metric value safely, handling None values and missing data"""
+    if not metrics:
+        return {"value": default, "is_missing": True}
+    
+    value = metrics.get(key)
+    if value is None:
+        # Check if we have missing data flag
+        if metrics.get("missing_data", False):
+            return {"value": default, "is_missing": True}
+        return {"value": default, "is_missing": False}
+    
+    return {"value": value, "is_missing": False}
+
+
+TOP_GROUPS = 5
+
+# Gauge name -> (metric key, default, gauge title, good threshold, warning threshold)
+PERCENT_GAUGES = {
+    "utilization": ("utilization_rate", 0, "Equipment Utilization", 75, 50),
+    "downtime": ("downtime_percentage", 0, "Equipment Downtime", 10, 35),  # Lower is better for downtime
+    "calibration": ("calibration_compliance", 0, "Calibration Compliance", 90, 80),
+    "depreciation": ("equipment_depreciation_rate", 0, "Equipment Depreciation Rate", 10, 20),
+    "availability": ("utilization_rate", 0, "Equipment Availability", 75, 50),
+    "booking": ("booking_discrepancy", 15.3, "Booking Discrepancy", 10, 30),
+}
+
+# Metrics drawn elsewhere in the view and left out of "View All Available Metrics"
+DISPLAYED_METRICS = {
+    'utilization_rate', 'downtime_percentage', 'tests_per_day', 'avg_test_duration', 'mtbf', 'mttr',
+    'calibration_compliance', 'cost_per_test', 'energy_consumption', 'equipment_depreciation_rate',
+    'booking_discrepancy', 'estimated_test_duration_minutes', 'mtbf_hours', 'mttr_hours',
+    'estimated_cost_per_test', 'estimated_energy_per_test_kwh'
+}
+
+def utilization_indicator(value):
+    """Colored square for a utilization percentage"""
+    if value >= 75:
+        return '<span class="good-indicator">■</span>'
+    if value >= 50:
+        return '<span class="warning-indicator">■</span>'
+    return '<span class="danger-indicator">■</span>'
+
+def top_groups(group_metrics, field, k=TOP_GROUPS):
+    """
+    Groups ranked by one field, largest first (groups without a value last)
+
+    Returns:
+        tuple: (top k (group, value) pairs that have a value, number of groups)
+    """
+    ranked = sorted(group_metrics.items(),
+                    key=lambda item: item[1].get(field) if item[1].get(field) is not None else -1,
+                    reverse=True)
+    return [(group, data[field]) for group, data in ranked[:k] if data.get(field) is not None], len(ranked)
+
+def group_list_markdown(title, rows, n_groups, empty_message=None):
+    """
+    One markdown block for a top-groups list: title, bullets and the "more groups" note
+
+    Args:
+        title: Bold heading
+        rows: Bullet texts
+        n_groups: Number of groups in total
+        empty_message: Shown instead of the bullets when given and rows is empty
+    """
+    lines = [f"<b>{title}</b>", ""]
+    if not rows and empty_message:
+        lines.append(f"<i>{empty_message}</i>")
+        return "\n".join(lines)
+    lines.extend(f"- {row}" for row in rows)
+    if n_groups > TOP_GROUPS:
+        lines.extend(["", f"<i>and {n_groups - TOP_GROUPS} more groups...</i>"])
+    return "\n".join(lines)
+
+def build_metrics_view_model(metrics, group_metrics=None):
+    """
+    Everything the metrics view draws, computed once per metrics document:
+    gauge figures, card values (None when the metric is missing), the top-5
+    group lists as ready markdown, and the remaining metrics for the expander.
+
+    Args:
+        metrics: Metrics document of the station (as returned by get_station_metrics)
+        group_metrics: Optional group -> metrics mapping
+
+    Returns:
+        dict with keys gauges, values, group_lists and more_metrics
+    """
+    gauges, values = {}, {}
+    for name, (key, default, title, good, warning) in PERCENT_GAUGES.items():
+        data = safe_get_metric(metrics, key, default)
+        values[name] = None if data["is_missing"] else data["value"]
+        gauges[name] = create_gauge_chart(value=data["value"], title=title, good_threshold=good,
+                                          warning_threshold=warning, is_missing=data["is_missing"])
+
+    # MTBF and MTTR are scaled to a 0-100 gauge: 1000 hours MTBF and an MTTR of 0 are 100%
+    mtbf = safe_get_metric(metrics, 'mtbf_hours', 0)
+    if mtbf["is_missing"]:
+        gauges["mtbf"] = create_gauge_chart(value=0, title="MTBF (hours)", good_threshold=75,
+                                            warning_threshold=40, is_missing=True)
+    else:
+        gauges["mtbf"] = create_gauge_chart(value=min(100, mtbf["value"] / 10), title=f"MTBF: {mtbf['value']:.1f} hours",
+                                            good_threshold=75, warning_threshold=40)
+    mttr = safe_get_metric(metrics, 'mttr_hours', 0)
+    if mttr["is_missing"]:
+        gauges["mttr"] = create_gauge_chart(value=0, title="MTTR (hours)", good_threshold=75,
+                                            warning_threshold=40, is_missing=True)
+    else:
+        gauges["mttr"] = create_gauge_chart(value=max(0, 100 - (mttr["value"] * 10)), title=f"MTTR: {mttr['value']:.1f} hours",
+                                            good_threshold=75, warning_threshold=40)
+
+    for name, key in (("tests_per_day", 'tests_per_day'), ("avg_duration", 'avg_test_duration_minutes')):
+        data = safe_get_metric(metrics, key, 0)
+        values[name] = None if data["is_missing"] else data["value"]
+    values["cost"] = float(metrics.get('estimated_cost_per_test') or metrics.get('cost_per_test') or 12.75)
+    values["energy"] = float(metrics.get('estimated_energy_per_test_kwh') or metrics.get('energy_consumption') or 2.4)
+    values["record_count"] = int(metrics.get('record_count', 0))
+    values["group_count"] = int(metrics.get('_group_count', 0))
+    values["label_count"] = int(metrics.get('_label_count', 0))
+
+    group_lists = {}
+    if group_metrics:
+        rows, n_groups = top_groups(group_metrics, "utilization")
+        group_lists["utilization"] = group_list_markdown(
+            "Utilization by Group:", [f"{utilization_indicator(value)} {group}: {value:.1f}%" for group, value in rows],
+            n_groups, "No utilization data available for groups")
+        rows, n_groups = top_groups(group_metrics, "count")
+        group_lists["count"] = group_list_markdown(
+            "Test Counts by Group:", [f"{group}: {value} tests" for group, value in rows], n_groups)
+        rows, n_groups = top_groups(group_metrics, "avg_duration")
+        group_lists["duration"] = group_list_markdown(
+            "Test Duration by Group:", [f"{group}: {value:.2f} min" for group, value in rows],
+            n_groups, "No duration data available for groups")
+
+    more_metrics = sorted(
+        (key, value) for key, value in metrics.items()
+        if key not in ['_id', 'station', 'timestamp', 'record_count', 'raw_stats'] and not key.startswith('_')
+        and key not in DISPLAYED_METRICS and not isinstance(value, (dict, list))
+    )
+    return {"gauges": gauges, "values": values, "group_lists": group_lists, "more_metrics": more_metrics}
@@ -0,0 +1,493 @@
+# data/data_loader.py - Numpy-backed access to the per-station forgraph rollups
+import glob
+import hashlib
+import json
+import logging
+import os
+import threading
+import time
+from collections import OrderedDict
+
+import numpy as np
+
+# Set up logging
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+FORGRAPH_DIR = "forgraph"
+
+# Dimension name -> (key of the hourly block, key of its index list) in forgraph/<station>_graph.json
+DIMENSIONS = {
+    "group": ("group_counts_per_hour", "_group_index"),
+    "label": ("label_counts_per_hour", "_label_index"),
+    "repo": ("repo_counts_per_hour", "repo_index"),
+    "method": ("method_counts_per_hour", "method_index"),
+    "module": ("module_counts_per_hour", "module_index"),
+}
+
+# The total test count is exposed as a pseudo-dimension with a single series
+LOG_DIMENSION = "log"
+LOG_KEY = "log_counts_per_hour"
+
+# Compact encoding written next to the JSON by data.rollup_codec; preferred when current
+COMPACT_SUFFIX = "_graph.rollup"
+
+GRANULARITIES = ("hour", "day", "month")
+
+# Name of the series that folds everything outside the top-k together
+OTHER_SERIES = "Other"
+
+
+def _parse_hours(dates):
+    """Convert 'YYYY-MM-DD-HH' labels into a datetime64[h] array"""
+    return np.array([d[:10] + "T" + d[11:13] for d in dates], dtype="datetime64[h]")
+
+
+def label_times(labels):
+    """
+    Datetimes of period labels ('YYYY-MM-DD-HH', 'YYYY-MM-DD' or 'YYYY-MM'), for
+    charts that need a real time axis instead of category labels
+    """
+    labels = np.asarray(labels, dtype=str)
+    if len(labels) and len(labels[0]) == 13:
+        return _parse_hours(labels)
+    return labels.astype("datetime64")
+
+
+def _prefix_sum(counts):
+    """Cumulative sums along time with a leading zero column, so window totals are cum[hi] - cum[lo]"""
+    cumsum = np.zeros(counts.shape[:-1] + (counts.shape[-1] + 1,), dtype=np.int64)
+    np.cumsum(counts, axis=-1, out=cumsum[..., 1:])
+    return cumsum
+
+
+def _to_hour(value):
+    """Floor a datetime/date/string to a datetime64[h] value (None passes through)"""
+    if value is None:
+        return None
+    return np.datetime64(value).astype("datetime64[h]")
+
+
+class StationRollup:
+    """
+    Hourly test counts of one station, held as numpy arrays.
+
+    Every dimension keeps a 2-D count matrix (series x hours) and its prefix sums.
+    Window bounds are located by binary search on the hour index, so totals for any
+    date range cost O(log n) per series and hourly chart data is a zero-copy slice.
+    """
+
+    def __init__(self, station, dates, log_counts, dimensions, version=None):
+        """
+        Args:
+            station: Station (collection) name
+            dates: List of hourly labels in 'YYYY-MM-DD-HH' format
+            log_counts: Total tests per hour
+            dimensions: Dict of dimension -> (names, 2-D count matrix)
+            version: Content hash of the published rollup
+        """
+        self.station = station
+        self.version = version
+        self.labels = np.asarray(dates, dtype=str)
+        self.hours = _parse_hours(self.labels)
+
+        self.names = {LOG_DIMENSION: ["log"]}
+        self.counts = {LOG_DIMENSION: np.asarray(log_counts, dtype=np.int64).reshape(1, -1)}
+        for dim, (names, counts) in dimensions.items():
+            self.names[dim] = list(names)
+            self.counts[dim] = np.asarray(counts, dtype=np.int64).reshape(len(names), len(self.hours))
+        self.cumsums = {dim: _prefix_sum(counts) for dim, counts in self.counts.items()}
+        self._index_periods()
+
+    @classmethod
+    def from_arrays(cls, station, labels, hours, names, counts, cumsums, version=None):
+        """
+        Wrap existing arrays in a rollup without copying them. The per-dimension
+        dicts may be any mapping, e.g. shared-memory views or blocks decoded lazily.
+        """
+        rollup = cls.__new__(cls)
+        rollup.station = station
+        rollup.version = version
+        rollup.labels = labels
+        rollup.hours = hours
+        rollup.names = names
+        rollup.counts = counts
+        rollup.cumsums = cumsums
+        rollup._index_periods()
+        return rollup
+
+    def _index_periods(self):
+        """Per-hour period labels and the first hour of every day/month bucket"""
+        self.period_labels = {
+            "hour": self.labels,
+            "day": self.labels.astype("<U10"),
+            "month": self.labels.astype("<U7"),
+        }
+        self.bucket_starts = {"hour": np.arange(len(self.hours))}
+        for granularity, unit in (("day", "D"), ("month", "M")):
+            periods = self.hours.astype(f"datetime64[{unit}]")
+            self.bucket_starts[granularity] = np.flatnonzero(
+                np.concatenate(([True], periods[1:] != periods[:-1]))
+            ) if len(periods) else np.zeros(0, dtype=np.int64)
+
+    @classmethod
+    def empty(cls, station):
+        """Rollup with no hours and no series, used when a station has no forgraph file"""
+        return cls(station, [], [], {dim: ([], np.zeros((0, 0))) for dim in DIMENSIONS}, version="empty")
+
+    def __len__(self):
+        return len(self.hours)
+
+    def window(self, start=None, end=None):
+        """
+        Locate a date range on the hour index.
+
+        Args:
+            start: First datetime to include (None for the beginning of the rollup)
+            end: Last datetime to include (None for the end of the rollup)
+
+        Returns:
+            tuple: (lo, hi) so that hours[lo:hi] is the window
+        """
+        start, end = _to_hour(start), _to_hour(end)
+        lo = 0 if start is None else int(np.searchsorted(self.hours, start, side="left"))
+        hi = len(self.hours) if end is None else int(np.searchsorted(self.hours, end, side="right"))
+        return lo, max(lo, hi)
+
+    def totals(self, dim, start=None, end=None):
+        """Per-series totals of a dimension over a window"""
+        lo, hi = self.window(start, end)
+        cumsum = self.cumsums[dim]
+        return cumsum[:, hi] - cumsum[:, lo]
+
+    def total(self, start=None, end=None):
+        """Total tests over a window"""
+        return int(self.totals(LOG_DIMENSION, start, end)[0])
+
+    def compare(self, dim, start, end):
+        """
+        Period-over-period totals: the window against the window of the same
+        length that immediately precedes it.
+
+        Returns:
+            tuple: (current totals, previous totals)
+        """
+        start, end = _to_hour(start), _to_hour(end)
+        if start is None or end is None:
+            current = self.totals(dim, start, end)
+            return current, np.zeros_like(current)
+        span = end - start + np.timedelta64(1, "h")
+        return self.totals(dim, start, end), self.totals(dim, start - span, start - np.timedelta64(1, "h"))
+
+    def resample(self, dim, granularity="hour", start=None, end=None):
+        """
+        Counts of a dimension over a window, summed per hour, day or month.
+
+        Hourly results are views into the rollup arrays; coarser buckets are
+        differences of the prefix sums at bucket edges.
+
+        Returns:
+            tuple: (period labels, 2-D count matrix of series x periods)
+        """
+        lo, hi = self.window(start, end)
+        if granularity == "hour":
+            return self.labels[lo:hi], self.counts[dim][:, lo:hi]
+
+        starts = self.bucket_starts[granularity]
+        a = np.searchsorted(starts, lo, side="right")
+        b = np.searchsorted(starts, hi, side="left")
+        edges = np.concatenate(([lo], starts[a:b], [hi])) if hi > lo else np.zeros(0, dtype=np.int64)
+        labels = self.period_labels[granularity][edges[:-1]]
+        return labels, np.diff(self.cumsums[dim][:, edges], axis=1)
+
+    def weekly_profile(self, dim=LOG_DIMENSION, start=None, end=None):
+        """
+        Counts of a dimension folded onto one week, e.g. for an hour x weekday heatmap.
+
+        The hour index is split into (week, weekday, hour of day) with integer
+        arithmetic and the counts are accumulated per (weekday, hour) with np.add.at.
+
+        Returns:
+            tuple: (3-D count array of series x 7 weekdays (Monday first) x 24 hours,
+                    number of distinct weeks in the window)
+        """
+        lo, hi = self.window(start, end)
+        days, hour = np.divmod(self.hours[lo:hi].astype(np.int64), 24)
+        weeks, weekday = np.divmod(days + 3, 7)  # Day 0 (1970-01-01) was a Thursday
+        counts = self.counts[dim]
+        profile = np.zeros((counts.shape[0], 7 * 24), dtype=np.int64)
+        np.add.at(profile, (slice(None), weekday * 24 + hour), counts[:, lo:hi])
+        return profile.reshape(-1, 7, 24), len(np.unique(weeks))
+
+
+def load_station_rollup(station, directory=FORGRAPH_DIR):
+    """
+    Load forgraph/<station>_graph.json into a StationRollup
+
+    Args:
+        station: Station (collection) name
+        directory: Directory holding the *_graph.json files
+
+    Returns:
+        StationRollup or None if the file is missing or malformed
+    """
+    path = os.path.join(directory, f"{station}_graph.json")
+    compact = os.path.join(directory, f"{station}{COMPACT_SUFFIX}")
+    if _is_current(compact, path):
+        try:
+            from data.rollup_codec import open_compact_rollup
+
+            return open_compact_rollup(compact, station)
+        except Exception as e:
+            logger.error(f"Error loading compact rollup for {station}, falling back to JSON: {e}")
+    try:
+        with open(path, "rb") as file:
+            raw = file.read()
+        data = json.loads(raw)
+
+        dimensions = {}
+        for dim, (block_key, index_key) in DIMENSIONS.items():
+            block = data.get(block_key, {index_key: []})
+            names = block[index_key]
+            rows = [block["null" if name is None else str(name)] for name in names]
+            dimensions[dim] = (names, np.array(rows, dtype=np.int64).reshape(len(names), len(data["dates"])))
+
+        version = hashlib.sha1(raw).hexdigest()[:16]
+        return StationRollup(station, data["dates"], data[LOG_KEY], dimensions, version=version)
+    except FileNotFoundError:
+        logger.warning(f"No rollup file for station {station} at {path}")
+        return None
+    except Exception as e:
+        logger.error(f"Error loading rollup for {station}: {e}")
+        return None
+
+
+def _is_current(compact, source):
+    """True if a compact encoding exists and is not older than its JSON source"""
+    try:
+        compact_mtime = os.stat(compact).st_mtime_ns
+    except OSError:
+        return False
+    try:
+        return compact_mtime >= os.stat(source).st_mtime_ns
+    except OSError:
+        return True
+
+
+def list_rollup_stations(directory=FORGRAPH_DIR):
+    """Names of the stations that have a rollup (JSON or compact) in the directory"""
+    stations = set()
+    for suffix in ("_graph.json", COMPACT_SUFFIX):
+        paths = glob.glob(os.path.join(directory, f"*{suffix}"))
+        stations.update(os.path.basename(path)[:-len(suffix)] for path in paths)
+    return sorted(stations)
+
+
+class RollupStore:
+    """
+    Query API over the station rollups.
+
+    Rollups are loaded on first use and reloaded when their file changes on disk.
+    Derived series (window, granularity, top-k) are memoized per rollup version in
+    a small LRU, and every load/query is reported to the registered hooks so the
+    cost of each chart can be measured without touching the rendering code.
+    """
+
+    def __init__(self, directory=FORGRAPH_DIR, max_cached=256, shared=None):
+        """
+        Args:
+            directory: Directory holding the *_graph.json files
+            max_cached: Maximum number of memoized derived series
+            shared: Optional SharedRollupCache so worker processes on one host
+                attach a single shared copy of each rollup
+        """
+        self.directory = directory
+        self.max_cached = max_cached
+        self.shared = shared
+        self._rollups = {}  # station -> (file mtime, StationRollup)
+        self._load_locks = {}  # station -> Lock held while that station loads
+        self._derived = OrderedDict()
+        self._hooks = []
+        self._lock = threading.RLock()
+
+    def add_hook(self, hook):
+        """
+        Register an instrumentation hook, called as hook(event, **info) where event
+        is 'load' or 'series' and info carries the station, elapsed seconds and,
+        for queries, the cache outcome.
+        """
+        self._hooks.append(hook)
+
+    def _emit(self, event, **info):
+        for hook in self._hooks:
+            try:
+                hook(event, **info)
+            except Exception as e:
+                logger.error(f"Error in rollup store hook: {e}")
+
+    def _path(self, station):
+        path = os.path.join(self.directory, f"{station}_graph.json")
+        if os.path.exists(path):
+            return path
+        return os.path.join(self.directory, f"{station}{COMPACT_SUFFIX}")
+
+    def stations(self):
+        """Stations that have a rollup in the store directory"""
+        return list_rollup_stations(self.directory)
+
+    def rollup(self, station):
+        """
+        Current rollup of a station, reloading it if the file changed
+
+        Returns:
+            StationRollup (empty if the station has no rollup file)
+        """
+        try:
+            mtime = os.stat(self._path(station)).st_mtime_ns
+        except OSError:
+            mtime = None
+
+        with self._lock:
+            cached = self._rollups.get(station)
+            if cached is not None and cached[0] == mtime:
+                return cached[1]
+            load_lock = self._load_locks.setdefault(station, threading.Lock())
+
+        # Loads hold only their station's lock, so a background load never blocks queries of other stations
+        with load_lock:
+            with self._lock:
+                cached = self._rollups.get(station)
+                if cached is not None and cached[0] == mtime:
+                    return cached[1]
+            started = time.perf_counter()
+            rollup = self._load(station, mtime)
+            with self._lock:
+                self._rollups[station] = (mtime, rollup)
+            self._emit("load", station=station, version=rollup.version, elapsed=time.perf_counter() - started)
+            return rollup
+
+    def _load(self, station, mtime):
+        """Attach the shared copy of a rollup if one is published for this file state, else parse the file"""
+        if mtime is None:
+            return StationRollup.empty(station)
+        # Dimensions not shared yet are read from the file when first used (the
+        # loaded rollup is not kept, so workers hold no private copy)
+        def load():
+            return load_station_rollup(station, self.directory)
+
+        if self.shared is not None:
+            rollup = self.shared.attach(station, source=mtime, load=load)
+            if rollup is not None:
+                return rollup
+
+        rollup = load_station_rollup(station, self.directory)
+        if rollup is None:
+            return StationRollup.empty(station)
+        if self.shared is not None:
+            try:
+                self.shared.publish(rollup, source=mtime)
+                self.shared.release_stale()
+                rollup = self.shared.attach(station, source=mtime, load=load) or rollup
+            except Exception as e:
+                logger.error(f"Error sharing rollup for {station}: {e}")
+        return rollup
+
+    def version(self, station):
+        """Content version of a station's current rollup"""
+        return self.rollup(station).version
+
+    def series(self, station, dim, granularity="hour", window=None, top_k=None, other=False):
+        """
+        Chart-ready series of one dimension.
+
+        Args:
+            station: Station name
+            dim: Dimension ('log', 'group', 'label', 'repo', 'method' or 'module')
+            granularity: 'hour', 'day' or 'month'
+            window: Optional (start, end) datetimes, either side may be None
+            top_k: Keep only the k series with the largest totals in the window
+            other: With top_k, add one OTHER_SERIES row summing the series left out
+
+        Returns:
+            tuple: (period labels, read-only 2-D count matrix of series x periods, series names)
+        """
+        started = time.perf_counter()
+        rollup = self.rollup(station)
+        start, end = window if window is not None else (None, None)
+        key = (station, rollup.version, dim, granularity, _to_hour(start), _to_hour(end), top_k, other)
+
+        def compute():
+            labels, counts = rollup.resample(dim, granularity, start, end)
+            names = list(rollup.names[dim])
+            if top_k is not None and len(names) > top_k:
+                order = np.argsort(rollup.totals(dim, start, end), kind="stable")[::-1]
+                keep = np.sort(order[:top_k])
+                kept = counts[keep]
+                if other:
+                    rest = counts[np.sort(order[top_k:])].sum(axis=0, keepdims=True)
+                    kept = np.concatenate([kept, rest])
+                    names = [names[i] for i in keep] + [OTHER_SERIES]
+                else:
+                    names = [names[i] for i in keep]
+                counts = kept
+            labels.flags.writeable = False
+            counts.flags.writeable = False
+            return labels, counts, names
+
+        result, hit = self._memoized(key, compute)
+        self._emit("series", station=station, dim=dim, granularity=granularity, hit=hit,
+                   elapsed=time.perf_counter() - started)
+        return result
+
+    def weekly_profile(self, station, dim=LOG_DIMENSION, window=None):
+        """
+        Hour x weekday profile of a dimension, memoized per rollup version
+
+        Returns:
+            tuple: (read-only series x 7 x 24 count array, number of weeks, series names)
+        """
+        started = time.perf_counter()
+        rollup = self.rollup(station)
+        start, end = window if window is not None else (None, None)
+        key = (station, rollup.version, dim, "weekly", _to_hour(start), _to_hour(end))
+
+        def compute():
+            profile, n_weeks = rollup.weekly_profile(dim, start, end)
+            profile.flags.writeable = False
+            return profile, n_weeks, list(rollup.names[dim])
+
+        result, hit = self._memoized(key, compute)
+        self._emit("series", station=station, dim=dim, granularity="weekly", hit=hit,
+                   elapsed=time.perf_counter() - started)
+        return result
+
+    def _memoized(self, key, compute):
+        """Derived result for key from the LRU, computing and storing it on a miss; returns (result, hit)"""
+        with self._lock:
+            result = self._derived.get(key)
+            if result is not None:
+                self._derived.move_to_end(key)
+                return result, True
+        result = compute()
+        with self._lock:
+            self._derived[key] = result
+            while len(self._derived) > self.max_cached:
+                self._derived.popitem(last=False)
+        return result, False
+
+    def totals(self, station, dim, window=None):
+        """Per-series totals of a dimension over a window, as (names, totals)"""
+        rollup = self.rollup(station)
+        start, end = window if window is not None else (None, None)
+        return list(rollup.names[dim]), rollup.totals(dim, start, end)
+
+    def invalidate(self, station=None):
+        """Drop cached rollups and derived series for one station, or for all of them"""
+        with self._lock:
+            if station is None:
+                self._rollups.clear()
+                self._derived.clear()
+                return
+            self._rollups.pop(station, None)
+            for key in [key for key in self._derived if key[0] == station]:
+                del self._derived[key]
@@ -0,0 +1,116 @@
+# data/dimension_index.py - Sorted dimension dictionary with prefix and substring search
+import bisect
+
+import numpy as np
+
+SEARCH_RESULTS = 50  # Matches returned per search
+NGRAM = 3
+VERIFY_BELOW = 256  # Candidates few enough to check directly instead of intersecting further postings
+
+
+def _ngram_keys(codes, n=NGRAM):
+    """Integer key of every n-gram of a code point array (21 bits per code point)"""
+    keys = np.zeros(len(codes) - n + 1, dtype=np.uint64)
+    for i in range(n):
+        keys = (keys << np.uint64(21)) | codes[i:len(codes) - n + 1 + i].astype(np.uint64)
+    return keys
+
+
+def _codes(text):
+    return np.frombuffer(text.encode("utf-32-le"), dtype="<u4")
+
+
+class DimensionIndex:
+    """
+    Distinct values of one dimension sorted case-insensitively, with a prefix
+    index (bisection over the folded names) and a trigram index for substrings.
+
+    Both are answered without scanning the names: a prefix is two bisections,
+    a substring intersects the postings of its trigrams and only checks the
+    candidates, in sorted order, until enough matches are found.
+    """
+
+    def __init__(self, values):
+        """
+        Args:
+            values: Dimension values (None and duplicates are dropped)
+        """
+        self.names = sorted({value for value in values if value is not None},
+                            key=lambda value: (str(value).casefold(), str(value)))
+        self._folded = [str(name).casefold() for name in self.names]
+
+        # Trigram postings: every (trigram, name id) pair once, sorted by trigram then id
+        text = "\0".join(self._folded)
+        codes = _codes(text)
+        if len(codes) >= NGRAM:
+            owners = np.cumsum(codes == 0)
+            keys = _ngram_keys(codes)
+            # Trigrams spanning the separator between two names are dropped
+            valid = owners[:len(keys)] == owners[NGRAM - 1:]
+            keys, ids = keys[valid], owners[:len(keys)][valid]
+            # A stable sort keeps the ids of each trigram increasing, so duplicates are adjacent
+            order = np.argsort(keys, kind="stable")
+            keys, ids = keys[order], ids[order]
+            first = np.ones(len(keys), dtype=bool)
+            first[1:] = (keys[1:] != keys[:-1]) | (ids[1:] != ids[:-1])
+            self._gram_keys, self._gram_ids = keys[first], ids[first]
+        else:
+            self._gram_keys, self._gram_ids = np.zeros(0, dtype=np.uint64), np.zeros(0, dtype=np.int64)
+
+    def __len__(self):
+        return len(self.names)
+
+    def __contains__(self, value):
+        if value is None:
+            return False
+        folded = str(value).casefold()
+        lo = bisect.bisect_left(self._folded, folded)
+        hi = bisect.bisect_right(self._folded, folded, lo)
+        return any(self.names[i] == value for i in range(lo, hi))
+
+    def prefix_ids(self, prefix):
+        """Ids (sorted positions) of the names starting with a folded prefix"""
+        lo = bisect.bisect_left(self._folded, prefix)
+        hi = bisect.bisect_left(self._folded, prefix + "\U0010ffff")
+        return range(lo, hi)
+
+    def substring_ids(self, needle):
+        """Ids of the names containing a folded needle, increasing"""
+        if len(needle) < NGRAM:
+            return (i for i, name in enumerate(self._folded) if needle in name)
+        postings = []
+        for key in np.unique(_ngram_keys(_codes(needle))):
+            lo, hi = np.searchsorted(self._gram_keys, [key, key + np.uint64(1)])
+            postings.append(self._gram_ids[lo:hi])
+        postings.sort(key=len)
+        candidates = postings[0]
+        for ids in postings[1:]:
+            if len(candidates) <= VERIFY_BELOW:
+                break
+            candidates = np.intersect1d(candidates, ids, assume_unique=True)
+        return (int(i) for i in candidates if needle in self._folded[i])
+
+    def search(self, query, limit=SEARCH_RESULTS):
+        """
+        Names matching a search-as-you-type query, case-insensitively:
+        prefix matches first, then the other names containing the query.
+
+        Args:
+            query: Typed text (empty returns the first names)
+            limit: Maximum number of names returned
+
+        Returns:
+            list: Up to limit names
+        """
+        needle = (query or "").strip().casefold()
+        if not needle:
+            return self.names[:limit]
+        prefix = self.prefix_ids(needle)
+        matches = list(prefix[:limit])
+        if len(matches) < limit:
+            for i in self.substring_ids(needle):
+                if i not in prefix:
+                    matches.append(i)
+                    if len(matches) == limit:
+                        break
+        return [self.names[i] for i in matches]
@@ -0,0 +1,150 @@
+# data/filter_options.py - On-demand option lists behind the sidebar group/label/repo/module filters
+import logging
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+
+from pymongo import MongoClient
+
+from data.dimension_index import DimensionIndex
+
+# Set up logging
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+# Filter levels, outermost first; each level's options depend on the selections above it
+FILTER_FIELDS = ("_group", "_label", "repo", "module")
+ALL_OPTIONS = {"_group": "All Groups", "_label": "All Labels", "repo": "All Repos", "module": "All Modules"}
+FILTER_TTL = 300  # Seconds an option list is served before a request for it reloads it
+FILTER_RETRY = 10  # Seconds a failed load is reported before a request for it retries it
+MAX_OPTION_LISTS = 256  # Option lists kept (one per station, level and parent selection)
+
+
+def option_key(station, field, selection=None):
+    """
+    Cache key of one option list: the station, the level and the values selected above it
+
+    Args:
+        field: One of FILTER_FIELDS
+        selection: Dict field -> selected value; missing or "All ..." values do not filter
+    """
+    level = FILTER_FIELDS.index(field)
+    return station, field, tuple(
+        (parent, selection[parent]) for parent in FILTER_FIELDS[:level]
+        if selection and parent in selection and selection[parent] != ALL_OPTIONS[parent]
+    )
+
+
+def load_filter_options(db, station, field, constraints=()):
+    """
+    Distinct values of one filter level under the selected parent values.
+    A distinct query on the field (served by an index on the filter fields,
+    outermost first) instead of a scan of the station's documents.
+
+    Returns:
+        DimensionIndex over the values
+    """
+    started = time.time()
+    values = db[station].distinct(field, dict(constraints))
+    logger.info(f"Loaded {len(values)} {field} options of {station} in {time.time() - started:.2f}s")
+    return DimensionIndex(values)
+
+
+class FilterOptionCache:
+    """
+    Filter option lists loaded on demand in background threads and kept for ttl seconds.
+
+    Only requested lists are loaded: the selected station's levels, under the
+    current parent selection, all submitted together by prefetch. A request for
+    an expired list serves the old one while it reloads; failed loads are
+    retried by requests made retry seconds after they failed. Nothing is
+    reloaded unless it is asked for again.
+    """
+
+    def __init__(self, connection_string, database, ttl=FILTER_TTL, max_workers=4, max_lists=MAX_OPTION_LISTS,
+                 retry=FILTER_RETRY):
+        """
+        Args:
+            connection_string: MongoDB URI
+            database: Database holding the station collections
+            ttl: Seconds before a requested list is reloaded
+            max_workers: Concurrent loads, enough for every level of a station at once
+            max_lists: Option lists kept, least recently used dropped first
+            retry: Seconds before a failed list is loaded again
+        """
+        self.connection_string = connection_string
+        self.database = database
+        self.ttl = ttl
+        self.max_lists = max_lists
+        self.retry = retry
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="filter-options")
+        self._loads = OrderedDict()  # option key -> (start time, Future, previous Future)
+        self._failures = {}  # Future -> time its load failed
+        self._client = None
+        self._lock = threading.Lock()
+
+    def _db(self):
+        # Opened in a worker on first use, so connection errors surface through the future
+        with self._lock:
+            if self._client is None:
+                self._client = MongoClient(self.connection_string)
+            return self._client[self.database]
+
+    def _fetch(self, key):
+        station, field, constraints = key
+        return load_filter_options(self._db(), station, field, constraints)
+
+    def _failed(self, future):
+        if future.exception() is not None:
+            with self._lock:
+                self._failures[future] = time.time()
+
+    def _load(self, key):
+        """Future holding the list to serve; an expired one keeps serving while its reload runs"""
+        with self._lock:
+            started, future, previous = self._loads.get(key, (0, None, None))
+            if future is not None and future.done():
+                if future.exception() is not None:
+                    if time.time() - self._failures.get(future, time.time()) >= self.retry:
+                        self._failures.pop(future, None)
+                        future = None
+                elif time.time() - started >= self.ttl:
+                    previous, future = future, None
+            if future is None:
+                future = self._executor.submit(self._fetch, key)
+                future.add_done_callback(self._failed)
+                started = time.time()
+            elif future.done():
+                previous = None
+            self._loads[key] = (started, future, previous)
+            self._loads.move_to_end(key)
+            while len(self._loads) > self.max_lists:
+                _, (_, dropped, _) = self._loads.popitem(last=False)
+                self._failures.pop(dropped, None)
+            return previous if previous is not None and not future.done() else future
+
+    def prefetch(self, station, selection=None):
+        """
+        Submit the loads of every level of a station under one selection together,
+        so the levels load side by side instead of one after another
+
+        Returns:
+            Dict field -> Future of the list served for that level
+        """
+        return {field: self._load(option_key(station, field, selection)) for field in FILTER_FIELDS}
+
+    def peek(self, station, field, selection=None):
+        """
+        Search index over the options of one level if its load has finished,
+        else None (the load is started if it was not); raises the load's error if it failed
+        """
+        future = self._load(option_key(station, field, selection))
+        return future.result() if future.done() else None
+
+    def index(self, station, field, selection=None, timeout=None):
+        """
+        Search index over the options of one level of a station (see option_key);
+        raises the load's error if it failed
+        """
+        return self._load(option_key(station, field, selection)).result(timeout)
@@ -0,0 +1,274 @@
+# data/fleet_store.py - Station x time x dimension tensors for fleet-wide aggregation
+import logging
+import threading
+
+import numpy as np
+
+from data.data_loader import (
+    DIMENSIONS,
+    FORGRAPH_DIR,
+    LOG_DIMENSION,
+    _to_hour,
+    list_rollup_stations,
+    load_station_rollup,
+)
+
+# Set up logging
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+
+def _time_prefix_sum(tensor):
+    """Prefix sums along the hour axis of a (station, time, value) tensor, with a leading zero row"""
+    cumsum = np.zeros((tensor.shape[0], tensor.shape[1] + 1, tensor.shape[2]), dtype=np.int64)
+    np.cumsum(tensor, axis=1, out=cumsum[:, 1:, :])
+    return cumsum
+
+
+def _resize(tensor, n_stations, t_offset, n_hours, n_values):
+    """
+    Copy a (station, time, value) tensor into a zero tensor of the given shape,
+    shifting time by t_offset (a negative offset drops leading hours)
+    """
+    resized = np.zeros((n_stations, n_hours, n_values), dtype=tensor.dtype)
+    s, t, v = tensor.shape
+    s = min(s, n_stations)
+    lo, hi = max(0, -t_offset), min(t, n_hours - t_offset)
+    if hi > lo:
+        resized[:s, lo + t_offset:hi + t_offset, :v] = tensor[:s, lo:hi]
+    return resized
+
+
+class FleetStore:
+    """
+    All station rollups aligned on a common hourly axis and a global dictionary
+    per dimension.
+
+    Each dimension is a 3-D tensor (station x hour x dimension value) with prefix
+    sums along the hour axis, so fleet totals, per-station breakdowns and station
+    rankings over any window are single numpy reductions. Stations are republished
+    one at a time; only the affected row is rewritten unless the axis or the
+    dictionary has to grow.
+    """
+
+    def __init__(self, dimensions=None):
+        """
+        Args:
+            dimensions: Dimensions to hold (default: all); only these are read from
+                published rollups and kept as tensors
+        """
+        self.stations = []
+        self.versions = {}
+        self.ranges = {}  # station -> (first hour, last hour) of its rollup
+        self.hours = np.zeros(0, dtype="datetime64[h]")
+        self.names = {dim: [] for dim in (dimensions or (LOG_DIMENSION, *DIMENSIONS))}
+        self.dictionary = {dim: {} for dim in self.names}
+        self.tensors = {dim: np.zeros((0, 0, 0), dtype=np.int32) for dim in self.names}
+        self.cumsums = {dim: np.zeros((0, 1, 0), dtype=np.int64) for dim in self.names}
+        # Held by sync() while stations are republished; readers take it for a consistent view
+        self.lock = threading.RLock()
+
+    def __len__(self):
+        return len(self.stations)
+
+    def _align_axis(self):
+        """
+        Fit the common time axis to the union of the published stations' ranges,
+        so it grows and shrinks with them; returns the time offset applied to the
+        tensors (0 if the axis is unchanged)
+        """
+        if self.ranges:
+            start = min(first for first, _ in self.ranges.values())
+            end = max(last for _, last in self.ranges.values())
+            hours = np.arange(start, end + np.timedelta64(1, "h"), dtype="datetime64[h]")
+        else:
+            hours = np.zeros(0, dtype="datetime64[h]")
+        if len(hours) == len(self.hours) and (len(hours) == 0 or hours[0] == self.hours[0]):
+            return 0
+        offset = int((self.hours[0] - hours[0]) // np.timedelta64(1, "h")) if len(hours) and len(self.hours) else 0
+        for dim, tensor in self.tensors.items():
+            self.tensors[dim] = _resize(tensor, tensor.shape[0], offset, len(hours), tensor.shape[2])
+        self.hours = hours
+        return offset or True
+
+    def _columns(self, dim, names):
+        """Global dictionary ids for a station's dimension values, adding unseen values"""
+        dictionary = self.dictionary[dim]
+        for name in names:
+            if name not in dictionary:
+                dictionary[name] = len(self.names[dim])
+                self.names[dim].append(name)
+        return np.array([dictionary[name] for name in names], dtype=np.int64)
+
+    def publish(self, rollup):
+        """
+        Insert or replace one station's rollup.
+
+        Args:
+            rollup: StationRollup to publish
+
+        Returns:
+            bool: False if the same version was already published
+        """
+        if rollup.version is not None and self.versions.get(rollup.station) == rollup.version:
+            return False
+
+        if len(rollup.hours):
+            self.ranges[rollup.station] = (rollup.hours[0], rollup.hours[-1])
+        else:
+            self.ranges.pop(rollup.station, None)
+        realigned = self._align_axis()
+        if rollup.station not in self.stations:
+            self.stations.append(rollup.station)
+        row = self.stations.index(rollup.station)
+        positions = ((rollup.hours - self.hours[0]) // np.timedelta64(1, "h")).astype(np.int64) \
+            if len(rollup.hours) else np.zeros(0, dtype=np.int64)
+
+        for dim in self.tensors:
+            columns = self._columns(dim, rollup.names[dim])
+            shape = (len(self.stations), len(self.hours), len(self.names[dim]))
+            rebuild = realigned or self.tensors[dim].shape != shape
+            if self.tensors[dim].shape != shape:
+                self.tensors[dim] = _resize(self.tensors[dim], shape[0], 0, shape[1], shape[2])
+
+            tensor = self.tensors[dim]
+            tensor[row] = 0
+            if len(columns) and len(positions):
+                tensor[row, positions[:, None], columns[None, :]] = rollup.counts[dim].T
+            if rebuild:
+                self.cumsums[dim] = _time_prefix_sum(tensor)
+            else:
+                np.cumsum(tensor[row], axis=0, out=self.cumsums[dim][row, 1:, :])
+
+        self.versions[rollup.station] = rollup.version
+        logger.info(f"Published {rollup.station} ({rollup.version}) to fleet store")
+        return True
+
+    def remove(self, station):
+        """Drop a station from the store"""
+        if station not in self.stations:
+            return
+        row = self.stations.index(station)
+        self.stations.pop(row)
+        self.versions.pop(station, None)
+        self.ranges.pop(station, None)
+        for dim in self.tensors:
+            self.tensors[dim] = np.delete(self.tensors[dim], row, axis=0)
+        # Hours only the removed station covered are dropped from the axis
+        realigned = self._align_axis()
+        for dim, tensor in self.tensors.items():
+            if realigned:
+                self.cumsums[dim] = _time_prefix_sum(tensor)
+            else:
+                self.cumsums[dim] = np.delete(self.cumsums[dim], row, axis=0)
+
+    def window(self, start=None, end=None):
+        """Locate a date range on the common hour axis; returns (lo, hi)"""
+        start, end = _to_hour(start), _to_hour(end)
+        lo = 0 if start is None else int(np.searchsorted(self.hours, start, side="left"))
+        hi = len(self.hours) if end is None else int(np.searchsorted(self.hours, end, side="right"))
+        return lo, max(lo, hi)
+
+    def totals(self, dim, start=None, end=None):
+        """Station x dimension value totals over a window"""
+        lo, hi = self.window(start, end)
+        cumsum = self.cumsums[dim]
+        return cumsum[:, hi, :] - cumsum[:, lo, :]
+
+    def total_tests(self, start=None, end=None):
+        """Total tests across all stations over a window"""
+        return int(self.totals(LOG_DIMENSION, start, end).sum())
+
+    def tests_by_station(self, start=None, end=None):
+        """Total tests per station over a window, in the order of self.stations"""
+        return self.totals(LOG_DIMENSION, start, end)[:, 0]
+
+    def by_station(self, dim, start=None, end=None):
+        """
+        Per-station breakdown of a dimension, e.g. labels by station.
+
+        Returns:
+            tuple: (stations, dimension values, station x value totals)
+        """
+        return list(self.stations), list(self.names[dim]), self.totals(dim, start, end)
+
+    def top_stations(self, k=5, start=None, end=None):
+        """Stations with the most tests over a window, as (station, tests) pairs"""
+        tests = self.tests_by_station(start, end)
+        order = np.argsort(tests, kind="stable")[::-1][:k]
+        return [(self.stations[i], int(tests[i])) for i in order]
+
+    def fleet_series(self, dim, start=None, end=None):
+        """Hourly counts summed over all stations, as (hours, hour x value matrix)"""
+        lo, hi = self.window(start, end)
+        return self.hours[lo:hi], self.tensors[dim][:, lo:hi, :].sum(axis=0)
+
+    def tests_per_period(self, granularity="day", start=None, end=None):
+        """
+        Tests per station per day or month, from the prefix sums at period edges
+
+        Returns:
+            tuple: (period labels, station x period matrix)
+        """
+        lo, hi = self.window(start, end)
+        if hi <= lo:
+            return np.zeros(0, dtype=str), np.zeros((len(self.stations), 0), dtype=np.int64)
+        unit = "D" if granularity == "day" else "M"
+        periods = self.hours[lo:hi].astype(f"datetime64[{unit}]")
+        edges = np.concatenate(([0], np.flatnonzero(periods[1:] != periods[:-1]) + 1, [hi - lo])) + lo
+        counts = np.diff(self.cumsums[LOG_DIMENSION][:, edges, 0], axis=1)
+        return np.datetime_as_string(periods[edges[:-1] - lo]), counts
+
+    def top_by_station(self, dim, k=5, start=None, end=None):
+        """
+        The k largest values of a dimension at every station, ranked in one argsort
+
+        Returns:
+            list: Per station (in the order of self.stations), (names, totals) of
+                  its top values with a non-zero total
+        """
+        totals = self.totals(dim, start, end)
+        order = np.argsort(-totals, axis=1, kind="stable")[:, :k]
+        top = np.take_along_axis(totals, order, axis=1)
+        names = self.names[dim]
+        return [
+            ([names[i] for i in row[counts > 0]], counts[counts > 0])
+            for row, counts in zip(order, top)
+        ]
+
+    def sync(self, rollup_store):
+        """
+        Publish the current rollup of every station in a RollupStore and drop
+        stations that no longer have one; unchanged versions are skipped
+
+        Returns:
+            list: Stations that were (re)published
+        """
+        stations = rollup_store.stations()
+        with self.lock:
+            updated = [station for station in stations if self.publish(rollup_store.rollup(station))]
+            for station in [s for s in self.stations if s not in stations]:
+                self.remove(station)
+        return updated
+
+
+def refresh_fleet_store(store, directory=FORGRAPH_DIR):
+    """
+    Republish every station whose rollup changed since it was last published
+
+    Args:
+        store: FleetStore to update in place
+        directory: Directory holding the *_graph.json files
+
+    Returns:
+        list: Stations that were (re)published
+    """
+    updated = []
+    stations = list_rollup_stations(directory)
+    for station in stations:
+        rollup = load_station_rollup(station, directory)
+        if rollup is not None and store.publish(rollup):
+            updated.append(station)
+    for station in [s for s in store.stations if s not in stations]:
+        store.remove(station)
+    return updated
@@ -0,0 +1,171 @@
+# data/lake.py - Local Parquet mirror of the station collections, partitioned by station/month
+import argparse
+import logging
+import os
+import sys
+import uuid
+
+import pandas as pd
+import pyarrow as pa
+import pyarrow.dataset as ds
+
+# Set up logging
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+LAKE_DIR = "lake"
+EXPORT_BATCH_SIZE = 50000
+
+# Flattened test document; every station writes the same schema so the lake can be scanned as one table
+LAKE_SCHEMA = pa.schema([
+    ("_id", pa.string()),
+    ("dtime", pa.timestamp("us")),
+    ("_group", pa.string()),
+    ("_label", pa.string()),
+    ("repo", pa.string()),
+    ("method", pa.string()),
+    ("module", pa.string()),
+    ("test_duration", pa.float64()),
+    ("usage_time", pa.float64()),
+    ("available_time", pa.float64()),
+    ("downtime_hours", pa.float64()),
+    ("available_hours", pa.float64()),
+])
+PARTITION_SCHEMA = pa.schema([("station", pa.string()), ("month", pa.string())])
+
+LAKE_PROJECTION = {field.name: 1 for field in LAKE_SCHEMA}
+
+
+def flatten_documents(documents, station):
+    """
+    Turn raw station documents into a table with the lake schema.
+
+    Extended-JSON dates ({"$date": ...}) and ObjectIds are normalized, missing
+    fields become nulls and fields outside the schema are dropped.
+
+    Args:
+        documents: List of MongoDB documents from one station collection
+        station: Station (collection) name
+
+    Returns:
+        pyarrow.Table with the lake schema plus the station/month partition columns
+    """
+    df = pd.DataFrame(documents)
+    for field in LAKE_SCHEMA:
+        if field.name not in df.columns:
+            df[field.name] = None
+
+    df["_id"] = df["_id"].astype(str)
+    dtime = df["dtime"].apply(lambda x: x["$date"] if isinstance(x, dict) else x)
+    df["dtime"] = pd.to_datetime(dtime, errors="coerce", utc=True).dt.tz_localize(None)
+    df = df[df["dtime"].notna()]
+    for field in LAKE_SCHEMA:
+        if pa.types.is_string(field.type) and field.name != "_id":
+            df[field.name] = df[field.name].map(lambda x: None if x is None or x != x else str(x))
+        elif pa.types.is_floating(field.type):
+            df[field.name] = pd.to_numeric(df[field.name], errors="coerce")
+
+    table = pa.Table.from_pandas(df[LAKE_SCHEMA.names], schema=LAKE_SCHEMA, preserve_index=False)
+    months = df["dtime"].dt.strftime("%Y-%m").tolist()
+    table = table.append_column("station", pa.array([station] * len(df), type=pa.string()))
+    return table.append_column("month", pa.array(months, type=pa.string()))
+
+
+def write_partitioned(table, lake_dir=LAKE_DIR, basename=None):
+    """
+    Append a table to the lake as new files under station=<station>/month=<YYYY-MM>/
+
+    Args:
+        table: Table produced by flatten_documents
+        lake_dir: Root directory of the lake
+        basename: File name template ('{i}' is replaced per partition); unique by default
+
+    Returns:
+        list: Paths of the files written
+    """
+    if table.num_rows == 0:
+        return []
+    written = []
+    ds.write_dataset(
+        table,
+        lake_dir,
+        format="parquet",
+        partitioning=ds.partitioning(PARTITION_SCHEMA, flavor="hive"),
+        basename_template=basename or f"part-{uuid.uuid4().hex}-{{i}}.parquet",
+        existing_data_behavior="overwrite_or_ignore",
+        file_visitor=lambda file: written.append(file.path),
+    )
+    return written
+
+
+def export_collection(db, station, lake_dir=LAKE_DIR, query=None, batch_size=EXPORT_BATCH_SIZE):
+    """
+    Stream one station collection into the lake in batches, without a sync
+    checkpoint (data.lake_sync will refuse to sync the station afterwards)
+
+    Args:
+        db: MongoDB database
+        station: Station (collection) name
+        lake_dir: Root directory of the lake
+        query: Optional MongoDB filter
+        batch_size: Documents per written batch
+
+    Returns:
+        int: Number of documents exported
+    """
+    cursor = db[station].find(query or {}, LAKE_PROJECTION, batch_size=min(batch_size, 10000))
+    exported, batch = 0, []
+    for document in cursor:
+        batch.append(document)
+        if len(batch) >= batch_size:
+            write_partitioned(flatten_documents(batch, station), lake_dir)
+            exported += len(batch)
+            batch = []
+    if batch:
+        write_partitioned(flatten_documents(batch, station), lake_dir)
+        exported += len(batch)
+    logger.info(f"Exported {exported} documents from {station} to {lake_dir}")
+    return exported
+
+
+def lake_stations(lake_dir=LAKE_DIR):
+    """Stations that have a partition in the lake"""
+    if not os.path.isdir(lake_dir):
+        return []
+    return sorted(name[len("station="):] for name in os.listdir(lake_dir) if name.startswith("station="))
+
+
+def main():
+    """Export station collections from MongoDB into the local Parquet lake"""
+    from pymongo import MongoClient
+
+    from data.lake_sync import LakeSync
+    from data.stations import station_collections
+    from metrics_calculator_service import CONNECTION_STRING, DATABASE_NAME
+
+    parser = argparse.ArgumentParser(description="Mirror station collections into a local Parquet lake")
+    parser.add_argument("stations", nargs="*", help="Collections to export (default: all station collections)")
+    parser.add_argument("--lake", default=LAKE_DIR, help="Root directory of the lake")
+    parser.add_argument("--batch-size", type=int, default=EXPORT_BATCH_SIZE)
+    args = parser.parse_args()
+
+    client = MongoClient(CONNECTION_STRING)
+    try:
+        db = client[DATABASE_NAME]
+        stations = args.stations or station_collections(db.list_collection_names())
+        # Exported through the sync so its checkpoints are seeded and data.lake_sync
+        # continues from there; stations that already have one only catch up
+        sync = LakeSync(db, args.lake, args.batch_size)
+        sync.recover()
+        synced = sync.load_checkpoints()
+        for station in stations:
+            if station in synced:
+                logger.info(f"{station} is already in the lake; exporting only its new documents")
+            sync.sync_station(station)
+    finally:
+        client.close()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
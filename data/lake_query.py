@@ -0,0 +1,148 @@
+# data/lake_query.py - DuckDB queries over the local Parquet lake
+import glob
+import logging
+import os
+import threading
+
+import pyarrow as pa
+
+from data.lake import LAKE_DIR, LAKE_SCHEMA, PARTITION_SCHEMA
+
+# Set up logging
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+# Dimension name -> lake column
+DIMENSION_COLUMNS = {
+    "group": "_group",
+    "label": "_label",
+    "repo": "repo",
+    "method": "method",
+    "module": "module",
+}
+
+PERIODS = ("hour", "day", "week", "month", "year")
+
+
+class LakeQuery:
+    """
+    Analytical queries against the Parquet lake written by data.lake.
+
+    The lake is exposed to DuckDB as a 'tests' view with hive partition columns
+    (station, month), so filters on either prune whole directories before any
+    file is opened. DuckDB runs the scans and group-bys vectorized on all cores,
+    keeping ad-hoc analysis off the operational MongoDB cluster.
+    """
+
+    def __init__(self, lake_dir=LAKE_DIR, threads=None):
+        """
+        Args:
+            lake_dir: Root directory of the lake
+            threads: DuckDB worker threads (defaults to all cores)
+        """
+        import duckdb
+
+        self.lake_dir = lake_dir
+        self._connection = duckdb.connect()
+        if threads:
+            self._connection.execute(f"SET threads TO {int(threads)}")
+        self._lock = threading.Lock()
+        self.refresh()
+
+    def refresh(self):
+        """(Re)create the 'tests' view so newly written partitions are picked up"""
+        pattern = os.path.join(self.lake_dir, "station=*", "month=*", "*.parquet")
+        with self._lock:
+            if not glob.glob(pattern):
+                # Nothing exported yet: an empty view with the lake schema keeps queries valid
+                empty = pa.schema(list(LAKE_SCHEMA) + list(PARTITION_SCHEMA)).empty_table()
+                self._connection.from_arrow(empty).create_view("tests", replace=True)
+                return
+            pattern = pattern.replace("'", "''")
+            self._connection.execute(
+                f"CREATE OR REPLACE VIEW tests AS "
+                f"SELECT * FROM read_parquet('{pattern}', hive_partitioning = true, union_by_name = true)"
+            )
+
+    def query(self, sql, params=None):
+        """
+        Run arbitrary SQL against the 'tests' view
+
+        Returns:
+            pandas.DataFrame with the result
+        """
+        with self._lock:
+            cursor = self._connection.cursor()
+        try:
+            return cursor.execute(sql, params or []).fetchdf()
+        finally:
+            cursor.close()
+
+    @staticmethod
+    def _filters(station=None, start=None, end=None):
+        clauses, params = [], []
+        if station:
+            clauses.append("station = ?")
+            params.append(station)
+        if start is not None:
+            clauses.append("dtime >= ?")
+            clauses.append("month >= strftime(CAST(? AS TIMESTAMP), '%Y-%m')")
+            params.extend([start, start])
+        if end is not None:
+            clauses.append("dtime <= ?")
+            clauses.append("month <= strftime(CAST(? AS TIMESTAMP), '%Y-%m')")
+            params.extend([end, end])
+        return (" WHERE " + " AND ".join(clauses)) if clauses else "", params
+
+    def counts_by(self, dim, period="week", station=None, start=None, end=None):
+        """
+        Test counts per dimension value per period, e.g. tests per repo per week
+
+        Args:
+            dim: Dimension ('group', 'label', 'repo', 'method' or 'module')
+            period: 'hour', 'day', 'week', 'month' or 'year'
+            station: Optional station to restrict to
+            start, end: Optional datetime bounds (inclusive)
+
+        Returns:
+            pandas.DataFrame with columns period, <dim>, tests
+        """
+        if dim not in DIMENSION_COLUMNS:
+            raise ValueError(f"Unknown dimension {dim}")
+        if period not in PERIODS:
+            raise ValueError(f"Unknown period {period}")
+        column = DIMENSION_COLUMNS[dim]
+        where, params = self._filters(station, start, end)
+        return self.query(
+            f"SELECT date_trunc('{period}', dtime) AS period, {column} AS {dim}, count(*) AS tests "
+            f"FROM tests{where} GROUP BY ALL ORDER BY period, tests DESC",
+            params,
+        )
+
+    def tests_by_station(self, period="day", start=None, end=None):
+        """Test counts per station per period, as a DataFrame with columns period, station, tests"""
+        if period not in PERIODS:
+            raise ValueError(f"Unknown period {period}")
+        where, params = self._filters(None, start, end)
+        return self.query(
+            f"SELECT date_trunc('{period}', dtime) AS period, station, count(*) AS tests "
+            f"FROM tests{where} GROUP BY ALL ORDER BY period, station",
+            params,
+        )
+
+    def duration_stats(self, dim, station=None, start=None, end=None):
+        """Test count and duration statistics per dimension value"""
+        if dim not in DIMENSION_COLUMNS:
+            raise ValueError(f"Unknown dimension {dim}")
+        column = DIMENSION_COLUMNS[dim]
+        where, params = self._filters(station, start, end)
+        return self.query(
+            f"SELECT {column} AS {dim}, count(*) AS tests, avg(test_duration) AS avg_duration, "
+            f"quantile_cont(test_duration, 0.95) AS p95_duration, sum(test_duration) AS total_duration "
+            f"FROM tests{where} GROUP BY ALL ORDER BY tests DESC",
+            params,
+        )
+
+    def close(self):
+        with self._lock:
+            self._connection.close()
@@ -0,0 +1,380 @@
+# data/lake_sync.py - Incremental MongoDB -> Parquet lake sync with resumable checkpoints
+import argparse
+import contextlib
+import fcntl
+import glob
+import json
+import logging
+import os
+import shutil
+import sys
+import time
+import uuid
+from datetime import datetime
+
+import pyarrow.compute as pc
+import pyarrow.dataset as ds
+import pyarrow.parquet as pq
+from bson import json_util
+
+from data.lake import EXPORT_BATCH_SIZE, LAKE_DIR, LAKE_PROJECTION, flatten_documents, write_partitioned
+
+# Set up logging
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+CHECKPOINT_FILE = "_checkpoints.json"
+JOURNAL_FILE = "_compaction.json"
+STAGING_DIR = "_staging"
+SYNC_INTERVAL = 300  # Seconds between sync passes when running continuously
+COMPACT_MIN_FILES = 8  # Compact a partition once it holds this many files
+# Change stream events of a station: its inserts, reduced to the lake fields
+STREAM_PIPELINE = [
+    {"$match": {"operationType": "insert"}},
+    {"$project": {"clusterTime": 1, **{f"fullDocument.{name}": 1 for name in LAKE_PROJECTION}}},
+]
+
+
+class LakeSync:
+    """
+    Keeps the Parquet lake in step with the station collections, reading each
+    document from MongoDB once.
+
+    A station is exported once by a scan in _id order and then followed through
+    its change stream, which yields inserts in commit order whatever _id the
+    client assigned. The stream position is taken before the scan starts, so a
+    document committed during the scan is tailed afterwards even if the scan had
+    already passed its _id. Stream events up to the server cluster time at which
+    the scan finished (the overlap window) may also have been scanned; their
+    _ids are looked up in the lake while staging and the ones found are dropped.
+
+    Per station a checkpoint records the scan position while the scan runs, the
+    stream's resume token and, for reporting, the newest dtime. Each batch is
+    first written to a staging directory; the checkpoint then advances and names
+    the staged batch as pending, and only after that are the files moved into
+    their partitions. After a crash, recover() either finishes moving a pending
+    batch or discards an unrecorded one (which the next pass re-reads), so every
+    document lands in the lake exactly once, as long as the stream is resumed
+    within the oplog window.
+
+    Partitions that accumulate many small batch files are compacted into one file;
+    the compaction is journaled so an interrupted compaction is finished on the
+    next run instead of leaving both the inputs and the output in place.
+    """
+
+    def __init__(self, db, lake_dir=LAKE_DIR, batch_size=EXPORT_BATCH_SIZE, compact_min_files=COMPACT_MIN_FILES):
+        """
+        Args:
+            db: MongoDB database holding the station collections (on a replica set,
+                for change streams)
+            lake_dir: Root directory of the lake
+            batch_size: Documents per batch (and per checkpoint advance)
+            compact_min_files: Files in a partition that trigger compaction
+        """
+        self.db = db
+        self.lake_dir = lake_dir
+        self.batch_size = batch_size
+        self.compact_min_files = compact_min_files
+        self.checkpoint_path = os.path.join(lake_dir, CHECKPOINT_FILE)
+        os.makedirs(lake_dir, exist_ok=True)
+
+    @contextlib.contextmanager
+    def _locked(self):
+        """Only one sync/compaction may modify the lake at a time"""
+        with open(os.path.join(self.lake_dir, ".sync.lock"), "a") as lock:
+            fcntl.flock(lock, fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                fcntl.flock(lock, fcntl.LOCK_UN)
+
+    def load_checkpoints(self):
+        """Station -> checkpoint dict ({} before the first sync)"""
+        try:
+            with open(self.checkpoint_path) as file:
+                return json.load(file)
+        except FileNotFoundError:
+            return {}
+
+    def _save_checkpoint(self, station, checkpoint):
+        checkpoints = self.load_checkpoints()
+        checkpoints[station] = checkpoint
+        tmp_path = self.checkpoint_path + ".tmp"
+        with open(tmp_path, "w") as file:
+            json.dump(checkpoints, file, indent=2)
+            file.flush()
+            os.fsync(file.fileno())
+        os.replace(tmp_path, self.checkpoint_path)
+
+    def _stage_batch(self, station, documents):
+        """Write a batch under the staging directory; returns its path relative to the lake"""
+        staging = os.path.join(STAGING_DIR, f"{station}-{uuid.uuid4().hex}")
+        basename = f"batch-{uuid.uuid4().hex}-{{i}}.parquet"
+        write_partitioned(flatten_documents(documents, station), os.path.join(self.lake_dir, staging), basename)
+        return staging
+
+    def _publish_staged(self, staging):
+        """Move staged files into their partitions (idempotent, so it can be resumed)"""
+        root = os.path.join(self.lake_dir, staging)
+        for path in glob.glob(os.path.join(root, "station=*", "month=*", "*.parquet")):
+            target = os.path.join(self.lake_dir, os.path.relpath(path, root))
+            os.makedirs(os.path.dirname(target), exist_ok=True)
+            os.replace(path, target)
+        shutil.rmtree(root, ignore_errors=True)
+
+    def _lake_ids(self, station, ids):
+        """The given _ids (as strings) that are already in the station's partitions"""
+        paths = glob.glob(os.path.join(self.lake_dir, f"station={station}", "month=*", "*.parquet"))
+        if not paths or not ids:
+            return set()
+        table = ds.dataset(paths, format="parquet").to_table(columns=["_id"], filter=pc.field("_id").isin(ids))
+        return set(table.column("_id").to_pylist())
+
+    def _cluster_time(self):
+        """Current cluster time of the deployment (a server-assigned bson Timestamp)"""
+        with self.db.client.start_session() as session:
+            self.db.command("ping", session=session)
+            return session.operation_time
+
+    def sync_station(self, station):
+        """
+        Export the documents added to a station collection since its checkpoint
+        (the whole collection on the first pass)
+
+        Returns:
+            int: Number of documents exported
+        """
+        with self._locked():
+            checkpoint = self.load_checkpoints().get(station)
+            if checkpoint is None:
+                if glob.glob(os.path.join(self.lake_dir, f"station={station}", "month=*", "*.parquet")):
+                    raise RuntimeError(
+                        f"{station} is in the lake without a sync checkpoint; "
+                        f"remove {os.path.join(self.lake_dir, f'station={station}')} to re-export it"
+                    )
+                checkpoint = {"documents": 0}
+            if checkpoint.get("pending"):
+                raise RuntimeError(f"{station} has an unpublished batch; run recover() first")
+
+            exported = 0
+            if checkpoint.get("resume_token") is None or "scan_last_id" in checkpoint:
+                exported += self._scan(station, checkpoint)
+            exported += self._tail(station, checkpoint)
+
+        if exported:
+            logger.info(f"Synced {exported} new documents from {station} (newest dtime {checkpoint.get('last_dtime')})")
+        return exported
+
+    def _scan(self, station, checkpoint):
+        """First export of a station: every document in _id order, resumable by _id"""
+        collection = self.db[station]
+        if checkpoint.get("resume_token") is None:
+            # The stream position is fixed before the scan, so whatever commits from
+            # here on is also tailed, whether or not the scan still reaches it
+            with collection.watch(STREAM_PIPELINE) as stream:
+                checkpoint["resume_token"] = json_util.dumps(stream.resume_token)
+            checkpoint["scan_last_id"] = None
+            self._save_checkpoint(station, checkpoint)
+
+        query = {}
+        if checkpoint["scan_last_id"] is not None:
+            query["_id"] = {"$gt": json_util.loads(checkpoint["scan_last_id"])}
+        cursor = collection.find(query, LAKE_PROJECTION).sort("_id", 1).batch_size(min(self.batch_size, 10000))
+        exported, batch = 0, []
+        for document in cursor:
+            batch.append(document)
+            if len(batch) >= self.batch_size:
+                exported += self._commit_batch(station, batch, checkpoint, scan_last_id=json_util.dumps(batch[-1]["_id"]))
+                batch = []
+        if batch:
+            exported += self._commit_batch(station, batch, checkpoint, scan_last_id=json_util.dumps(batch[-1]["_id"]))
+
+        # Stream events up to now may repeat scanned documents
+        del checkpoint["scan_last_id"]
+        checkpoint["overlap_until"] = json_util.dumps(self._cluster_time())
+        self._save_checkpoint(station, checkpoint)
+        return exported
+
+    def _tail(self, station, checkpoint):
+        """Export the inserts committed since the checkpoint's stream position"""
+        resume_token = json_util.loads(checkpoint["resume_token"])
+        exported, batch, overlap = 0, [], False
+        with self.db[station].watch(STREAM_PIPELINE, resume_after=resume_token) as stream:
+            while True:
+                change = stream.try_next()
+                if change is not None:
+                    overlap_until = checkpoint.get("overlap_until")
+                    if overlap_until is not None:
+                        if change["clusterTime"] <= json_util.loads(overlap_until):
+                            overlap = True
+                        else:
+                            # Events arrive in commit order: none after this one were scanned
+                            checkpoint.pop("overlap_until")
+                    batch.append(change["fullDocument"])
+                if batch and (change is None or len(batch) >= self.batch_size):
+                    if overlap:
+                        exported_ids = self._lake_ids(station, [str(document["_id"]) for document in batch])
+                        batch = [document for document in batch if str(document["_id"]) not in exported_ids]
+                        overlap = False
+                    exported += self._commit_batch(station, batch, checkpoint,
+                                                   resume_token=json_util.dumps(stream.resume_token))
+                    batch = []
+                if change is None:
+                    break
+            # The stream moves past events that are not inserts as well
+            checkpoint["resume_token"] = json_util.dumps(stream.resume_token)
+            self._save_checkpoint(station, checkpoint)
+        return exported
+
+    def _commit_batch(self, station, batch, checkpoint, **position):
+        """
+        Stage one batch, advance the checkpoint past it (to the given scan or
+        stream position, recording the staged files as pending), then move the
+        files into the lake
+        """
+        staging = self._stage_batch(station, batch) if batch else None
+        dtimes = [doc["dtime"] for doc in batch if isinstance(doc.get("dtime"), datetime)]
+        if dtimes:
+            newest = max(dtimes).isoformat()
+            checkpoint["last_dtime"] = max(checkpoint.get("last_dtime") or newest, newest)
+        checkpoint.update(position)
+        checkpoint["documents"] = checkpoint.get("documents", 0) + len(batch)
+        checkpoint["updated"] = datetime.now().isoformat()
+        if staging is None:
+            self._save_checkpoint(station, checkpoint)
+            return 0
+        checkpoint["pending"] = staging
+        self._save_checkpoint(station, checkpoint)
+
+        self._publish_staged(staging)
+        del checkpoint["pending"]
+        self._save_checkpoint(station, checkpoint)
+        return len(batch)
+
+    def _partitions(self, station=None):
+        pattern = os.path.join(self.lake_dir, f"station={station}" if station else "station=*", "month=*")
+        return sorted(path for path in glob.glob(pattern) if os.path.isdir(path))
+
+    def _finish_compaction(self, partition):
+        """
+        Complete a journaled compaction of one partition. The merged file is only
+        renamed into the partition once all of its inputs are gone, so a reader
+        never counts both (at worst it briefly misses the partition's rows).
+        """
+        journal_path = os.path.join(partition, JOURNAL_FILE)
+        try:
+            with open(journal_path) as file:
+                journal = json.load(file)
+        except FileNotFoundError:
+            return
+        # The journal is written after the merged file, which therefore is complete
+        for name in journal["inputs"]:
+            with contextlib.suppress(FileNotFoundError):
+                os.remove(os.path.join(partition, name))
+        output = os.path.join(partition, journal["output"])
+        if os.path.exists(output + ".tmp"):
+            os.replace(output + ".tmp", output)
+        os.remove(journal_path)
+
+    def recover(self):
+        """
+        Repair the lake after a crash: publish batches whose checkpoint was saved,
+        discard staged batches whose checkpoint was not (they will be re-read),
+        finish interrupted compactions and delete half-written .tmp files
+        """
+        with self._locked():
+            # A checkpoint write cut short leaves the previous checkpoint in place
+            with contextlib.suppress(FileNotFoundError):
+                os.remove(self.checkpoint_path + ".tmp")
+            for station, checkpoint in self.load_checkpoints().items():
+                if checkpoint.get("pending"):
+                    self._publish_staged(checkpoint.pop("pending"))
+                    self._save_checkpoint(station, checkpoint)
+                    logger.info(f"Recovered pending batch of {station}")
+            shutil.rmtree(os.path.join(self.lake_dir, STAGING_DIR), ignore_errors=True)
+            for partition in self._partitions():
+                self._finish_compaction(partition)
+                # Merged files whose compaction crashed before its journal was written; the inputs are intact
+                for path in glob.glob(os.path.join(partition, "*.tmp")):
+                    os.remove(path)
+                    logger.info(f"Removed unfinished compaction output {path}")
+
+    def compact(self, station=None, min_files=None):
+        """
+        Merge the files of every partition holding at least min_files files
+
+        Returns:
+            int: Number of partitions compacted
+        """
+        min_files = min_files or self.compact_min_files
+        compacted = 0
+        with self._locked():
+            for partition in self._partitions(station):
+                self._finish_compaction(partition)
+                inputs = sorted(os.path.basename(path) for path in glob.glob(os.path.join(partition, "*.parquet")))
+                if len(inputs) < min_files:
+                    continue
+
+                table = ds.dataset([os.path.join(partition, name) for name in inputs], format="parquet").to_table()
+                table = table.sort_by("dtime")
+                output = f"compact-{uuid.uuid4().hex}.parquet"
+                pq.write_table(table, os.path.join(partition, output + ".tmp"), compression="zstd")
+
+                with open(os.path.join(partition, JOURNAL_FILE), "w") as file:
+                    json.dump({"output": output, "inputs": inputs}, file)
+                    file.flush()
+                    os.fsync(file.fileno())
+                self._finish_compaction(partition)
+
+                compacted += 1
+                logger.info(f"Compacted {len(inputs)} files ({table.num_rows} rows) in {partition}")
+        return compacted
+
+    def sync_all(self, stations):
+        """One pass over the given stations: sync each, then compact what grew fragmented"""
+        exported = {}
+        for station in stations:
+            try:
+                exported[station] = self.sync_station(station)
+            except Exception as e:
+                logger.error(f"Error syncing {station}: {e}")
+        self.compact()
+        return exported
+
+
+def main():
+    """Keep the Parquet lake in sync with the station collections"""
+    from pymongo import MongoClient
+
+    from data.stations import station_collections
+    from metrics_calculator_service import CONNECTION_STRING, DATABASE_NAME
+
+    parser = argparse.ArgumentParser(description="Incrementally sync station collections into the Parquet lake")
+    parser.add_argument("stations", nargs="*", help="Collections to sync (default: all station collections)")
+    parser.add_argument("--lake", default=LAKE_DIR, help="Root directory of the lake")
+    parser.add_argument("--batch-size", type=int, default=EXPORT_BATCH_SIZE)
+    parser.add_argument("--interval", type=int, default=0,
+                        help=f"Seconds between passes; 0 runs a single pass (service default: {SYNC_INTERVAL})")
+    args = parser.parse_args()
+
+    client = MongoClient(CONNECTION_STRING)
+    try:
+        db = client[DATABASE_NAME]
+        sync = LakeSync(db, args.lake, args.batch_size)
+        sync.recover()
+        while True:
+            stations = args.stations or station_collections(db.list_collection_names())
+            exported = sync.sync_all(stations)
+            logger.info(f"Sync pass done: {sum(exported.values())} new documents")
+            if not args.interval:
+                break
+            time.sleep(args.interval)
+    except KeyboardInterrupt:
+        logger.info("Lake sync stopped")
+    finally:
+        client.close()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
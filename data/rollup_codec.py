@@ -0,0 +1,299 @@
+# data/rollup_codec.py - Compact binary encoding of the per-station forgraph rollups
+import argparse
+import json
+import logging
+import os
+import struct
+import sys
+import threading
+import zlib
+from collections.abc import Mapping
+
+import numpy as np
+
+from data.data_loader import (
+    COMPACT_SUFFIX,
+    DIMENSIONS,
+    FORGRAPH_DIR,
+    LOG_DIMENSION,
+    StationRollup,
+    _prefix_sum,
+    list_rollup_stations,
+    load_station_rollup,
+)
+
+try:
+    import zstandard
+except ImportError:  # zlib keeps the format usable where zstandard is not installed
+    zstandard = None
+
+# Set up logging
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+MAGIC = b"RLZ1"
+ZSTD_LEVEL = 10
+ZLIB_LEVEL = 9
+
+# Counts are non-negative; each series is stored in the smallest of these that holds its maximum
+UINT_DTYPES = (np.uint8, np.uint16, np.uint32, np.uint64)
+
+
+def smallest_uint(max_value):
+    """Smallest unsigned dtype able to hold max_value"""
+    for dtype in UINT_DTYPES:
+        if max_value <= np.iinfo(dtype).max:
+            return np.dtype(dtype)
+    raise ValueError(f"Count {max_value} does not fit in 64 bits")
+
+
+def _compress(payload):
+    if zstandard is not None:
+        return "zstd", zstandard.ZstdCompressor(level=ZSTD_LEVEL).compress(payload)
+    return "zlib", zlib.compress(payload, ZLIB_LEVEL)
+
+
+def _decompress(codec, payload):
+    if codec == "zstd":
+        if zstandard is None:
+            raise ImportError("zstandard is required to read zstd-compressed rollups")
+        return zstandard.ZstdDecompressor().decompress(payload)
+    if codec == "zlib":
+        return zlib.decompress(payload)
+    raise ValueError(f"Unknown rollup block codec {codec}")
+
+
+def _pack_matrix(counts):
+    """
+    Serialize a (series x hours) count matrix with one dtype per series.
+    Series sharing a dtype are stored together so decoding stays vectorized.
+
+    Returns:
+        tuple: (raw bytes, list of {"dtype", "rows"} groups in storage order)
+    """
+    if counts.size and counts.min() < 0:
+        raise ValueError("Rollup counts must be non-negative")
+    maxima = counts.max(axis=1) if counts.shape[1] else np.zeros(counts.shape[0], dtype=np.int64)
+    dtypes = [smallest_uint(int(m)) for m in maxima]
+
+    groups, chunks = [], []
+    for dtype in dict.fromkeys(dtypes):
+        rows = [i for i, d in enumerate(dtypes) if d == dtype]
+        groups.append({"dtype": dtype.str, "rows": rows})
+        chunks.append(np.ascontiguousarray(counts[rows], dtype=dtype).tobytes())
+    return b"".join(chunks), groups
+
+
+def _unpack_matrix(payload, groups, n_series, n_hours):
+    counts = np.zeros((n_series, n_hours), dtype=np.int64)
+    offset = 0
+    for group in groups:
+        dtype, rows = np.dtype(group["dtype"]), group["rows"]
+        size = len(rows) * n_hours
+        counts[rows] = np.frombuffer(payload, dtype=dtype, count=size, offset=offset).reshape(len(rows), n_hours)
+        offset += size * dtype.itemsize
+    return counts
+
+
+def encode_rollup(rollup):
+    """
+    Encode a StationRollup as a compact binary blob.
+
+    Layout: MAGIC, a uint32 header length, a zlib-compressed JSON header, then one
+    independently compressed block per dimension (plus one for the hour axis).
+    The header holds the name dictionary (every distinct series name once; the
+    dimensions refer to it by index), the version and each block's offset, codec,
+    and per-series dtype groups.
+
+    Returns:
+        bytes
+    """
+    dictionary, ids = [], {}
+
+    def name_ids(names):
+        for name in names:
+            if name not in ids:
+                ids[name] = len(dictionary)
+                dictionary.append(name)
+        return [ids[name] for name in names]
+
+    hours = rollup.hours.astype(np.int64)
+    steps = np.diff(hours)
+    blocks = {"hours": _pack_matrix(steps.reshape(1, -1))}
+    for dim in (LOG_DIMENSION, *DIMENSIONS):
+        blocks[dim] = _pack_matrix(rollup.counts[dim])
+
+    header = {
+        "station": rollup.station,
+        "version": rollup.version,
+        "n_hours": len(hours),
+        "first_hour": int(hours[0]) if len(hours) else 0,
+        "dictionary": dictionary,
+        "dimensions": {dim: name_ids(rollup.names[dim]) for dim in (LOG_DIMENSION, *DIMENSIONS)},
+        "blocks": {},
+    }
+    body, offset = [], 0
+    for key, (raw, groups) in blocks.items():
+        codec, payload = _compress(raw)
+        header["blocks"][key] = {"offset": offset, "length": len(payload), "codec": codec, "groups": groups}
+        body.append(payload)
+        offset += len(payload)
+
+    header_bytes = zlib.compress(json.dumps(header, separators=(",", ":")).encode("utf-8"), ZLIB_LEVEL)
+    return MAGIC + struct.pack("<I", len(header_bytes)) + header_bytes + b"".join(body)
+
+
+class LazyBlocks(Mapping):
+    """
+    Read-only mapping of dimension -> array whose values are produced on first access.
+    Lets a rollup expose every dimension while only decoding the ones queried.
+    """
+
+    def __init__(self, keys, load):
+        self._keys = list(keys)
+        self._load = load
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def __getitem__(self, key):
+        if key not in self._keys:
+            raise KeyError(key)
+        with self._lock:
+            if key not in self._values:
+                self._values[key] = self._load(key)
+            return self._values[key]
+
+    def __iter__(self):
+        return iter(self._keys)
+
+    def __len__(self):
+        return len(self._keys)
+
+    def loaded(self):
+        """Keys whose values have been materialized so far"""
+        return list(self._values)
+
+
+def _read_header(read):
+    """Parse the header through read(offset, length); returns (header, offset of the first block)"""
+    prefix = read(0, len(MAGIC) + 4)
+    if prefix[:len(MAGIC)] != MAGIC:
+        raise ValueError("Not a compact rollup file")
+    (length,) = struct.unpack_from("<I", prefix, len(MAGIC))
+    start = len(MAGIC) + 4
+    header = json.loads(zlib.decompress(read(start, length)))
+    return header, start + length
+
+
+def _read_block(read, header, body_start, key, n_series):
+    spec = header["blocks"][key]
+    payload = _decompress(spec["codec"], read(body_start + spec["offset"], spec["length"]))
+    n_hours = header["n_hours"] - 1 if key == "hours" else header["n_hours"]
+    return _unpack_matrix(payload, spec["groups"], n_series, max(n_hours, 0))
+
+
+def _open_rollup(read, station=None):
+    """
+    Build a StationRollup from the header and hour axis only; each dimension's
+    block is read, decompressed and prefix-summed the first time it is used.
+    """
+    header, body_start = _read_header(read)
+    n_hours = header["n_hours"]
+    if n_hours:
+        steps = _read_block(read, header, body_start, "hours", 1)[0]
+        hours = (header["first_hour"] + np.concatenate(([0], np.cumsum(steps)))).astype("datetime64[h]")
+    else:
+        hours = np.zeros(0, dtype="datetime64[h]")
+    labels = np.char.replace(np.datetime_as_string(hours, unit="h"), "T", "-")
+
+    dictionary = header["dictionary"]
+    names = {dim: [dictionary[i] for i in header["dimensions"][dim]] for dim in (LOG_DIMENSION, *DIMENSIONS)}
+    station = station or header["station"]
+
+    def load_counts(dim):
+        logger.debug(f"Loading {dim} block of {station}")
+        return _read_block(read, header, body_start, dim, len(names[dim]))
+
+    counts = LazyBlocks(names, load_counts)
+    cumsums = LazyBlocks(names, lambda dim: _prefix_sum(counts[dim]))
+    return StationRollup.from_arrays(station, labels, hours, names, counts, cumsums, version=header["version"])
+
+
+def decode_rollup(raw, station=None):
+    """
+    Decode a blob produced by encode_rollup into a StationRollup
+
+    Args:
+        raw: Encoded bytes
+        station: Station name (defaults to the one stored in the header)
+    """
+    return _open_rollup(lambda offset, length: raw[offset:offset + length], station)
+
+
+def open_compact_rollup(path, station=None):
+    """
+    Open a compact rollup file lazily: only the header and the hour axis are read
+    up front, and each dimension block is fetched from disk when first queried.
+    The file stays open (by descriptor, so a concurrent rewrite of the path does
+    not mix versions) until the rollup is garbage collected.
+    """
+    file = open(path, "rb")
+    try:
+        return _open_rollup(lambda offset, length: os.pread(file.fileno(), length, offset), station)
+    except Exception:
+        file.close()
+        raise
+
+
+def compact_path(station, directory=FORGRAPH_DIR):
+    """Path of a station's compact rollup file"""
+    return os.path.join(directory, f"{station}{COMPACT_SUFFIX}")
+
+
+def write_compact_rollup(station, directory=FORGRAPH_DIR):
+    """
+    Encode forgraph/<station>_graph.json next to it as <station>_graph.rollup
+
+    Returns:
+        tuple: (JSON size, compact size) in bytes, or None if the rollup could not be loaded
+    """
+    source = os.path.join(directory, f"{station}_graph.json")
+    rollup = load_station_rollup(station, directory) if os.path.exists(source) else None
+    if rollup is None:
+        return None
+    encoded = encode_rollup(rollup)
+    path = compact_path(station, directory)
+    tmp_path = path + ".tmp"
+    with open(tmp_path, "wb") as file:
+        file.write(encoded)
+    os.replace(tmp_path, path)
+
+    source_size = os.path.getsize(source)
+    logger.info(f"Wrote {path}: {source_size} -> {len(encoded)} bytes ({source_size / max(len(encoded), 1):.1f}x)")
+    return source_size, len(encoded)
+
+
+def main():
+    """Convert station rollups to the compact format and report the compression ratio"""
+    parser = argparse.ArgumentParser(description="Write compact encodings of the forgraph rollups")
+    parser.add_argument("stations", nargs="*", help="Stations to convert (default: all)")
+    parser.add_argument("--directory", default=FORGRAPH_DIR, help="Directory holding the *_graph.json files")
+    args = parser.parse_args()
+
+    total_source = total_compact = 0
+    for station in args.stations or list_rollup_stations(args.directory):
+        sizes = write_compact_rollup(station, args.directory)
+        if sizes is None:
+            continue
+        total_source += sizes[0]
+        total_compact += sizes[1]
+        print(f"{station:<20} {sizes[0]:>12,} -> {sizes[1]:>10,} bytes  {sizes[0] / max(sizes[1], 1):6.1f}x")
+
+    if total_compact:
+        print(f"{'total':<20} {total_source:>12,} -> {total_compact:>10,} bytes  "
+              f"{total_source / total_compact:6.1f}x  ({'zstd' if zstandard else 'zlib'})")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
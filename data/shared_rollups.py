@@ -0,0 +1,354 @@
+# data/shared_rollups.py - Host-wide shared-memory segments for station rollups
+import atexit
+import contextlib
+import fcntl
+import hashlib
+import json
+import logging
+import mmap
+import os
+import tempfile
+import threading
+from multiprocessing import resource_tracker, shared_memory
+
+import numpy as np
+
+from data.data_loader import StationRollup
+from data.rollup_codec import LazyBlocks
+
+# Set up logging
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+ALIGNMENT = 64
+SHM_DIR = "/dev/shm"  # Where POSIX shared memory segments appear as files (Linux)
+
+
+def _open_segment(name, create=False, size=0):
+    """Open a shared-memory segment whose lifetime is managed by the index, not by this process"""
+    try:
+        return shared_memory.SharedMemory(name=name, create=create, size=size, track=False)
+    except TypeError:
+        # Python < 3.13 always registers the segment with the resource tracker, which
+        # would unlink it when this process exits even though other workers still use it
+        segment = shared_memory.SharedMemory(name=name, create=create, size=size)
+        resource_tracker.unregister(segment._name, "shared_memory")
+        return segment
+
+
+def _map_segment(name):
+    """
+    Map an existing segment read-only, straight from its file under /dev/shm.
+
+    numpy views keep the mmap alive through their base, so the mapping is only
+    torn down once the last view is garbage collected, never under a live array.
+    """
+    with open(os.path.join(SHM_DIR, name), "rb") as file:
+        return mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ)
+
+
+def _unlink_segment(name):
+    """Remove a segment's name; processes that still map it keep their mapping"""
+    try:
+        segment = shared_memory.SharedMemory(name=name, track=False)
+    except TypeError:
+        # Registered here and unregistered again by unlink(), keeping the tracker balanced
+        segment = shared_memory.SharedMemory(name=name)
+    segment.close()
+    segment.unlink()
+
+
+def _pid_alive(pid):
+    try:
+        os.kill(pid, 0)
+        return True
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        return True
+
+
+class SharedRollupCache:
+    """
+    Publishes each station's count matrices once per host in shared memory.
+
+    A small JSON index (guarded by a file lock) maps station -> current segment
+    and keeps, per segment, the version, the array layout and the pids that have
+    it attached. Worker processes attach read-only numpy views instead of holding
+    their own copies. When a station is republished the previous segment is
+    retired and unlinked as soon as no live process references it. At exit a
+    process also unlinks the current segments it published once nobody else
+    references them (see close()), so shared memory does not outlive the workers.
+
+    The station segment only holds the hour axis. Each dimension's counts and
+    cumsums get a segment of their own, published the first time any process
+    asks for that dimension, so a lazily loaded rollup stays lazy when shared.
+
+    Linux only (segments are mapped through /dev/shm; fcntl locking).
+    """
+
+    def __init__(self, namespace="rollups", directory=None):
+        """
+        Args:
+            namespace: Prefix for the index file and segment names
+            directory: Where the index and lock files live (defaults to the temp dir)
+        """
+        directory = directory or tempfile.gettempdir()
+        self.namespace = namespace
+        self.index_path = os.path.join(directory, f"{namespace}_index.json")
+        self.lock_path = self.index_path + ".lock"
+        self._segments = {}  # station segment name -> {"base": mmap, "dims": {dim: mmap}} attached by this process
+        self._lock = threading.Lock()
+        atexit.register(self.close)
+
+    @contextlib.contextmanager
+    def _index(self):
+        """Locked read-modify-write access to the index"""
+        with open(self.lock_path, "a") as lock:
+            fcntl.flock(lock, fcntl.LOCK_EX)
+            try:
+                try:
+                    with open(self.index_path) as file:
+                        index = json.load(file)
+                except (FileNotFoundError, ValueError):
+                    index = {"current": {}, "segments": {}}
+                yield index
+                tmp_path = self.index_path + ".tmp"
+                with open(tmp_path, "w") as file:
+                    json.dump(index, file)
+                os.replace(tmp_path, self.index_path)
+            finally:
+                fcntl.flock(lock, fcntl.LOCK_UN)
+
+    def _segment_name(self, station, version):
+        digest = hashlib.sha1(f"{self.namespace}/{station}/{version}".encode("utf-8")).hexdigest()[:16]
+        return f"rl_{digest}"
+
+    def _collect(self, index):
+        """Drop references held by dead processes and unlink retired segments nobody uses"""
+        for name, entry in list(index["segments"].items()):
+            entry["refs"] = [pid for pid in entry["refs"] if _pid_alive(pid)]
+            if entry["retired"] and not entry["refs"]:
+                for segment in [name] + [spec["segment"] for spec in entry["dims"].values()]:
+                    try:
+                        _unlink_segment(segment)
+                    except FileNotFoundError:
+                        pass
+                del index["segments"][name]
+                logger.info(f"Unlinked retired rollup segment {name} ({entry['station']})")
+
+    @staticmethod
+    def _write_segment(name, arrays):
+        """Copy arrays into a new segment (or the leftover of a crashed publisher); returns their layout"""
+        layout, size = {}, 0
+        for key, array in arrays.items():
+            layout[key] = {"dtype": array.dtype.str, "shape": list(array.shape), "offset": size}
+            size += -(-max(array.nbytes, 1) // ALIGNMENT) * ALIGNMENT
+        try:
+            segment = _open_segment(name, create=True, size=max(size, 1))
+        except FileExistsError:
+            # Left over by a crashed publisher; its content is the same version
+            segment = _open_segment(name)
+        for key, array in arrays.items():
+            spec = layout[key]
+            view = np.ndarray(spec["shape"], dtype=spec["dtype"], buffer=segment.buf, offset=spec["offset"])
+            view[...] = array
+            del view
+        segment.close()
+        return layout
+
+    @staticmethod
+    def _views(mapping, layout):
+        views = {}
+        for key, spec in layout.items():
+            view = np.ndarray(spec["shape"], dtype=spec["dtype"], buffer=mapping, offset=spec["offset"])
+            view.flags.writeable = False
+            views[key] = view
+        return views
+
+    @staticmethod
+    def _materialized(rollup):
+        """Dimensions a rollup already holds in memory (all of them unless it loads lazily)"""
+        return rollup.counts.loaded() if isinstance(rollup.counts, LazyBlocks) else list(rollup.counts)
+
+    def _publish_dimensions(self, index, name, rollup, dims):
+        """Give each of dims that is not published yet a segment of its own (index locked)"""
+        entry = index["segments"][name]
+        for dim in dims:
+            if dim in entry["dims"]:
+                continue
+            segment = self._segment_name(rollup.station, f"{rollup.version}/{dim}")
+            layout = self._write_segment(segment, {"counts": rollup.counts[dim], "cumsums": rollup.cumsums[dim]})
+            entry["dims"][dim] = {"segment": segment, "layout": layout}
+
+    def publish(self, rollup, source=None):
+        """
+        Copy a rollup's hour axis, and the dimensions it already holds in memory,
+        into shared memory and make it current. Its other dimensions are published
+        when first requested through attach().
+
+        Args:
+            rollup: StationRollup to publish
+            source: Opaque marker of the source file state (e.g. its mtime)
+
+        Returns:
+            str: Name of the segment holding the rollup
+        """
+        name = self._segment_name(rollup.station, rollup.version)
+        with self._index() as index:
+            current = index["current"].get(rollup.station)
+            if current == name:
+                index["segments"][name]["source"] = source
+                return name
+
+            layout = self._write_segment(name, {"labels": rollup.labels, "hours": rollup.hours.view(np.int64)})
+            index["segments"][name] = {
+                "station": rollup.station,
+                "version": rollup.version,
+                "source": source,
+                "names": rollup.names,
+                "layout": layout,
+                "dims": {},
+                "refs": [],
+                "owner": os.getpid(),
+                "retired": False,
+            }
+            self._publish_dimensions(index, name, rollup, self._materialized(rollup))
+            index["current"][rollup.station] = name
+            if current in index["segments"]:
+                index["segments"][current]["retired"] = True
+            self._collect(index)
+
+        logger.info(f"Published {rollup.station} ({rollup.version}) to shared segment {name}")
+        return name
+
+    def _map_dimension(self, name, dim):
+        """(counts, cumsums) views of a published dimension, or None if it is not published"""
+        with self._index() as index:
+            entry = index["segments"].get(name)
+            spec = entry["dims"].get(dim) if entry is not None else None
+            if spec is None:
+                return None
+            with self._lock:
+                mapping = self._segments.get(name, {}).get("dims", {}).get(dim)
+            if mapping is None:
+                try:
+                    mapping = _map_segment(spec["segment"])
+                except FileNotFoundError:
+                    del entry["dims"][dim]
+                    return None
+                with self._lock:
+                    self._segments.setdefault(name, {"base": None, "dims": {}})["dims"][dim] = mapping
+        views = self._views(mapping, spec["layout"])
+        return views["counts"], views["cumsums"]
+
+    def _attach_dimension(self, name, dim, load):
+        """Views of one dimension of a segment, publishing it from load() if no process has yet"""
+        views = self._map_dimension(name, dim)
+        if views is not None:
+            return views
+        rollup = load() if load is not None else None
+        if rollup is None:
+            raise KeyError(f"{dim} of rollup segment {name} is not published")
+        with self._index() as index:
+            entry = index["segments"].get(name)
+            if entry is not None and entry["version"] != rollup.version:
+                raise RuntimeError(f"Source of rollup segment {name} changed since it was published")
+            if entry is not None:
+                # Along with whatever else the source holds in memory, so those are not reloaded
+                self._publish_dimensions(index, name, rollup, [dim, *self._materialized(rollup)])
+        return self._map_dimension(name, dim) or (rollup.counts[dim], rollup.cumsums[dim])
+
+    def attach(self, station, source=None, load=None):
+        """
+        Read-only rollup backed by the station's current segment. Its dimensions
+        are attached on first access.
+
+        Args:
+            station: Station name
+            source: If given, only attach when the segment was published from this source state
+            load: Callable returning the station's rollup from its source, used to
+                publish a dimension no process has requested yet
+
+        Returns:
+            StationRollup or None if nothing (matching) is published
+        """
+        with self._index() as index:
+            name = index["current"].get(station)
+            entry = index["segments"].get(name)
+            if entry is None or (source is not None and entry["source"] != source):
+                return None
+            with self._lock:
+                mapping = self._segments.get(name, {}).get("base")
+            if mapping is None:
+                try:
+                    mapping = _map_segment(name)
+                except FileNotFoundError:
+                    del index["current"][station]
+                    del index["segments"][name]
+                    return None
+                with self._lock:
+                    attached = self._segments.setdefault(name, {"base": None, "dims": {}})
+                    attached["base"] = mapping
+                if os.getpid() not in entry["refs"]:
+                    entry["refs"].append(os.getpid())
+
+        views = self._views(mapping, entry["layout"])
+        names = entry["names"]
+        dimensions = LazyBlocks(names, lambda dim: self._attach_dimension(name, dim, load))
+        return StationRollup.from_arrays(
+            station,
+            views["labels"],
+            views["hours"].view("datetime64[h]"),
+            names,
+            LazyBlocks(names, lambda dim: dimensions[dim][0]),
+            LazyBlocks(names, lambda dim: dimensions[dim][1]),
+            version=entry["version"],
+        )
+
+    def release(self, station=None):
+        """
+        Detach this process from a station's segments (all stations if None).
+        Rollups already handed out stay valid; the mapping goes away with their last view.
+        """
+        with self._index() as index:
+            for name in list(self._segments):
+                entry = index["segments"].get(name)
+                if station is not None and (entry is None or entry["station"] != station):
+                    continue
+                if entry is not None and os.getpid() in entry["refs"]:
+                    entry["refs"].remove(os.getpid())
+                with self._lock:
+                    del self._segments[name]
+            self._collect(index)
+
+    def release_stale(self):
+        """Detach this process from segments that have been retired by a republish"""
+        with self._index() as index:
+            for name in list(self._segments):
+                entry = index["segments"].get(name)
+                if entry is not None and not entry["retired"]:
+                    continue
+                if entry is not None and os.getpid() in entry["refs"]:
+                    entry["refs"].remove(os.getpid())
+                with self._lock:
+                    del self._segments[name]
+            self._collect(index)
+
+    def close(self):
+        """
+        Detach this process from every segment and unlink the segments nobody else
+        references that it published (or whose publisher has died). Registered with
+        atexit; later attaches republish from the source.
+        """
+        with self._index() as index:
+            for name, entry in index["segments"].items():
+                entry["refs"] = [pid for pid in entry["refs"] if pid != os.getpid() and _pid_alive(pid)]
+                owner = entry.get("owner")
+                if not entry["refs"] and (owner is None or owner == os.getpid() or not _pid_alive(owner)):
+                    entry["retired"] = True
+                    if index["current"].get(entry["station"]) == name:
+                        del index["current"][entry["station"]]
+            with self._lock:
+                self._segments.clear()
+            self._collect(index)
@@ -0,0 +1,112 @@
+# data/station_prefetch.py - Background warming of the stations a user is likely to open next
+import logging
+import os
+import threading
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+
+import psutil
+
+# Set up logging
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+PREFETCH_STATIONS = 3  # Stations warmed after each render
+PREFETCH_MAX_RSS_MB = 2048  # No prefetching while the server process uses more memory than this
+
+
+class StationPrefetcher:
+    """
+    Warms caches for likely-next stations in a single background thread.
+
+    Candidates are, in order: the neighbours of the current station in the
+    station list, the session's recently viewed stations and the stations
+    opened most often across all sessions. Each session has at most one batch;
+    scheduling a new batch or calling cancel() drops its queued stations and
+    tells the running one to stop at its next step. Finished batches are
+    dropped when the next batch of any session is scheduled, so sessions that
+    end without cancelling leave nothing behind.
+    """
+
+    def __init__(self, max_stations=PREFETCH_STATIONS, max_rss_mb=PREFETCH_MAX_RSS_MB):
+        """
+        Args:
+            max_stations: Stations warmed per batch
+            max_rss_mb: Memory budget; stations are skipped while the process is above it
+        """
+        self.max_stations = max_stations
+        self.max_rss_mb = max_rss_mb
+        self.views = Counter()  # station -> times opened, across sessions
+        self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="station-prefetch")
+        self._batches = {}  # session -> (generation, futures)
+        self._generation = 0
+        self._lock = threading.Lock()
+
+    def record_view(self, station):
+        """Count a station being opened (feeds the fleet-wide popularity)"""
+        with self._lock:
+            self.views[station] += 1
+
+    def candidates(self, station, stations, recent=()):
+        """
+        Stations to warm after station was rendered, most likely first
+
+        Args:
+            station: Station just rendered (never a candidate)
+            stations: Ordered station list, as shown in the sidebar
+            recent: Recently viewed stations of the session, most recent first
+        """
+        neighbours = []
+        if station in stations:
+            i = stations.index(station)
+            neighbours = [stations[j] for j in (i + 1, i - 1) if 0 <= j < len(stations)]
+        with self._lock:
+            popular = [name for name, _ in self.views.most_common()]
+        ordered = dict.fromkeys(neighbours + list(recent) + popular)
+        return [name for name in ordered if name != station and name in stations][:self.max_stations]
+
+    def _over_budget(self):
+        return psutil.Process(os.getpid()).memory_info().rss / 1024 / 1024 > self.max_rss_mb
+
+    def _run(self, session, generation, station, warm):
+        def is_current():
+            with self._lock:
+                return self._batches.get(session, (None,))[0] == generation
+        if not is_current():
+            return
+        if self._over_budget():
+            logger.info(f"Skipping prefetch of {station}: memory budget of {self.max_rss_mb} MB reached")
+            return
+        try:
+            warm(station, is_current)
+        except Exception as e:
+            logger.error(f"Error prefetching {station}: {e}")
+
+    def schedule(self, session, stations, warm):
+        """
+        Replace a session's batch with one warming the given stations
+
+        Args:
+            session: Session identifier
+            stations: Stations to warm, in order (see candidates)
+            warm: Callable warm(station, is_current); it should return early
+                once is_current() is False
+        """
+        with self._lock:
+            self._generation += 1
+            generation = self._generation
+            _, previous = self._batches.pop(session, (None, []))
+            for future in previous:
+                future.cancel()
+            finished = [name for name, (_, futures) in self._batches.items() if all(f.done() for f in futures)]
+            for name in finished:
+                del self._batches[name]
+            futures = [self._executor.submit(self._run, session, generation, station, warm) for station in stations]
+            self._batches[session] = (generation, futures)
+
+    def cancel(self, session):
+        """Drop a session's queued stations and stop its running one at the next step"""
+        with self._lock:
+            _, futures = self._batches.pop(session, (None, []))
+        for future in futures:
+            future.cancel()
@@ -0,0 +1,15 @@
+# data/stations.py - Which collections of the equipment database hold station test documents
+
+# Collections that are not stations: the metrics written by metrics_calculator_service and their metadata
+NON_STATION_COLLECTIONS = ("equipment_metrics", "metrics_metadata")
+
+
+def station_collections(names):
+    """
+    Station collections among a database's collection names, sorted;
+    shared by the app's station list and the lake export and sync
+
+    Args:
+        names: Collection names, e.g. from db.list_collection_names()
+    """
+    return sorted(name for name in names if name not in NON_STATION_COLLECTIONS and not name.startswith("system."))
@@ -1,2 +1,3 @@
-from .overview_summary import render_overview_summary
+from .overview_summary import render_activity_heatmap, render_overview_summary
+from .fleet_comparison import render_fleet_comparison
 # Import other page rendering functions as needed
\ No newline at end of file
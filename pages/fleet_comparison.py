@@ -0,0 +1,126 @@
+import math
+
+import pandas as pd
+import plotly.graph_objects as go
+import streamlit as st
+from plotly.subplots import make_subplots
+from pymongo import MongoClient
+
+from data.data_loader import LOG_DIMENSION
+from data.fleet_store import FleetStore
+
+# Latest-metrics fields compared across stations, with their display names
+UTILIZATION_FIELDS = {
+    "utilization_rate": "Utilization %",
+    "equipment_availability": "Availability %",
+    "downtime_percentage": "Downtime %",
+}
+
+# Dimensions the page reads; the fleet store keeps tensors for these only
+FLEET_DIMENSIONS = (LOG_DIMENSION, "label")
+
+@st.cache_resource
+def get_fleet_store():
+    """Fleet store shared by all sessions; stations are republished when their rollup changes"""
+    return FleetStore(dimensions=FLEET_DIMENSIONS)
+
+@st.cache_data(ttl=60)  # Cache for 1 minute
+def get_latest_metrics(connection_string, database, collection):
+    """
+    Latest metrics document of every station in one aggregation: sorting on
+    (station, timestamp) walks the unique {station: 1, timestamp: 1} index that
+    MetricsCalculator creates, and $group keeps the last document per station
+    """
+    client = MongoClient(connection_string)
+    try:
+        metrics_col = client[database][collection]
+        fields = ["timestamp", *UTILIZATION_FIELDS]
+        pipeline = [
+            {"$sort": {"station": 1, "timestamp": 1}},
+            {"$group": {"_id": "$station", "doc": {"$last": "$$ROOT"}}},
+            {"$project": {f"doc.{field}": 1 for field in fields}},
+        ]
+        return {item["_id"]: item["doc"] for item in metrics_col.aggregate(pipeline)}
+    finally:
+        client.close()
+
+def tests_small_multiples(stations, periods, counts, columns=3):
+    """One small line chart of tests per period for every station, on a shared x axis"""
+    rows = max(1, math.ceil(len(stations) / columns))
+    fig = make_subplots(rows=rows, cols=columns, shared_xaxes=True, subplot_titles=stations,
+                        vertical_spacing=0.12 if rows > 1 else 0.2)
+    for i, (station, row) in enumerate(zip(stations, counts)):
+        fig.add_trace(
+            go.Scatter(x=periods, y=row, mode='lines', name=station, showlegend=False,
+                       hovertemplate='%{x} - %{y}<extra></extra>'),
+            row=i // columns + 1, col=i % columns + 1,
+        )
+    fig.update_layout(height=220 * rows, margin=dict(l=20, r=20, t=40, b=20))
+    return fig
+
+def utilization_chart(stations, metrics):
+    """Grouped bars of the latest utilization metrics per station"""
+    fig = go.Figure()
+    for field, title in UTILIZATION_FIELDS.items():
+        fig.add_trace(go.Bar(x=stations, y=[metrics.get(station, {}).get(field) for station in stations], name=title))
+    fig.update_layout(
+        title="Latest Utilization by Station",
+        barmode="group",
+        yaxis_title="%",
+        height=400,
+        margin=dict(l=20, r=20, t=50, b=20)
+    )
+    return fig
+
+def render_fleet_comparison(store, window=None, metrics=None, top_k=5, columns=3):
+    """
+    Render the fleet comparison page
+
+    Args:
+        store: RollupStore with the station rollups
+        window: Optional (start, end) datetimes
+        metrics: Station -> latest metrics (from get_latest_metrics)
+        top_k: Labels listed per station
+        columns: Small multiples per row
+    """
+    st.markdown("## Fleet Comparison")
+    start, end = window if window is not None else (None, None)
+
+    # One vectorized aggregation over all stations; only changed rollups are republished
+    fleet = get_fleet_store()
+    fleet.sync(store)
+    with fleet.lock:
+        stations = list(fleet.stations)
+        periods, counts = fleet.tests_per_period("day", start, end)
+        tests = fleet.tests_by_station(start, end)
+        top_labels = fleet.top_by_station("label", top_k, start, end)
+
+    if not stations:
+        st.warning("No station rollups found")
+        return
+
+    metric_cols = st.columns(3)
+    metric_cols[0].metric("Stations", len(stations))
+    metric_cols[1].metric("Tests in Range", f"{int(tests.sum()):,}")
+    busiest = int(tests.argmax())
+    metric_cols[2].metric("Busiest Station", stations[busiest], f"{int(tests[busiest]):,} tests", delta_color="off")
+
+    st.subheader("Tests per Day")
+    st.plotly_chart(tests_small_multiples(stations, periods, counts, columns), use_container_width=True)
+
+    labels_col, utilization_col = st.columns(2)
+    with labels_col:
+        st.subheader(f"Top {top_k} Labels per Station")
+        rows = [
+            {"Station": station, "Label": label, "Tests": int(count), "Share %": round(100 * count / max(total, 1), 1)}
+            for station, total, (names, totals) in zip(stations, tests, top_labels)
+            for label, count in zip(names, totals)
+        ]
+        st.dataframe(pd.DataFrame(rows), hide_index=True, use_container_width=True)
+
+    with utilization_col:
+        st.subheader("Utilization")
+        if metrics:
+            st.plotly_chart(utilization_chart(stations, metrics), use_container_width=True)
+        else:
+            st.info("Metrics not yet calculated")
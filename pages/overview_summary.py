@@ -1,10 +1,22 @@
 import streamlit as st
-import pandas as pd
 import plotly.graph_objects as go
 import plotly.express as px
+from data.data_loader import RollupStore
 
-def render_overview_summary():
-    """Render the Overview Summary page"""
+DAYS_ORDER = ['Monday', 'Tuesday', 'Wednesday', 'Thursday', 'Friday', 'Saturday', 'Sunday']
+
+@st.cache_resource
+def get_rollup_store():
+    """Rollup store used when the page is rendered without the app's store"""
+    return RollupStore()
+
+def render_overview_summary(store=None):
+    """
+    Render the Overview Summary page
+
+    Args:
+        store: Optional RollupStore for the activity heatmap (a page-level store by default)
+    """
     
     # Get data from session state
     data = st.session_state.data
@@ -104,40 +116,44 @@ def render_overview_summary():
         st.plotly_chart(fig2, use_container_width=True)
     
     with col2:
-        # Time distribution heatmap
-        time_data = data['test_data'].copy()
-        time_data['hour'] = time_data['date'].dt.hour
-        time_data['day'] = time_data['date'].dt.day_name()
-        
-        # Order days of week
-        days_order = ['Monday', 'Tuesday', 'Wednesday', 'Thursday', 'Friday', 'Saturday', 'Sunday']
-        
-        # Create pivot table
-        time_pivot = time_data.pivot_table(
-            index='day',
-            columns='hour',
-            values='test_count',
-            aggfunc='sum'
-        ).reindex(days_order)
-        
-        # Fill NaN values
-        time_pivot = time_pivot.fillna(0)
-        
-        # Create heatmap
-        fig3 = go.Figure(data=go.Heatmap(
-            z=time_pivot.values,
-            x=time_pivot.columns,
-            y=time_pivot.index,
-            colorscale='Viridis',
-            showscale=True
-        ))
-        
-        fig3.update_layout(
-            title="Test Activity by Hour and Day",
-            xaxis_title="Hour of Day",
-            yaxis_title="Day of Week",
-            margin=dict(l=20, r=20, t=50, b=20),
-            height=400
-        )
-        
-        st.plotly_chart(fig3, use_container_width=True)
\ No newline at end of file
+        # Time distribution heatmap, folded from the station's hourly rollup
+        store = store or get_rollup_store()
+        stations = store.stations()
+        if not stations:
+            st.info("No station rollups available for the activity heatmap.")
+            return
+        selected = st.session_state.get("selected_station")
+        station = st.selectbox("Station", stations,
+                               index=stations.index(selected) if selected in stations else 0,
+                               key="overview_heatmap_station")
+        render_activity_heatmap(store, station)
+
+def render_activity_heatmap(store, station, window=None):
+    """
+    Hour x weekday heatmap of a station's tests, folded from its hourly rollup
+
+    Args:
+        store: RollupStore holding the station's rollup
+        station: Station to show
+        window: Optional (start, end) datetimes; the whole rollup by default
+    """
+    profile, n_weeks, _ = store.weekly_profile(station, window=window)
+
+    fig = go.Figure(data=go.Heatmap(
+        z=profile[0],
+        x=list(range(24)),
+        y=DAYS_ORDER,
+        colorscale='Viridis',
+        showscale=True,
+        hovertemplate='%{y} %{x}:00 - %{z} tests<extra></extra>'
+    ))
+
+    fig.update_layout(
+        title=f"Test Activity by Hour and Day ({station}, {n_weeks} weeks)",
+        xaxis_title="Hour of Day",
+        yaxis_title="Day of Week",
+        margin=dict(l=20, r=20, t=50, b=20),
+        height=400
+    )
+
+    st.plotly_chart(fig, use_container_width=True)
\ No newline at end of file
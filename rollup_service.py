@@ -0,0 +1,258 @@
+#!/usr/bin/env python3
+# rollup_service.py - Local HTTP service for the per-station forgraph rollups
+import argparse
+import hashlib
+import io
+import json
+import logging
+import sys
+import urllib.error
+import urllib.parse
+import urllib.request
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import numpy as np
+
+from data.data_loader import DIMENSIONS, FORGRAPH_DIR, GRANULARITIES, LOG_DIMENSION, RollupStore
+
+# Configure logging
+logging.basicConfig(
+    level=logging.INFO,
+    format='%(asctime)s - %(name)s - %(levelname)s - %(message)s'
+)
+logger = logging.getLogger("RollupService")
+
+DEFAULT_HOST = "127.0.0.1"
+DEFAULT_PORT = 8600
+ARROW_MIME = "application/vnd.apache.arrow.stream"
+
+
+def make_etag(*parts):
+    """Strong ETag derived from the rollup version(s) and the query parameters"""
+    digest = hashlib.sha1("|".join(str(part) for part in parts).encode("utf-8")).hexdigest()[:20]
+    return f'"{digest}"'
+
+
+def series_to_json(station, dim, granularity, version, labels, counts, names):
+    """JSON body for one rollup series"""
+    return json.dumps({
+        "station": station,
+        "dim": dim,
+        "granularity": granularity,
+        "version": version,
+        "dates": labels.tolist(),
+        "names": names,
+        "counts": counts.tolist(),
+    }).encode("utf-8")
+
+
+def series_to_arrow(labels, counts, names):
+    """
+    Arrow IPC stream with a 'period' column and one column per series.
+
+    Column names are the series names as strings (None -> 'null'); a name that
+    collides with 'period' or an earlier column gets a ' (2)', ' (3)', ... suffix.
+    The original names are kept, in column order, as JSON in the schema
+    metadata under b"names".
+    """
+    import pyarrow as pa
+
+    columns = {"period": pa.array(labels.tolist(), type=pa.string())}
+    for name, row in zip(names, counts):
+        column = base = "null" if name is None else str(name)
+        suffix = 1
+        while column in columns:
+            suffix += 1
+            column = f"{base} ({suffix})"
+        columns[column] = pa.array(row)
+    table = pa.table(columns).replace_schema_metadata({"names": json.dumps(list(names))})
+    sink = io.BytesIO()
+    with pa.ipc.new_stream(sink, table.schema) as writer:
+        writer.write_table(table)
+    return sink.getvalue()
+
+
+class RollupRequestHandler(BaseHTTPRequestHandler):
+    """
+    Serves /stations and /rollup/<station>?dim=&from=&to=&granularity=&top_k=&other=&format=
+
+    All replicas and scripts talking to one service share its warm RollupStore.
+    Responses carry an ETag built from the rollup content hash, so clients can
+    revalidate with If-None-Match and get 304 Not Modified until the data changes.
+    """
+
+    store = None  # RollupStore shared by all handler threads
+    server_version = "RollupService/1.0"
+
+    def log_message(self, format, *args):
+        logger.info("%s - %s" % (self.address_string(), format % args))
+
+    def _send(self, status, body=b"", content_type="application/json", etag=None):
+        self.send_response(status)
+        if etag:
+            self.send_header("ETag", etag)
+            self.send_header("Cache-Control", "no-cache")
+        if status != 304:
+            self.send_header("Content-Type", content_type)
+            self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        if status != 304 and body:
+            self.wfile.write(body)
+
+    def _error(self, status, message):
+        self._send(status, json.dumps({"error": message}).encode("utf-8"))
+
+    def _not_modified(self, etag):
+        """True (after answering 304) if the client already holds this representation"""
+        if_none_match = self.headers.get("If-None-Match")
+        if if_none_match and etag in [tag.strip() for tag in if_none_match.split(",")]:
+            self._send(304, etag=etag)
+            return True
+        return False
+
+    def do_GET(self):
+        try:
+            url = urllib.parse.urlsplit(self.path)
+            params = {key: values[-1] for key, values in urllib.parse.parse_qs(url.query).items()}
+            parts = [part for part in url.path.split("/") if part]
+
+            if parts == ["stations"]:
+                self._get_stations()
+            elif len(parts) == 2 and parts[0] == "rollup":
+                self._get_rollup(urllib.parse.unquote(parts[1]), params)
+            else:
+                self._error(404, f"Unknown path {url.path}")
+        except Exception as e:
+            logger.error(f"Error handling {self.path}: {e}")
+            self._error(500, str(e))
+
+    def _get_stations(self):
+        stations = [{"station": station, "version": self.store.version(station)} for station in self.store.stations()]
+        etag = make_etag("stations", *(item["version"] for item in stations))
+        if self._not_modified(etag):
+            return
+        self._send(200, json.dumps({"stations": stations}).encode("utf-8"), etag=etag)
+
+    def _get_rollup(self, station, params):
+        if station not in self.store.stations():
+            self._error(404, f"No rollup for station {station}")
+            return
+
+        dim = params.get("dim", LOG_DIMENSION)
+        granularity = params.get("granularity", "hour")
+        start, end = params.get("from") or None, params.get("to") or None
+        top_k = params.get("top_k")
+        other = params.get("other", "").lower() in ("1", "true", "yes")
+        output = params.get("format") or ("arrow" if ARROW_MIME in self.headers.get("Accept", "") else "json")
+
+        if dim not in DIMENSIONS and dim != LOG_DIMENSION:
+            self._error(400, f"Unknown dimension {dim}")
+            return
+        if granularity not in GRANULARITIES:
+            self._error(400, f"Unknown granularity {granularity}")
+            return
+        if output not in ("json", "arrow"):
+            self._error(400, f"Unknown format {output}")
+            return
+        try:
+            top_k = int(top_k) if top_k else None
+            if top_k is not None and top_k <= 0:
+                raise ValueError(f"top_k must be a positive integer, got {top_k}")
+            window = (np.datetime64(start) if start else None, np.datetime64(end) if end else None)
+        except ValueError as e:
+            self._error(400, str(e))
+            return
+
+        version = self.store.version(station)
+        etag = make_etag(station, version, dim, granularity, start, end, top_k, other, output)
+        if self._not_modified(etag):
+            return
+
+        labels, counts, names = self.store.series(station, dim, granularity, window, top_k, other)
+        if output == "arrow":
+            try:
+                body = series_to_arrow(labels, counts, names)
+            except ImportError:
+                self._error(406, "pyarrow is not installed on the rollup service")
+                return
+            self._send(200, body, ARROW_MIME, etag)
+        else:
+            body = series_to_json(station, dim, granularity, version, labels, counts, names)
+            self._send(200, body, "application/json", etag)
+
+
+class RollupClient:
+    """
+    Minimal client for the rollup service that revalidates cached responses
+    with If-None-Match, so series are re-downloaded only when the data changed.
+    """
+
+    def __init__(self, base_url, timeout=10):
+        self.base_url = base_url.rstrip("/")
+        self.timeout = timeout
+        self._cache = {}  # url -> (etag, decoded body)
+
+    def _get(self, path, params=None):
+        url = self.base_url + path
+        if params:
+            url += "?" + urllib.parse.urlencode({k: v for k, v in params.items() if v is not None})
+        request = urllib.request.Request(url)
+        cached = self._cache.get(url)
+        if cached:
+            request.add_header("If-None-Match", cached[0])
+        try:
+            with urllib.request.urlopen(request, timeout=self.timeout) as response:
+                body = json.loads(response.read())
+                self._cache[url] = (response.headers.get("ETag"), body)
+                return body
+        except urllib.error.HTTPError as e:
+            if e.code == 304 and cached:
+                return cached[1]
+            raise
+
+    def stations(self):
+        """Station names known to the service"""
+        return [item["station"] for item in self._get("/stations")["stations"]]
+
+    def series(self, station, dim, granularity="hour", window=None, top_k=None, other=False):
+        """Same result shape as RollupStore.series: (labels, counts, names)"""
+        start, end = window if window is not None else (None, None)
+        body = self._get(f"/rollup/{urllib.parse.quote(station)}", {
+            "dim": dim,
+            "granularity": granularity,
+            "from": None if start is None else str(np.datetime64(start, "h")),
+            "to": None if end is None else str(np.datetime64(end, "h")),
+            "top_k": top_k,
+            "other": "1" if other else None,
+        })
+        counts = np.array(body["counts"], dtype=np.int64).reshape(len(body["names"]), len(body["dates"]))
+        return np.array(body["dates"]), counts, body["names"]
+
+
+def create_server(host=DEFAULT_HOST, port=DEFAULT_PORT, directory=FORGRAPH_DIR):
+    """Build the HTTP server with its own RollupStore"""
+    handler = type("BoundRollupRequestHandler", (RollupRequestHandler,), {"store": RollupStore(directory)})
+    return ThreadingHTTPServer((host, port), handler)
+
+
+def main():
+    """Run the rollup service until interrupted"""
+    parser = argparse.ArgumentParser(description="Serve per-station rollups over HTTP")
+    parser.add_argument("--host", default=DEFAULT_HOST)
+    parser.add_argument("--port", type=int, default=DEFAULT_PORT)
+    parser.add_argument("--directory", default=FORGRAPH_DIR, help="Directory holding the *_graph.json files")
+    args = parser.parse_args()
+
+    server = create_server(args.host, args.port, args.directory)
+    logger.info(f"Serving rollups from {args.directory} on http://{args.host}:{args.port}")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        logger.info("Rollup service stopped")
+    finally:
+        server.server_close()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,114 @@
+# utils/downsample.py - Point reduction for long time-series traces
+import numpy as np
+
+# Points per pixel of chart width; two keeps a min and a max per pixel column
+POINTS_PER_PIXEL = 2
+DEFAULT_CHART_WIDTH = 1200
+# Downsampling only pays off when it drops the point count at least this many times:
+# a reduced trace has to send its own x values instead of a start and a step
+MIN_REDUCTION = 2
+
+
+def target_points(width=DEFAULT_CHART_WIDTH, points_per_pixel=POINTS_PER_PIXEL):
+    """Point budget per trace for a chart of the given width in pixels"""
+    return max(int(width * points_per_pixel), 4)
+
+
+def minmax_indices(counts, n_out):
+    """
+    Indices that keep the first and last point plus the minimum and maximum of
+    each bucket of every series, so every spike survives. One index set is
+    shared by all series (each index once, even where a bucket's minimum and
+    maximum coincide), so the traces keep a common x axis.
+
+    Args:
+        counts: 2-D array (series x points)
+        n_out: Target number of points per series
+
+    Returns:
+        1-D sorted int array of the kept indices
+    """
+    n_series, n = counts.shape
+    if n <= n_out or n_out < 4:
+        return np.arange(n)
+
+    # Interior points are split into equal buckets; the tail is padded with the last value
+    interior = counts[:, 1:-1]
+    buckets = (n_out - 2) // 2
+    size = -(-interior.shape[1] // buckets)
+    padded = np.pad(interior, ((0, 0), (0, buckets * size - interior.shape[1])), mode="edge")
+    blocks = padded.reshape(n_series, buckets, size)
+    offsets = np.arange(buckets) * size + 1
+    lows = np.minimum(blocks.argmin(axis=2) + offsets, n - 2)
+    highs = np.minimum(blocks.argmax(axis=2) + offsets, n - 2)
+    return np.unique(np.concatenate([[0, n - 1], lows.ravel(), highs.ravel()]))
+
+
+def lttb_indices(counts, n_out):
+    """
+    Largest-Triangle-Three-Buckets selection for equally spaced points,
+    run for all series at once.
+
+    Args:
+        counts: 2-D array (series x points)
+        n_out: Number of points to keep per series
+
+    Returns:
+        2-D int array (series x n_out), increasing along each row
+    """
+    n_series, n = counts.shape
+    if n <= n_out or n_out < 3:
+        return np.broadcast_to(np.arange(n), (n_series, n))
+
+    y = counts.astype(np.float64)
+    edges = np.linspace(1, n - 1, n_out - 1).astype(np.int64)
+    rows = np.arange(n_series)
+    selected = np.zeros((n_series, n_out), dtype=np.int64)
+    selected[:, -1] = n - 1
+    previous = np.zeros(n_series, dtype=np.int64)
+
+    for bucket in range(n_out - 2):
+        lo, hi = edges[bucket], max(edges[bucket + 1], edges[bucket] + 1)
+        if bucket + 1 < n_out - 2:
+            next_lo, next_hi = edges[bucket + 1], max(edges[bucket + 2], edges[bucket + 1] + 1)
+            next_x = (next_lo + next_hi - 1) / 2
+            next_y = y[:, next_lo:next_hi].mean(axis=1)
+        else:
+            next_x, next_y = n - 1, y[:, -1]
+
+        x_a, y_a = previous.astype(np.float64), y[rows, previous]
+        x = np.arange(lo, hi, dtype=np.float64)
+        areas = np.abs((x_a - next_x)[:, None] * (y[:, lo:hi] - y_a[:, None])
+                       - (x_a[:, None] - x[None, :]) * (next_y - y_a)[:, None])
+        previous = lo + areas.argmax(axis=1)
+        selected[:, bucket + 1] = previous
+    return selected
+
+
+def downsample_series(x, counts, n_out, method="minmax"):
+    """
+    Reduce every series of a chart to about n_out points.
+
+    Args:
+        x: 1-D array of x values shared by the series
+        counts: 2-D array (series x points)
+        n_out: Point budget per series
+        method: 'minmax' (keeps every spike) or 'lttb' (keeps the visual shape)
+
+    Returns:
+        tuple: (x values, 2-D y values) with one x array shared by all series;
+        unchanged unless downsampling keeps at most 1 / MIN_REDUCTION of the points
+    """
+    n = counts.shape[1]
+    if n <= n_out * MIN_REDUCTION:
+        return x, counts
+    if method == "lttb":
+        indices = np.unique(lttb_indices(counts, n_out))
+    elif method == "minmax":
+        indices = minmax_indices(counts, n_out)
+    else:
+        raise ValueError(f"Unknown downsampling method {method}")
+    if len(indices) * MIN_REDUCTION > n:
+        # The series' extremes fall on too many different points to share a smaller axis
+        return x, counts
+    return x[indices], counts[:, indices]